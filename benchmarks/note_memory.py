@@ -0,0 +1,67 @@
+"""
+Measure the memory held by notes loaded into a store.
+
+Notes are decoded from JSON one at a time, as a snapshot is
+read, and the memory still allocated once every note is held
+is divided by the number of notes. Bodies and titles are part
+of the total, so compare runs with the same --body-words.
+"""
+import json
+import tracemalloc
+
+from benchmarks.synthetic import synthetic_notes
+
+import click
+
+from sk_notes.note_handler import NewNote
+
+
+def bytes_per_note(count: int, body_words: int) -> float:
+    """
+    Return the bytes allocated per note held in memory.
+
+    args:
+        count: (int)
+            How many notes to load.
+
+        body_words: (int)
+            The average number of
+            words in each body.
+    """
+    records = [
+        json.dumps(note.to_dict())
+        for note in synthetic_notes(count=count, body_words=body_words)
+    ]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    notes = {}
+    for record in records:
+        note = NewNote(note=json.loads(record)).dict_to_note()
+        notes[note.id] = note
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held / count
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="100000,1000000",
+    help="Comma separated store sizes.",
+)
+@click.option(
+    "--body-words",
+    type=int,
+    default=10,
+    help="The average number of words in each body.",
+)
+def main(sizes: str, body_words: int):
+    """Report the memory held per note at each store size."""
+    click.echo(f"{'notes':>8} {'bytes/note':>12} {'MB':>8}")
+    for size in [int(size) for size in sizes.split(",")]:
+        per_note = bytes_per_note(count=size, body_words=body_words)
+        click.echo(f"{size:>8} {per_note:>12.0f} {per_note * size / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
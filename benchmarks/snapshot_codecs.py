@@ -0,0 +1,112 @@
+"""
+Compare snapshot compression codecs.
+
+For each store size and codec, reports the time to save and
+load every note, the size of the snapshot on disk and its
+compression ratio against uncompressed JSON. Codecs whose
+package is not installed are skipped.
+"""
+import os
+import tempfile
+from importlib.util import find_spec
+from itertools import islice
+from time import perf_counter
+
+from benchmarks.synthetic import synthetic_notes
+
+import click
+
+from sk_notes.compression import CODECS
+from sk_notes.local_handler import LocalHandler
+from sk_notes.note_handler import NewNote
+from sk_notes.transfer import read_jsonl
+
+DEFAULT_CODECS = "none,gzip:1,gzip:6,gzip:9,zstd:3,zstd:19,lz4:0"
+
+
+def _installed(codec: str) -> bool:
+    """Return True if the package a codec needs is installed."""
+    package = CODECS[codec][2] if codec in CODECS else None
+    return package is None or find_spec(package) is not None
+
+
+def _corpus(size: int, path: str = None) -> list:
+    """Return size notes from a JSONL export, or synthetic notes."""
+    if not path:
+        return synthetic_notes(count=size)
+    notes = islice(read_jsonl(path), size)
+    return [NewNote(note=note).dict_to_note() for note in notes]
+
+
+def measure(codec: str, level: int, notes: list) -> dict:
+    """
+    Time a save and a load of notes compressed with a codec.
+
+    args:
+        codec: (str)
+            The codec, or none.
+
+        level: (int)
+            The compression level,
+            or None for the default.
+
+        notes: (list)
+            The notes to save and load.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        handler = LocalHandler(
+            directory=directory, compression={"codec": codec, "level": level}
+        )
+        start = perf_counter()
+        handler.write_notes(data=notes)
+        save = perf_counter() - start
+        start = perf_counter()
+        handler.read_notes()
+        load = perf_counter() - start
+        size = os.path.getsize(handler._current_snapshot())
+    return {"save_ms": save * 1000, "load_ms": load * 1000, "bytes": size}
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="10000,100000",
+    help="Comma separated store sizes.",
+)
+@click.option(
+    "--codecs",
+    default=DEFAULT_CODECS,
+    help="Comma separated codec:level pairs.",
+)
+@click.option(
+    "--corpus",
+    type=click.Path(exists=True, dir_okay=False),
+    help="A JSONL export of real notes to use instead of synthetic ones.",
+)
+def main(sizes: str, codecs: str, corpus: str):
+    """Compare snapshot compression codecs."""
+    click.echo(
+        f"{'codec':<8} {'level':>5} {'notes':>8} {'save ms':>10} "
+        f"{'load ms':>10} {'MB':>8} {'ratio':>6}"
+    )
+    for size in [int(size) for size in sizes.split(",")]:
+        notes = _corpus(size=size, path=corpus)
+        plain = None
+        for setting in codecs.split(","):
+            codec, _, level = setting.partition(":")
+            if not _installed(codec):
+                click.echo(f"{codec:<8} skipped, its package is not installed")
+                continue
+            level = int(level) if level else None
+            result = measure(codec=codec, level=level, notes=notes)
+            plain = plain or (result["bytes"] if codec == "none" else None)
+            ratio = f"{plain / result['bytes']:>6.1f}" if plain else f"{'':>6}"
+            click.echo(
+                f"{codec:<8} {level if level is not None else '-':>5} {len(notes):>8} "
+                f"{result['save_ms']:>10.0f} {result['load_ms']:>10.0f} "
+                f"{result['bytes'] / 1e6:>8.1f} {ratio}"
+            )
+
+
+if __name__ == "__main__":
+    main()
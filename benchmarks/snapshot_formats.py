@@ -0,0 +1,78 @@
+"""
+Compare JSON and Parquet snapshots.
+
+For each store size, reports the time to save and load every
+note, the time to load only the columns listing notes needs,
+and the size of the snapshot on disk.
+"""
+import os
+import tempfile
+from time import perf_counter
+
+from benchmarks.synthetic import synthetic_notes
+
+import click
+
+from sk_notes.constants import SUMMARY_COLUMNS
+from sk_notes.local_handler import LocalHandler
+from sk_notes.parquet_handler import ParquetHandler
+
+HANDLERS = {"json": LocalHandler, "parquet": ParquetHandler}
+
+
+def _timed(function, **kwargs) -> float:
+    """Return the wall time of a call in milliseconds."""
+    start = perf_counter()
+    function(**kwargs)
+    return (perf_counter() - start) * 1000
+
+
+def measure(handler: LocalHandler, notes: list) -> dict:
+    """
+    Time a save and loads of notes with a handler.
+
+    args:
+        handler: (LocalHandler)
+            The handler to measure,
+            in an empty directory.
+
+        notes: (list)
+            The notes to save and load.
+    """
+    save = _timed(handler.write_notes, data=notes)
+    load = _timed(handler.read_notes)
+    summaries = _timed(handler.read_notes, columns=SUMMARY_COLUMNS)
+    return {
+        "save_ms": save,
+        "load_ms": load,
+        "list_ms": summaries,
+        "bytes": os.path.getsize(handler._current_snapshot()),
+    }
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="10000,100000,1000000",
+    help="Comma separated store sizes.",
+)
+def main(sizes: str):
+    """Compare JSON and Parquet snapshot formats."""
+    click.echo(
+        f"{'format':<8} {'notes':>8} {'save ms':>10} {'load ms':>10} "
+        f"{'list ms':>10} {'MB':>8}"
+    )
+    for size in [int(size) for size in sizes.split(",")]:
+        notes = synthetic_notes(count=size)
+        for name, handler in HANDLERS.items():
+            with tempfile.TemporaryDirectory() as directory:
+                result = measure(handler=handler(directory=directory), notes=notes)
+            click.echo(
+                f"{name:<8} {size:>8} {result['save_ms']:>10.0f} "
+                f"{result['load_ms']:>10.0f} {result['list_ms']:>10.0f} "
+                f"{result['bytes'] / 1e6:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold start benchmark for the notes CLI.
+
+Runs the CLI in fresh interpreters and fails when the median
+start up time exceeds the budget, or when a module that should
+only be loaded by a subcommand is imported at start up.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+import click
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+
+HEAVY_MODULES = ["editor", "inquirer", "numpy", "pandas", "pyarrow", "pyfiglet", "yaml"]
+
+COMMANDS = {
+    "import": "import notes",
+    "help": "import sys, notes; sys.argv = ['notes', '--help']; notes.cli()",
+}
+
+
+def _run(code: str) -> float:
+    """Return the wall time in seconds of running code in a new interpreter."""
+    start = perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return perf_counter() - start
+
+
+def time_command(code: str, runs: int) -> float:
+    """
+    Return the median cold start time of a command in milliseconds.
+
+    args:
+        code: (str)
+            The python source to run.
+
+        runs: (int)
+            How many fresh interpreters
+            to time.
+    """
+    _run(code)
+    return statistics.median(_run(code) for _ in range(runs)) * 1000
+
+
+def heavy_imports() -> list:
+    """Return the heavy modules loaded by importing the CLI."""
+    code = (
+        "import json, sys, notes; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(result.stdout)
+
+
+@click.command()
+@click.option("--runs", type=int, default=15, help="Interpreters to time.")
+@click.option(
+    "--budget",
+    type=float,
+    default=float(os.environ.get("NOTES_STARTUP_BUDGET_MS", 200)),
+    help="Maximum median start up time in milliseconds.",
+)
+def main(runs: int, budget: float):
+    """Time CLI start up and fail if it regresses past the budget."""
+    failed = False
+    loaded = heavy_imports()
+    if loaded:
+        click.echo(f"Imported at start up: {', '.join(loaded)}")
+        failed = True
+
+    for name, code in COMMANDS.items():
+        median = time_command(code=code, runs=runs)
+        status = "ok" if median <= budget else "over budget"
+        click.echo(f"{name}: {median:.1f}ms (budget {budget:.0f}ms) {status}")
+        failed = failed or median > budget
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
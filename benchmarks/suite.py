@@ -0,0 +1,278 @@
+"""
+Benchmark suite over synthetic note stores.
+
+For each store size a synthetic store is written to a
+temporary directory, and every benchmark is run against it
+several times. Commands run in this interpreter through the
+CLI, with the store loaded afresh each time, except for cold
+start, which times a new interpreter listing notes.
+
+Results are written as JSON, with the environment they were
+measured in, and can be compared with an earlier run, failing
+if any median slowed down by more than the tolerance.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from time import perf_counter
+
+from benchmarks.synthetic import BODY_SPREADS, synthetic_notes, write_store
+
+import click
+from click.testing import CliRunner
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Bumped when the layout of the results file changes.
+RESULTS_VERSION = 1
+
+# Command lines timed against each store, in the order they run. Read
+# only commands run first, so they see the store as generated.
+COMMANDS = {
+    "ls": ["ls"],
+    "ls_page": ["ls", "--limit", "50"],
+    "find_tag": ["find", "tag", "-t", "tag0"],
+    "find_group": ["find", "group", "-a", "Work"],
+    "search": ["search", "quick", "fox"],
+    "new": ["new", "--title", "benchmark", "--body", "body", "--tags", "tag1"],
+    "update_body": ["update", "note", "-i", "{id}", "-s", "body=updated"],
+    "update_tags": ["update", "note", "-i", "{id}", "-s", "tags=tag2,tag3"],
+    "delete": ["delete", "-i", "{id}"],
+}
+
+
+def _timed(function, *args, **kwargs) -> float:
+    """Return the wall time of a call in milliseconds."""
+    start = perf_counter()
+    function(*args, **kwargs)
+    return (perf_counter() - start) * 1000
+
+
+def cold_start() -> float:
+    """Time a new interpreter listing the first page of notes."""
+    code = "import notes_client; notes_client.main()"
+    return _timed(
+        subprocess.run,
+        [sys.executable, "-c", code, "ls", "--limit", "10"],
+        env={**os.environ, "NOTES_NO_DAEMON": "1", "PYTHONPATH": ROOT},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def run_command(args: list) -> None:
+    """
+    Run a CLI command with the store loaded afresh.
+
+    raises: (RuntimeError)
+        If the command fails.
+    """
+    from commands.notes import notes_store
+    from notes import cli
+
+    notes_store.cache_clear()
+    result = CliRunner().invoke(cli, args, input="y\n")
+    if result.exit_code:
+        raise RuntimeError(f"notes {' '.join(args)} failed: {result.output}")
+
+
+def first_search() -> None:
+    """Search with the full text index removed, so it is built first."""
+    from commands.notes import notes_store
+
+    notes_store.cache_clear()
+    notes_store().search_index.invalidate()
+    run_command(COMMANDS["search"])
+
+
+def handler_benchmarks(notes: list) -> dict:
+    """Return calls timing the configured storage handler directly."""
+    from sk_notes.settings import SetUp
+    from sk_notes.storage import storage_handler
+
+    handler = storage_handler(setup=SetUp())
+    return {
+        "read_notes": handler.read_notes,
+        "write_notes": lambda: handler.write_notes(data=notes),
+    }
+
+
+def measure(notes: list, repeat: int, storage: str) -> list:
+    """
+    Time every benchmark against a store of notes.
+
+    args:
+        notes: (list)
+            The notes to store.
+
+        repeat: (int)
+            How many times each
+            benchmark is run.
+
+        storage: (str)
+            The storage setting.
+
+    returns: (list)
+        A result per benchmark, with
+        each run and their median.
+    """
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        write_store(directory=directory, notes=notes, storage=storage)
+        os.chdir(directory)
+        try:
+            # The index the first search builds is kept, so the search
+            # command times queries against it and saves update it.
+            calls = {"cold_start": cold_start, "first_search": first_search}
+            for name, args in COMMANDS.items():
+                calls[name] = [
+                    [arg.format(id=len(notes) - run) for arg in args]
+                    for run in range(repeat)
+                ]
+            calls.update(handler_benchmarks(notes=notes))
+            for name, call in calls.items():
+                if callable(call):
+                    runs = [_timed(call) for _ in range(repeat)]
+                else:
+                    runs = [_timed(run_command, args) for args in call]
+                results.append(
+                    {
+                        "name": name,
+                        "notes": len(notes),
+                        "runs_ms": [round(run, 3) for run in runs],
+                        "median_ms": round(statistics.median(runs), 3),
+                    }
+                )
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def environment() -> dict:
+    """Describe the machine and code a run was measured on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> bool:
+    """
+    Print each median against a baseline run.
+
+    returns: (bool)
+        True if any benchmark slowed
+        down by more than tolerance.
+    """
+    with open(baseline_path, "r") as baseline_file:
+        baseline = {
+            (result["name"], result["notes"]): result["median_ms"]
+            for result in json.load(baseline_file)["results"]
+        }
+    regressed = False
+    click.echo(
+        f"{'benchmark':<12} {'notes':>8} {'before ms':>10} {'after ms':>10} "
+        f"{'change':>7}"
+    )
+    for result in results:
+        before = baseline.get((result["name"], result["notes"]))
+        if not before:
+            continue
+        change = result["median_ms"] / before - 1
+        slower = change > tolerance
+        regressed = regressed or slower
+        click.echo(
+            f"{result['name']:<12} {result['notes']:>8} {before:>10.1f} "
+            f"{result['median_ms']:>10.1f} {change:>+7.0%}"
+            f"{'  regressed' if slower else ''}"
+        )
+    return regressed
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="1000,100000,1000000",
+    help="Comma separated store sizes.",
+)
+@click.option("--repeat", type=int, default=3, help="Runs of each benchmark.")
+@click.option("--storage", default="local", help="The storage setting to measure.")
+@click.option("--body-words", type=int, default=60, help="Average words per body.")
+@click.option(
+    "--body-spread",
+    type=click.Choice(BODY_SPREADS),
+    default="uniform",
+    help="How body lengths vary.",
+)
+@click.option("--categories", type=int, default=2, help="Distinct categories.")
+@click.option("--category-skew", type=float, default=0.0, help="Zipf exponent.")
+@click.option("--tags", type=int, default=50, help="Distinct tags.")
+@click.option("--tags-per-note", type=int, default=4, help="Most tags per note.")
+@click.option("--tag-skew", type=float, default=0.0, help="Zipf exponent.")
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default="benchmark-results.json",
+    help="The JSON file to write results to.",
+)
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="A results file to compare against.",
+)
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.2,
+    help="The slowdown allowed by --compare, as a fraction.",
+)
+def main(sizes, repeat, storage, output, baseline, tolerance, **distribution):
+    """Run every benchmark at each store size and save the results."""
+    results = []
+    for size in [int(size) for size in sizes.split(",")]:
+        notes = synthetic_notes(count=size, **distribution)
+        for result in measure(notes=notes, repeat=repeat, storage=storage):
+            click.echo(
+                f"{result['name']:<12} {result['notes']:>8} "
+                f"{result['median_ms']:>10.1f} ms"
+            )
+            results.append(result)
+    with open(output, mode="w") as results_file:
+        json.dump(
+            {
+                "version": RESULTS_VERSION,
+                "environment": environment(),
+                "settings": {"storage": storage, "repeat": repeat, **distribution},
+                "results": results,
+            },
+            results_file,
+            indent=2,
+        )
+    click.echo(f"Results written to {output}")
+    if baseline and compare(results, baseline_path=baseline, tolerance=tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Generate synthetic notes for benchmarks."""
+import math
+import os
+import random
+from datetime import date, timedelta
+
+from sk_notes.note_handler import Note
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while notes pile up in "
+    "the storage directory and every save writes them all again"
+).split()
+
+# How the length of each body is drawn around body_words.
+BODY_SPREADS = ("uniform", "lognormal", "fixed")
+
+SETTINGS = """storage: {storage}
+aggregations:
+{aggregations}
+retention:
+  keep_last: 2
+"""
+
+
+def zipf_weights(count: int, skew: float) -> list:
+    """
+    Return weights favouring the first of count items.
+
+    The item at rank r is weighted 1 / r ** skew,
+    so a skew of 0 weights every item equally.
+    """
+    return [1 / (rank**skew) for rank in range(1, count + 1)]
+
+
+def _body_length(rng: random.Random, body_words: int, spread: str) -> int:
+    """Draw the number of words in a body."""
+    if spread == "fixed":
+        return body_words
+    if spread == "lognormal":
+        # A long tail of large notes, with a median of body_words.
+        return max(1, int(rng.lognormvariate(math.log(body_words), 1.0)))
+    return rng.randint(1, body_words * 2)
+
+
+def synthetic_notes(
+    count: int,
+    body_words: int = 60,
+    seed: int = 0,
+    body_spread: str = "uniform",
+    categories: int = 2,
+    category_skew: float = 0.0,
+    tags: int = 50,
+    tags_per_note: int = 4,
+    tag_skew: float = 0.0,
+    due_fraction: float = 0.7,
+) -> list:
+    """
+    Return a list of reproducible synthetic notes.
+
+    args:
+        count: (int)
+            How many notes to generate.
+
+        body_words: (int)
+            The average number of
+            words in each body.
+
+        seed: (int)
+            Seed for the random
+            number generator.
+
+        body_spread: (str)
+            How body lengths vary, from
+            BODY_SPREADS. Lognormal gives
+            the long tail real notes have.
+
+        categories: (int)
+            How many categories notes
+            are spread over. The first two
+            are Personal and Work.
+
+        category_skew: (float)
+            The Zipf exponent of category
+            sizes, 0 for equal sizes.
+
+        tags: (int)
+            How many distinct tags
+            there are.
+
+        tags_per_note: (int)
+            The most tags a note has.
+
+        tag_skew: (float)
+            The Zipf exponent of tag
+            use, 0 for even use.
+
+        due_fraction: (float)
+            The share of notes
+            with a due date.
+    """
+    if body_spread not in BODY_SPREADS:
+        raise ValueError(f"body_spread must be one of {', '.join(BODY_SPREADS)}")
+    rng = random.Random(seed)
+    today = date.today()
+    names = ["Personal", "Work", *(f"Category{n}" for n in range(3, categories + 1))]
+    names = names[:categories]
+    category_weights = zipf_weights(len(names), category_skew)
+    tag_names = [f"tag{number}" for number in range(tags)]
+    tag_weights = zipf_weights(tags, tag_skew)
+    notes = []
+    for _id in range(1, count + 1):
+        due = today + timedelta(days=rng.randint(-30, 90))
+        words = _body_length(rng, body_words=body_words, spread=body_spread)
+        picked = rng.choices(tag_names, tag_weights, k=rng.randint(0, tags_per_note))
+        notes.append(
+            Note(
+                id=_id,
+                created_at=1600000000 + _id,
+                category=rng.choices(names, category_weights)[0],
+                title=" ".join(rng.choices(WORDS, k=6)),
+                body=" ".join(rng.choices(WORDS, k=words)),
+                tags=list(dict.fromkeys(picked)),
+                due_date=due.isoformat() if rng.random() < due_fraction else None,
+            )
+        )
+    return notes
+
+
+def write_store(directory: str, notes: list, storage: str = "local") -> str:
+    """
+    Write notes to a store the CLI can run in.
+
+    The store is directory's .notes_storage, beside a
+    settings.yml naming the storage handler and every
+    category in notes. Only the last two snapshots are
+    kept, so repeated saves of a large store fit on disk.
+
+    args:
+        directory: (str)
+            The directory to run
+            the CLI from.
+
+        notes: (list)
+            The notes to store.
+
+        storage: (str)
+            The storage setting.
+
+    returns: (str)
+        The settings file's path.
+    """
+    from sk_notes.settings import SetUp
+    from sk_notes.storage import storage_handler
+
+    categories = sorted({note.category for note in notes}) or ["Personal"]
+    settings_path = os.path.join(directory, "settings.yml")
+    with open(settings_path, mode="w") as settings:
+        settings.write(
+            SETTINGS.format(
+                storage=storage,
+                aggregations="\n".join(f"  - {name}" for name in categories),
+            )
+        )
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        storage_handler(setup=SetUp()).write_notes(data=notes)
+    finally:
+        os.chdir(cwd)
+    return settings_path
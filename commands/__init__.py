@@ -1,4 +1,34 @@
 """Expose public classes and methods from module."""
-from .notes import delete, find, ls, new, update
+from .notes import (
+    delete,
+    due,
+    export_notes,
+    find,
+    history,
+    import_notes,
+    ls,
+    migrate,
+    new,
+    restore,
+    search,
+    serve,
+    sync,
+    update,
+)
 
-__all__ = ["delete", "find", "ls", "new", "update"]
+__all__ = [
+    "delete",
+    "due",
+    "export_notes",
+    "find",
+    "history",
+    "import_notes",
+    "ls",
+    "migrate",
+    "new",
+    "restore",
+    "search",
+    "serve",
+    "sync",
+    "update",
+]
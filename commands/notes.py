@@ -1,8 +1,62 @@
 """Commands for notes cli."""
+from datetime import datetime
+from functools import lru_cache
+
 import click
-from sk_notes import Notes
+from sk_notes.codec import CorruptNoteError
+from sk_notes.concurrency import ConflictError
+from sk_notes.constants import TRANSFER_FORMATS
+from sk_notes.settings import SettingsError
+
+
+@lru_cache(maxsize=None)
+def notes_store() -> "Notes":  # noqa: F821
+    """
+    Load the note store the first time a command needs it.
+
+    Building Notes reads settings.yml and the most recent
+    snapshot, and importing it loads the storage and display
+    code, so both are deferred until a subcommand runs rather
+    than paid on import, --help or version.
+    """
+    from sk_notes import Notes
+
+    return Notes()
+
+
+class NotesGroup(click.Group):
+    """A command group reporting a corrupt store as an error, not a traceback."""
+
+    def invoke(self, ctx):
+        """Run the subcommand, reporting corrupt notes or settings as an error."""
+        try:
+            return super().invoke(ctx)
+        except (CorruptNoteError, SettingsError) as err:
+            raise click.ClickException(str(err))
+
+
+def save(notes: "Notes") -> None:  # noqa: F821
+    """Save notes, reporting a conflicting save by another process as an error."""
+    try:
+        notes.save()
+    except ConflictError as err:
+        raise click.ClickException(str(err))
 
-NOTES = Notes()
+
+def page_options(command):
+    """Add --limit and --offset options to a listing command."""
+    command = click.option(
+        "--offset",
+        type=click.IntRange(min=0),
+        default=0,
+        help="How many notes to skip before listing.",
+    )(command)
+    return click.option(
+        "--limit",
+        type=click.IntRange(min=0),
+        default=None,
+        help="The most notes to list.",
+    )(command)
 
 
 @click.command()
@@ -14,12 +68,13 @@ NOTES = Notes()
     help="The ID of a specific note to display.",
     default=lambda: None,
 )
-def ls(_id: int):
+@page_options
+def ls(_id: int, limit: int, offset: int):
     """Display all notes."""
     if _id:
-        NOTES.note(_id)
+        notes_store().note(_id)
     else:
-        NOTES.notes()
+        notes_store().notes(limit=limit, offset=offset)
 
 
 @click.group()
@@ -31,28 +86,181 @@ def find():
 @click.option(
     "-t",
     "--tag",
+    "tags",
     type=str,
-    help="A tag to search for.",
+    multiple=True,
+    help="A tag to search for. Repeat to search for several.",
+)
+@click.option(
+    "--any",
+    "match",
+    flag_value="any",
+    help="Find notes with any of the tags.",
+)
+@click.option(
+    "--all",
+    "match",
+    flag_value="all",
+    default=True,
+    help="Find notes with all of the tags (default).",
 )
-def tag(tag: str):
-    """Find notes by a tag."""
-    if tag:
-        NOTES.tag(tag=tag)
+@page_options
+def tag(tags: tuple, match: str, limit: int, offset: int):
+    """Find notes by one or more tags."""
+    if tags:
+        notes_store().tag(tags=list(tags), match=match, limit=limit, offset=offset)
 
 
 @find.command()
 @click.option("-a", "--aggregation", type=str, help="The aggregation to search for.")
-def group(aggregation: str):
+@page_options
+def group(aggregation: str, limit: int, offset: int):
     """Find notes by an aggregation."""
     if aggregation:
-        NOTES.aggregate(aggregation=aggregation)
+        notes_store().aggregate(aggregation=aggregation, limit=limit, offset=offset)
+
+
+def _parse_days(ctx, param, value: str) -> int:
+    """Parse a period such as 7d or 2w into a number of days."""
+    if value is None:
+        return None
+    units = {"d": 1, "w": 7}
+    try:
+        if value[-1] in units:
+            return int(value[:-1]) * units[value[-1]]
+        return int(value)
+    except (IndexError, ValueError):
+        raise click.BadParameter("use a number of days, such as 7d or 2w")
+
+
+@click.command()
+@click.option(
+    "-w",
+    "--within",
+    type=str,
+    callback=_parse_days,
+    help="Show notes due within a period from today, such as 7d or 2w.",
+)
+@click.option("--overdue", is_flag=True, help="Show notes past their due date.")
+def due(within: int, overdue: bool):
+    """List notes by due date, soonest first."""
+    notes_store().due(within=within, overdue=overdue)
+
+
+@click.command()
+@click.argument("terms", nargs=-1, required=True)
+@click.option(
+    "-n",
+    "--limit",
+    type=int,
+    default=10,
+    help="The most notes to display.",
+)
+def search(terms: tuple, limit: int):
+    """Search note titles and bodies."""
+    notes_store().search(query=" ".join(terms), limit=limit)
+
+
+@click.command(name="import")
+@click.argument("path", type=click.Path(exists=True))
+@click.option(
+    "-f",
+    "--format",
+    "_format",
+    type=click.Choice(TRANSFER_FORMATS),
+    help="The format of PATH. Detected from its extension if unset.",
+)
+def import_notes(path: str, _format: str):
+    """Import notes from JSONL, CSV or a directory of Markdown files."""
+    try:
+        click.echo(notes_store().import_notes(path=path, _format=_format))
+    except ValueError as err:
+        raise click.ClickException(str(err))
+
+
+@click.command(name="export")
+@click.argument("path", type=click.Path())
+@click.option(
+    "-f",
+    "--format",
+    "_format",
+    type=click.Choice(TRANSFER_FORMATS),
+    help="The format to write. Detected from the extension of PATH if unset.",
+)
+def export_notes(path: str, _format: str):
+    """Export notes to JSONL, CSV or a directory of Markdown files."""
+    click.echo(notes_store().export_notes(path=path, _format=_format))
+
+
+@click.command()
+def sync():
+    """Sync notes with the bucket set by gcs_bucket in settings.yml."""
+    try:
+        click.echo(notes_store().sync())
+    except ValueError as err:
+        raise click.ClickException(str(err))
+
+
+@click.command()
+def migrate():
+    """Convert JSON snapshots into the content-addressed object store."""
+    from sk_notes import ObjectHandler
+
+    local = notes_store().local
+    if not isinstance(local, ObjectHandler):
+        raise click.ClickException("Set storage: objects in settings.yml to migrate")
+    click.echo(local.migrate())
+
+
+@click.command()
+def serve():
+    """Keep notes loaded and serve commands to the CLI over a socket."""
+    import signal
+    import sys
+
+    from sk_notes.daemon import NotesServer
+
+    def reload():
+        notes_store.cache_clear()
+        notes_store().load()
+
+    server = NotesServer(
+        cli=click.get_current_context().find_root().command,
+        directory=notes_store().local.directory,
+        reset=reload,
+        settings_file=notes_store().setup.settings_file,
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    click.echo(f"Serving notes on {server.socket_path}")
+    server.serve()
 
 
 @click.command()
-def new():
-    """Create a new note."""
-    NOTES.new()
-    NOTES.save()
+@click.option("--title", type=str, help="The title of the note.")
+@click.option("--category", type=str, help="The category of the note.")
+@click.option("--body", type=str, help="The body of the note.")
+@click.option("--tags", type=str, help="Comma separated tags.")
+@click.option("--due", "due_date", type=str, help="The due date, yyyy-mm-dd.")
+@click.option(
+    "--from-stdin",
+    is_flag=True,
+    help="Create notes from JSONL on stdin. Lines with an id update that note.",
+)
+def new(from_stdin: bool, **fields):
+    """Create a new note, prompting for it unless fields are given."""
+    notes = notes_store()
+    fields = {field: value for field, value in fields.items() if value is not None}
+    try:
+        if from_stdin:
+            from sk_notes.transfer import parse_jsonl
+
+            records = parse_jsonl(click.get_text_stream("stdin"))
+            click.echo(notes.apply(records=records))
+        else:
+            notes.new(fields=fields)
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    save(notes)
 
 
 @click.command()
@@ -65,8 +273,9 @@ def new():
 )
 def delete(_id: int):
     """Delete an existing note."""
-    NOTES.delete(_id)
-    NOTES.save()
+    notes = notes_store()
+    notes.delete(_id)
+    save(notes)
 
 
 @click.group()
@@ -74,6 +283,18 @@ def update():
     """Update existing notes."""
 
 
+def _parse_assignments(ctx, param, values: tuple) -> dict:
+    """Parse field=value pairs into a dict, reading due as due_date."""
+    fields = {}
+    for value in values:
+        field, separator, setting = value.partition("=")
+        if not separator:
+            raise click.BadParameter(f"use field=value, not {value!r}")
+        field = field.strip()
+        fields["due_date" if field == "due" else field] = setting
+    return fields
+
+
 @update.command()
 @click.option(
     "-i",
@@ -82,10 +303,26 @@ def update():
     type=int,
     help="The ID of the note to update.",
 )
-def note(_id: int):
+@click.option(
+    "-s",
+    "--set",
+    "fields",
+    multiple=True,
+    metavar="FIELD=VALUE",
+    callback=_parse_assignments,
+    help="Set a field without prompting. Repeat to set several.",
+)
+def note(_id: int, fields: dict):
     """Update the entirety of a note."""
-    NOTES.update(_id)
-    NOTES.save()
+    notes = notes_store()
+    if fields:
+        try:
+            click.echo(notes.update_fields(_id, fields=fields))
+        except ValueError as err:
+            raise click.ClickException(str(err))
+    else:
+        notes.update(_id)
+    save(notes)
 
 
 @update.command()
@@ -98,8 +335,9 @@ def note(_id: int):
 )
 def category(_id: int):
     """Update the category of a note."""
-    NOTES.update_category(_id)
-    NOTES.save()
+    notes = notes_store()
+    notes.update_category(_id)
+    save(notes)
 
 
 @update.command()
@@ -112,8 +350,9 @@ def category(_id: int):
 )
 def title(_id: int):
     """Update the title of a note."""
-    NOTES.update_title(_id)
-    NOTES.save()
+    notes = notes_store()
+    notes.update_title(_id)
+    save(notes)
 
 
 @update.command()
@@ -126,8 +365,9 @@ def title(_id: int):
 )
 def body(_id: int):
     """Update the content of a note."""
-    NOTES.update_body(_id)
-    NOTES.save()
+    notes = notes_store()
+    notes.update_body(_id)
+    save(notes)
 
 
 @update.command()
@@ -140,8 +380,9 @@ def body(_id: int):
 )
 def tags(_id: int):
     """Update the tags associated with the note."""
-    NOTES.update_tags(_id)
-    NOTES.save()
+    notes = notes_store()
+    notes.update_tags(_id)
+    save(notes)
 
 
 @update.command()
@@ -154,5 +395,65 @@ def tags(_id: int):
 )
 def date(_id: int):
     """Update the due date on the note."""
-    NOTES.update_date(_id)
-    NOTES.save()
+    notes = notes_store()
+    notes.update_date(_id)
+    save(notes)
+
+
+@click.command()
+@click.option(
+    "-i",
+    "--id",
+    "_id",
+    type=int,
+    required=True,
+    help="The ID of the note to list the revisions of.",
+)
+def history(_id: int):
+    """List the revisions of a note."""
+    try:
+        click.echo(notes_store().history(_id))
+    except ValueError as err:
+        raise click.ClickException(str(err))
+
+
+def _parse_time(ctx, param, value: str) -> int:
+    """Parse a timestamp, or a date and time such as 2024-05-01T09:30, to seconds."""
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        raise click.BadParameter("use a timestamp, or a date such as 2024-05-01T09:30")
+
+
+@click.command()
+@click.option(
+    "--at",
+    type=str,
+    callback=_parse_time,
+    help="Restore every note to how it was at this time.",
+)
+@click.option("-i", "--id", "_id", type=int, help="The ID of a note to restore.")
+@click.option(
+    "-r",
+    "--rev",
+    "revision",
+    type=int,
+    help="The revision to restore the note to, as listed by history.",
+)
+def restore(at: int, _id: int, revision: int):
+    """Restore every note to a point in time, or one note to a revision."""
+    notes = notes_store()
+    try:
+        if at is not None and _id is None and revision is None:
+            click.echo(notes.restore(at=at))
+        elif at is None and _id is not None and revision is not None:
+            click.echo(notes.restore_revision(_id=_id, revision=revision))
+        else:
+            raise click.UsageError("Use either --at, or --id with --rev")
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    save(notes)
@@ -1,12 +1,72 @@
 """Wrapper around Notes CLI."""
 import os
-from commands.notes import delete, find, ls, new, update
+import sys
+from commands.notes import (
+    NotesGroup,
+    delete,
+    due,
+    export_notes,
+    find,
+    history,
+    import_notes,
+    ls,
+    migrate,
+    new,
+    restore,
+    search,
+    serve,
+    sync,
+    update,
+)
 
 import click
-import pyfiglet
+from sk_notes import trace
 
 
-@click.group()
+def _command_path(group: click.Group, args: list) -> list:
+    """
+    Return the names of the command and subcommands in a command line.
+
+    Option values and arguments are left out, so a trace
+    never records the contents of a note.
+    """
+    path, command = [], group
+    for arg in args:
+        if arg.startswith("-") and not path:
+            continue
+        command = isinstance(command, click.Group) and command.get_command(None, arg)
+        if not command:
+            break
+        path.append(arg)
+    return path
+
+
+def _profile(ctx, param, value: bool) -> None:
+    """Trace the command's phases if --profile or NOTES_TRACE is set."""
+    if value or trace.requested():
+        args = (ctx.obj or {}).get("args", sys.argv[1:])
+        command = _command_path(ctx.command, args)
+        if command == ["serve"]:
+            # The daemon traces each command it serves, not itself.
+            trace.cancel()
+            return
+        trace.start()
+        ctx.call_on_close(lambda: trace.stop(command=command))
+
+
+@click.group(cls=NotesGroup)
+@click.option(
+    "--profile",
+    is_flag=True,
+    expose_value=False,
+    is_eager=True,
+    callback=_profile,
+    help=(
+        "Print the time and allocations of each phase to stderr, or append them "
+        "to the file NOTES_TRACE names. NOTES_CPROFILE names a file to dump a "
+        "cProfile to."
+    ),
+)
 def cli():
     """Group for Notes CLI."""
 
@@ -14,6 +74,8 @@ def cli():
 @cli.command()
 def version():
     """Display version information."""
+    import pyfiglet
+
     text = pyfiglet.figlet_format("Notes", font="slant")
     click.echo(text)
     click.echo(f"Version: {_version()}")
@@ -30,7 +92,16 @@ def _version():
 
 
 cli.add_command(cmd=delete, name="delete")
+cli.add_command(cmd=due, name="due")
+cli.add_command(cmd=export_notes, name="export")
 cli.add_command(cmd=find, name="find")
+cli.add_command(cmd=history, name="history")
+cli.add_command(cmd=import_notes, name="import")
 cli.add_command(cmd=ls, name="ls")
+cli.add_command(cmd=migrate, name="migrate")
 cli.add_command(cmd=new, name="new")
+cli.add_command(cmd=restore, name="restore")
+cli.add_command(cmd=search, name="search")
+cli.add_command(cmd=serve, name="serve")
+cli.add_command(cmd=sync, name="sync")
 cli.add_command(cmd=update, name="update")
@@ -0,0 +1,29 @@
+"""Entry point that sends commands to the notes daemon before loading the CLI."""
+import sys
+
+from sk_notes import trace
+from sk_notes.daemon import run_in_daemon
+
+
+def main():
+    """
+    Run the command line in the daemon if one is serving, or in the CLI.
+
+    A traced command always runs in the CLI, so its phases are
+    measured in this process, and loading the CLI is timed too.
+    """
+    args = sys.argv[1:]
+    tracing = trace.requested() or args[:1] == ["--profile"]
+    response = None if tracing else run_in_daemon(args=args)
+    if response is None:
+        if tracing:
+            trace.start()
+        with trace.phase("import"):
+            from notes import cli
+
+        return cli(args=args)
+
+    from sk_notes.output import write_chunks
+
+    write_chunks([response["output"]])
+    sys.exit(response["exit_code"])
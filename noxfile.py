@@ -18,3 +18,17 @@ def format(session):
     """Format using black."""
     session.install("black")
     session.run("black", ".")
+
+
+@nox.session
+def benchmark(session):
+    """Check CLI start up time against its budget."""
+    session.install("-r", "requirements.txt", "Click")
+    session.run("python", "-m", "benchmarks.startup")
+
+
+@nox.session
+def suite(session):
+    """Run the benchmark suite, comparing with a baseline if one is given."""
+    session.install("-r", "requirements.txt", "Click")
+    session.run("python", "-m", "benchmarks.suite", *session.posargs)
@@ -3,13 +3,13 @@
 from setuptools import setup
 
 setup(
-    py_modules=["notes"],
+    py_modules=["notes", "notes_client"],
     install_requires=[
         "Click",
     ],
     entry_points={
         "console_scripts": [
-            "notes = notes:cli",
+            "notes = notes_client:main",
         ],
     },
 )
@@ -1,18 +1,38 @@
 """Expose public classes and methods from module."""
-from .constants import EXAMPLE_NOTE
-from .local_handler import LocalHandler
-from .note_handler import CreateNote, DeleteNote, DisplayNote, NewNote, UpdateNote
-from .notes_functions import Notes
-from .settings import SetUp
+from importlib import import_module
 
-__all__ = [
-    "CreateNote",
-    "DeleteNote",
-    "DisplayNote",
-    "EXAMPLE_NOTE",
-    "LocalHandler",
-    "NewNote",
-    "Notes",
-    "UpdateNote",
-    "SetUp",
-]
+# Public names and the modules they are imported from on first use,
+# so light modules such as sk_notes.daemon load without the handlers.
+_EXPORTS = {
+    "ConflictError": "concurrency",
+    "CorruptNoteError": "codec",
+    "CreateNote": "note_handler",
+    "DeleteNote": "note_handler",
+    "DisplayNote": "note_handler",
+    "EXAMPLE_NOTE": "constants",
+    "JournalHandler": "journal_handler",
+    "LocalHandler": "local_handler",
+    "NewNote": "note_handler",
+    "Notes": "notes_functions",
+    "ObjectHandler": "object_handler",
+    "ParquetHandler": "parquet_handler",
+    "UpdateNote": "note_handler",
+    "SetUp": "settings",
+    "SQLiteHandler": "sqlite_handler",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    """Import a public name from its module the first time it is used."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    """List the public names alongside the module's own."""
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,166 @@
+"""Classes to read and write objects in Cloud Storage or a local stand-in."""
+import os
+
+from sk_notes.concurrency import StoreLock, atomic_write
+
+
+class PreconditionFailed(Exception):
+    """Raised when an object changed since its generation was read."""
+
+
+class LocalBucket:
+    """
+    A bucket kept in a local directory.
+
+    It stands in for Cloud Storage offline and in tests.
+    Each object is a file, with its generation kept in a
+    file beside it, and writes hold a lock on the bucket
+    so generation checks behave as they do in Cloud Storage.
+
+    args:
+        directory: (str)
+            The directory holding
+            the bucket's objects.
+    """
+
+    transient_errors = (OSError,)
+
+    def __init__(self, directory: str) -> None:
+        """Initialise the class."""
+        self.directory = directory
+        self.lock_path = os.path.join(directory, ".lock")
+
+    def _path(self, name: str) -> str:
+        """Return the file holding an object."""
+        return os.path.join(self.directory, *name.split("/"))
+
+    def _generation(self, name: str) -> int:
+        """Return an object's generation, or 0 if it does not exist."""
+        try:
+            with open(f"{self._path(name)}.generation", "r") as generation:
+                return int(generation.read())
+        except FileNotFoundError:
+            return 0
+
+    def get(self, name: str) -> tuple:
+        """
+        Read an object.
+
+        returns: (tuple)
+            The object's bytes and generation,
+            or None and 0 if it does not exist.
+        """
+        with StoreLock(self.lock_path):
+            try:
+                with open(self._path(name), "rb") as blob:
+                    return blob.read(), self._generation(name)
+            except FileNotFoundError:
+                return None, 0
+
+    def put(self, name: str, data: bytes, if_generation: int = None) -> int:
+        """
+        Write an object.
+
+        args:
+            name: (str)
+                The object's name.
+
+            data: (bytes)
+                The object's contents.
+
+            if_generation: (int)
+                Only write if the object is at
+                this generation, 0 meaning it
+                does not exist. Unchecked if unset.
+
+        returns: (int)
+            The object's new generation.
+
+        raises: (PreconditionFailed)
+            If if_generation is not
+            the object's generation.
+        """
+        path = self._path(name)
+        with StoreLock(self.lock_path):
+            generation = self._generation(name)
+            if if_generation is not None and if_generation != generation:
+                raise PreconditionFailed(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_write(path, mode="wb") as blob:
+                blob.write(data)
+            with atomic_write(f"{path}.generation") as blob_generation:
+                blob_generation.write(str(generation + 1))
+        return generation + 1
+
+    def delete(self, name: str) -> None:
+        """Delete an object, if it exists."""
+        with StoreLock(self.lock_path):
+            for path in (self._path(name), f"{self._path(name)}.generation"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+class GCSBucket:
+    """
+    A Cloud Storage bucket.
+
+    google-cloud-storage is imported when the bucket is
+    opened, so it is only needed by users who sync.
+
+    args:
+        name: (str)
+            The bucket's name.
+
+        project: (str)
+            The GCP project id, or None
+            for the credentials' default.
+    """
+
+    def __init__(self, name: str, project: str = None) -> None:
+        """Initialise the class."""
+        from google.api_core import exceptions
+        from google.cloud import storage
+
+        self.exceptions = exceptions
+        self.bucket = storage.Client(project=project).bucket(name)
+        self.transient_errors = (
+            exceptions.ServerError,
+            exceptions.TooManyRequests,
+            ConnectionError,
+            TimeoutError,
+        )
+
+    def get(self, name: str) -> tuple:
+        """Read an object, returning its bytes and generation, or None and 0."""
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            return None, 0
+        data = blob.download_as_bytes(if_generation_match=blob.generation)
+        return data, blob.generation
+
+    def put(self, name: str, data: bytes, if_generation: int = None) -> int:
+        """Write an object, if it is at if_generation, returning its generation."""
+        blob = self.bucket.blob(name)
+        try:
+            blob.upload_from_string(data, if_generation_match=if_generation)
+        except self.exceptions.PreconditionFailed:
+            raise PreconditionFailed(name)
+        return blob.generation
+
+    def delete(self, name: str) -> None:
+        """Delete an object, if it exists."""
+        try:
+            self.bucket.delete_blob(name)
+        except self.exceptions.NotFound:
+            pass
+
+
+def open_bucket(name: str, project: str = None):
+    """
+    Return the bucket named by the gcs_bucket setting.
+
+    A file:// URL opens a LocalBucket in that directory.
+    """
+    if name.startswith("file://"):
+        return LocalBucket(directory=name[len("file://"):])
+    return GCSBucket(name=name, project=project)
@@ -0,0 +1,89 @@
+"""Functions to read and write compressed snapshots."""
+import gzip
+
+
+def _open_zstd(path: str, mode: str, level: int = None):
+    """Open a zstd compressed file with the zstandard package."""
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+    return zstandard.open(path, mode, cctx=compressor)
+
+
+def _open_lz4(path: str, mode: str, level: int = None):
+    """Open an lz4 frame compressed file with the lz4 package."""
+    import lz4.frame
+
+    return lz4.frame.open(path, mode, compression_level=level or 0)
+
+
+def _open_gzip(path: str, mode: str, level: int = None):
+    """Open a gzip compressed file."""
+    return gzip.open(path, mode, compresslevel=6 if level is None else level)
+
+
+# Codecs by name, with the suffix added to snapshot names,
+# the bytes compressed files start with, the package needed
+# and a function opening a file.
+CODECS = {
+    "gzip": ("gz", b"\x1f\x8b", None, _open_gzip),
+    "zstd": ("zst", b"\x28\xb5\x2f\xfd", "zstandard", _open_zstd),
+    "lz4": ("lz4", b"\x04\x22\x4d\x18", "lz4", _open_lz4),
+}
+
+# Extensions of JSON snapshots, plain or compressed.
+JSON_EXTENSIONS = ("json", *(f"json.{ending}" for ending, *_ in CODECS.values()))
+
+
+def suffix(codec: str) -> str:
+    """Return the suffix a codec adds to file names, or "" for none."""
+    if not codec or codec == "none":
+        return ""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec '{codec}' in settings.yml")
+    return f".{CODECS[codec][0]}"
+
+
+def detect(path: str) -> str:
+    """Return the codec a file was compressed with, or None if it is not."""
+    with open(path, "rb") as file:
+        head = file.read(4)
+    for codec, (_, magic, _, _) in CODECS.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def open_file(path: str, mode: str = "rb", codec: str = None, level: int = None):
+    """
+    Open a file, compressing or decompressing it with a codec.
+
+    args:
+        path: (str)
+            The file to open.
+
+        mode: (str)
+            The mode to open it in.
+
+        codec: (str)
+            gzip, zstd or lz4. When reading
+            it is detected if unset, and
+            when writing none is used.
+
+        level: (int)
+            The compression level,
+            or the codec's default.
+
+    raises: (ValueError)
+        If the codec's package
+        is not installed.
+    """
+    if codec is None and "r" in mode:
+        codec = detect(path)
+    if not codec or codec == "none":
+        return open(path, mode)
+    _, _, package, opener = CODECS[codec]
+    try:
+        return opener(path, mode, level=level)
+    except ImportError:
+        raise ValueError(f"{codec} compression needs the {package} package installed")
@@ -0,0 +1,78 @@
+"""Classes and functions to let several processes write to one store safely."""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ConflictError(ValueError):
+    """Raised when a save would overwrite a note changed by another process."""
+
+
+class StoreLock:
+    """
+    An advisory lock on a store, held while it is read and written.
+
+    The lock is taken with flock on a file in the store, so
+    other processes wait for it and it is released if the
+    holder dies. It is not reentrant, and platforms without
+    fcntl take no lock.
+
+    args:
+        path: (str)
+            The lock file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialise the class."""
+        self.path = path
+        self._file = None
+
+    def __enter__(self) -> "StoreLock":
+        """Wait for and take the lock."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, mode="a")
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Release the lock."""
+        self._file.close()
+        self._file = None
+
+
+def fsync_path(path: str) -> None:
+    """Flush a written file, or a directory's entries, to disk."""
+    if os.path.isdir(path) and not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w"):
+    """
+    Open a file that replaces path only once it is completely written.
+
+    The file is written beside path, flushed to disk and renamed
+    over it, so readers see either the old or the new contents.
+    Nothing is replaced if the block raises.
+    """
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, mode=mode) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    fsync_path(os.path.dirname(path) or ".")
@@ -30,3 +30,15 @@ EXAMPLE_NOTE = [
         "tags": ["example", "test"],
     }
 ]
+
+# The fields needed to list notes without displaying their content.
+SUMMARY_COLUMNS = ["id", "title", "due_date"]
+
+# The directory notes are stored in, relative to where notes runs.
+STORAGE_DIRECTORY = ".notes_storage"
+
+# The file in the storage directory holding the next note id.
+ID_COUNTER = "NEXT_ID"
+
+# The formats notes are imported from and exported to, as sk_notes.transfer reads.
+TRANSFER_FORMATS = ["csv", "jsonl", "markdown"]
@@ -0,0 +1,259 @@
+"""Classes to keep notes resident in a daemon serving the CLI."""
+import json
+import os
+import socketserver
+
+from sk_notes.constants import ID_COUNTER, STORAGE_DIRECTORY
+
+# Commands that never prompt, so they can run without a terminal.
+RESIDENT_COMMANDS = {
+    "due",
+    "export",
+    "find",
+    "history",
+    "import",
+    "ls",
+    "restore",
+    "search",
+}
+NEW_FIELD_OPTIONS = ("--title", "--category", "--body", "--tags", "--due")
+# Commands taking a path argument, with their options that take a value.
+PATH_COMMANDS = {"export": ("-f", "--format"), "import": ("-f", "--format")}
+
+
+def socket_path(directory: str = None) -> str:
+    """Return the path of the daemon socket for a storage directory."""
+    return os.path.join(directory or STORAGE_DIRECTORY, "notes.sock")
+
+
+def forwardable(args: list) -> bool:
+    """
+    Return True if a command line can run in the daemon.
+
+    Commands that prompt or open an editor need the
+    caller's terminal, so they always run in the CLI.
+
+    args:
+        args: (list)
+            The command line arguments,
+            without the program name.
+    """
+    if not args or "--help" in args:
+        return False
+    command, options = args[0], args[1:]
+    if command in RESIDENT_COMMANDS:
+        return True
+    if command == "new":
+        return "--from-stdin" in options or any(
+            option.startswith(NEW_FIELD_OPTIONS) for option in options
+        )
+    if command == "update":
+        return "-s" in options or any(
+            option.startswith("--set") for option in options
+        )
+    return False
+
+
+def absolute_paths(args: list) -> list:
+    """
+    Return a command line with its path arguments made absolute.
+
+    The daemon runs commands from its own directory, so paths
+    relative to the caller's are resolved before forwarding.
+
+    args:
+        args: (list)
+            The command line arguments,
+            without the program name.
+    """
+    if args[0] not in PATH_COMMANDS:
+        return args
+    valued = PATH_COMMANDS[args[0]]
+    resolved, value_next = [args[0]], False
+    for arg in args[1:]:
+        if not value_next and not arg.startswith("-"):
+            arg = os.path.abspath(arg)
+        value_next = arg in valued
+        resolved.append(arg)
+    return resolved
+
+
+def run_in_daemon(args: list, directory: str = None) -> dict:
+    """
+    Run a command line in the daemon, if one is serving.
+
+    args:
+        args: (list)
+            The command line arguments,
+            without the program name.
+
+        directory: (str)
+            The storage directory the
+            daemon serves, or None for
+            the one settings name.
+
+    returns: (dict)
+        The command's output and exit_code,
+        or None if it should run in the CLI.
+        NOTES_NO_DAEMON set in the environment
+        always runs it in the CLI.
+    """
+    if os.environ.get("NOTES_NO_DAEMON") or not forwardable(args):
+        return None
+    if directory is None:
+        from sk_notes.settings import SetUp, SettingsError
+
+        try:
+            directory = SetUp().storage_directory()
+        except SettingsError:
+            # Run in the CLI, which reports the error.
+            return None
+    path = socket_path(directory)
+    if not os.path.exists(path):
+        return None
+
+    import socket
+    import sys
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return None
+        stdin = sys.stdin.read() if "--from-stdin" in args else ""
+        request = json.dumps({"args": absolute_paths(args), "input": stdin})
+        client.sendall(f"{request}\n".encode("utf-8"))
+        client.shutdown(socket.SHUT_WR)
+        response = b"".join(iter(lambda: client.recv(65536), b""))
+    return json.loads(response)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answer one command line sent by the CLI."""
+
+    def handle(self) -> None:
+        """Run the command and reply with its output."""
+        request = json.loads(self.rfile.readline())
+        response = self.server.run(args=request["args"], stdin=request["input"])
+        self.wfile.write(json.dumps(response).encode("utf-8"))
+
+
+class NotesServer(socketserver.UnixStreamServer):
+    """
+    Serve CLI commands from a process that keeps notes loaded.
+
+    Commands run one at a time against the same Notes object,
+    so its indexes are built once rather than per command.
+    Before each command the storage directory and settings
+    are checked, and the notes are reloaded if another process
+    has changed them since the last command.
+
+    args:
+        cli: (click.Group)
+            The CLI to run commands with.
+
+        directory: (str)
+            The storage directory
+            to watch for changes.
+
+        reset: (callable)
+            Drops the loaded notes
+            and reads them again.
+
+        settings_file: (str)
+            The settings file to watch
+            for changes, if there is one.
+    """
+
+    def __init__(self, cli, directory: str, reset, settings_file: str = None) -> None:
+        """Initialise the class."""
+        self.cli = cli
+        self.directory = directory
+        self.reset = reset
+        self.settings_file = settings_file
+        self.socket_path = socket_path(directory)
+        os.makedirs(directory, exist_ok=True)
+        self._remove_stale_socket()
+        super().__init__(self.socket_path, _RequestHandler)
+        self.reset()
+        self.state = self.storage_state()
+
+    def _remove_stale_socket(self) -> None:
+        """Remove a socket left by a daemon that did not shut down."""
+        import socket
+
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            try:
+                client.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.remove(self.socket_path)
+                return
+        raise RuntimeError(f"A daemon is already serving {self.socket_path}")
+
+    def storage_state(self) -> tuple:
+        """Return the modification times and sizes of the stored files."""
+        paths = [self.settings_file or "settings.yml", self.directory]
+        if os.path.isdir(self.directory):
+            paths += [
+                entry.path
+                for entry in os.scandir(self.directory)
+                if entry.path != self.socket_path
+                # Reserving ids changes the counter, not the notes.
+                and not entry.name.startswith(ID_COUNTER)
+            ]
+        state = []
+        for path in sorted(paths):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            state.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(state)
+
+    def run(self, args: list, stdin: str = "") -> dict:
+        """
+        Run a command line against the loaded notes.
+
+        A command that fails may have changed the loaded notes
+        without saving them, so they are dropped and read again
+        before the next command.
+
+        args:
+            args: (list)
+                The command line arguments,
+                without the program name.
+
+            stdin: (str)
+                Input for the command.
+
+        returns: (dict)
+            The command's output
+            and exit_code.
+        """
+        from click.testing import CliRunner
+
+        if self.storage_state() != self.state:
+            self.reset()
+        result = CliRunner().invoke(
+            self.cli, args, input=stdin, color=True, obj={"args": args}
+        )
+        output = result.output
+        if result.exit_code != 0:
+            self.reset()
+        if result.exception and not isinstance(result.exception, SystemExit):
+            output += f"Error: {result.exception}\n"
+        self.state = self.storage_state()
+        return {"output": output, "exit_code": result.exit_code}
+
+    def serve(self) -> None:
+        """Serve commands until interrupted, then remove the socket."""
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
@@ -0,0 +1,91 @@
+"""Classes to handle looking notes up by due date."""
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def due_ordinal(due_date: str) -> int:
+    """
+    Return the proleptic Gregorian ordinal of a yyyy-mm-dd date.
+
+    Notes share few distinct due dates, so parsed dates are cached.
+
+    returns: (int)
+        The ordinal, or None if
+        no due date is set.
+    """
+    return date.fromisoformat(due_date).toordinal() if due_date else None
+
+
+@lru_cache(maxsize=4096)
+def due_string(ordinal: int) -> str:
+    """
+    Return the yyyy-mm-dd date of a proleptic Gregorian ordinal.
+
+    returns: (str)
+        The date, or None if
+        no due date is set.
+    """
+    return date.fromordinal(ordinal).isoformat() if ordinal is not None else None
+
+
+class DueIndex:
+    """
+    Note ids sorted by due date.
+
+    Due dates are parsed into ordinals once, when a note is
+    added, and time windows are found by bisecting the sorted
+    entries. Notes without a due date are not indexed.
+
+    args:
+        notes: (iterable)
+            Notes to index.
+    """
+
+    def __init__(self, notes=()) -> None:
+        """Initialise the class."""
+        self.ordinals = {}
+        for note in notes:
+            if note.due is not None:
+                self.ordinals[note.id] = note.due
+        self.entries = sorted(
+            (ordinal, _id) for _id, ordinal in self.ordinals.items()
+        )
+
+    def add(self, note) -> None:
+        """Index a new or updated note."""
+        self.remove(note.id)
+        if note.due is not None:
+            self.ordinals[note.id] = note.due
+            insort(self.entries, (note.due, note.id))
+
+    def remove(self, _id: int) -> None:
+        """Drop a note from the index."""
+        ordinal = self.ordinals.pop(_id, None)
+        if ordinal is not None:
+            del self.entries[bisect_left(self.entries, (ordinal, _id))]
+
+    def window(self, start: int = None, end: int = None) -> list:
+        """
+        Return the ids of notes due between two ordinals.
+
+        args:
+            start: (int)
+                The earliest ordinal to include,
+                or None for no lower bound.
+
+            end: (int)
+                The latest ordinal to include,
+                or None for no upper bound.
+
+        returns: (list)
+            Note ids, soonest due first.
+        """
+        low = 0 if start is None else bisect_left(self.entries, (start,))
+        high = (
+            len(self.entries)
+            if end is None
+            else bisect_right(self.entries, (end, float("inf")))
+        )
+        return [_id for _, _id in self.entries[low:high]]
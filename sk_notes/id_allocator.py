@@ -0,0 +1,114 @@
+"""Classes to hand out note ids that are never reused."""
+from sk_notes.concurrency import StoreLock, atomic_write
+
+# The most ids reserved at once by next_id, as notes are created one by one.
+MAX_BLOCK = 4096
+
+
+class IdAllocator:
+    """
+    A counter of the next note id, stored with the notes.
+
+    The counter only goes up, so ids of deleted notes are
+    never handed out again. It has a lock of its own, so
+    processes creating notes at the same time are given
+    different ids without waiting for each other's saves,
+    and it is replaced atomically and flushed to disk before
+    an id is handed out, so a crash cannot wind it back.
+
+    args:
+        path: (str)
+            The counter file.
+
+        floor: (callable)
+            Returns the id to start at
+            when there is no counter yet,
+            beyond every stored id.
+    """
+
+    def __init__(self, path: str, floor) -> None:
+        """Initialise the class."""
+        self.path = path
+        self.floor = floor
+        self.lock_path = f"{path}.lock"
+        self._block = range(0)
+        self._size = 1
+
+    def _read(self) -> int:
+        """Return the next free id, or None if there is no counter."""
+        try:
+            with open(self.path, "r") as counter:
+                return int(counter.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, next_id: int) -> None:
+        """Replace the counter."""
+        with atomic_write(self.path, mode="w") as counter:
+            counter.write(f"{next_id}\n")
+
+    def reserve(self, count: int = 1) -> range:
+        """
+        Reserve ids for notes about to be created.
+
+        args:
+            count: (int)
+                How many ids to reserve.
+
+        returns: (range)
+            The ids, which no other
+            caller will be given.
+        """
+        with StoreLock(self.lock_path):
+            first = self._read()
+            if first is None:
+                first = self.floor()
+            self._write(first + count)
+        return range(first, first + count)
+
+    def next_id(self) -> int:
+        """
+        Return an id for a new note.
+
+        Ids are reserved in blocks that double in size as they
+        are used up, so creating many notes in one process
+        takes the lock a few times rather than once per note.
+        Ids left over are given back by release.
+        """
+        if not self._block:
+            self._block = self.reserve(self._size)
+            self._size = min(self._size * 2, MAX_BLOCK)
+        _id = self._block[0]
+        self._block = self._block[1:]
+        return _id
+
+    def release(self) -> None:
+        """
+        Give back the ids reserved by next_id but not used.
+
+        They are only given back if nothing was reserved
+        after them, so the counter still only goes up past
+        ids that have been handed out.
+        """
+        block, self._block, self._size = self._block, range(0), 1
+        if not block:
+            return
+        with StoreLock(self.lock_path):
+            if self._read() == block.stop:
+                self._write(block.start)
+
+    def advance(self, past: int) -> None:
+        """
+        Move the counter beyond an id given to a note elsewhere.
+
+        args:
+            past: (int)
+                An id now stored, such
+                as one taken in a sync.
+        """
+        if (self._read() or 0) > past:
+            return
+        with StoreLock(self.lock_path):
+            next_id = self._read()
+            if next_id is None or next_id <= past:
+                self._write(max(next_id or self.floor(), past + 1))
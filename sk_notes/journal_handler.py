@@ -0,0 +1,439 @@
+"""Classes to handle journaled local storage."""
+import os
+import threading
+from typing import Iterator
+
+from sk_notes.codec import dumps, loads
+from sk_notes.concurrency import StoreLock
+from sk_notes.local_handler import LocalHandler
+from sk_notes.note_handler import NewNote
+from sk_notes.snapshot_index import has_tags
+from sk_notes.timeline import DELETED, WRITTEN, changes, note_digests
+
+
+class JournalHandler(LocalHandler):
+    """
+    Local storage that appends each change to a journal.
+
+    Notes are read from the most recent snapshot with the
+    journal replayed over it. Saving appends one record per
+    created, updated or deleted note, so its cost depends on
+    the size of the change rather than the size of the store.
+    Once the journal grows past compact_bytes it is folded
+    into a new snapshot on a background thread.
+
+    Appended records are flushed to disk by sync, after the
+    store lock is released, so processes saving at the same
+    time share one fsync rather than queueing for one each.
+
+    args:
+        directory: (str)
+            The directory notes
+            are stored in.
+
+        retention: (dict)
+            How many snapshots to keep,
+            as keep_last and keep_daily_days.
+
+        compact_bytes: (int)
+            The journal size that
+            triggers compaction.
+
+        compression: (dict)
+            The codec and level to
+            compress snapshots with.
+    """
+
+    def __init__(
+        self,
+        directory: str = None,
+        retention: dict = None,
+        compact_bytes: int = None,
+        compression: dict = None,
+    ) -> None:
+        """Initialise the class."""
+        super().__init__(
+            directory=directory, retention=retention, compression=compression
+        )
+        self.compact_bytes = compact_bytes or 1024 * 1024
+        self.journal_path = os.path.join(self.directory, "journal.log")
+        self.compacting_path = f"{self.journal_path}.compacting"
+        self.synced_path = f"{self.journal_path}.synced"
+        self._lock = threading.Lock()
+        self._compaction = None
+        self._unsynced = None
+
+    def version(self) -> tuple:
+        """Return the current snapshot with the identity and size of each journal."""
+        journals = []
+        for path in (self.compacting_path, self.journal_path):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            journals.append(stat and (stat.st_ino, stat.st_size))
+        return (super().version(), *journals)
+
+    def is_empty(self) -> bool:
+        """Return True if there is no snapshot or journal."""
+        return self.version() == (None, None, None)
+
+    def _read_journal(self, path: str) -> list:
+        """
+        Return the records stored in a journal file.
+
+        A record cut short by a crash mid-append can
+        only be the last line, and is skipped.
+        """
+        try:
+            with open(path, "rb") as journal:
+                lines = journal.readlines()
+        except FileNotFoundError:
+            return []
+
+        records = []
+        for line in lines:
+            try:
+                records.append(loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def _replay(self, notes: list, records: list, matches=None) -> list:
+        """
+        Apply journal records to a list of dict formatted notes.
+
+        args:
+            notes: (list)
+                Notes read from a snapshot.
+
+            records: (list)
+                Journal records to apply
+                in order.
+
+            matches: (callable)
+                For a query, tests whether a
+                journaled note belongs in its
+                result. Notes that no longer
+                match are dropped.
+        """
+        by_id = {note["id"]: note for note in notes}
+        for record in records:
+            if record["op"] == "put" and (matches is None or matches(record["note"])):
+                by_id[record["note"]["id"]] = record["note"]
+            elif record["op"] == "put":
+                by_id.pop(record["note"]["id"], None)
+            elif record["op"] == "delete":
+                by_id.pop(record["id"], None)
+        return list(by_id.values())
+
+    def _replay_journals(self, notes: list, matches=None) -> list:
+        """Apply both journals to notes read from a snapshot."""
+        for path in (self.compacting_path, self.journal_path):
+            notes = self._replay(
+                notes=notes, records=self._read_journal(path), matches=matches
+            )
+        return notes
+
+    def read_note(self, _id: int) -> list:
+        """Read the note with a specified id."""
+        return self._replay_journals(
+            notes=super().read_note(_id=_id),
+            matches=lambda note: note["id"] == _id,
+        )
+
+    def read_notes_by_ids(self, ids: set) -> list:
+        """Read the notes with specified ids."""
+        return self._replay_journals(
+            notes=super().read_notes_by_ids(ids=ids),
+            matches=lambda note: note["id"] in ids,
+        )
+
+    def read_notes_by_category(self, category: str, columns: list = None) -> list:
+        """Read the notes in a specified category."""
+        return self._replay_journals(
+            notes=super().read_notes_by_category(category=category),
+            matches=lambda note: note["category"] == category,
+        )
+
+    def read_notes_by_tags(
+        self, tags: list, match: str = "all", columns: list = None
+    ) -> list:
+        """Read the notes with specified tags."""
+        return self._replay_journals(
+            notes=super().read_notes_by_tags(tags=tags, match=match),
+            matches=lambda note: has_tags(note, tags, match),
+        )
+
+    def read_notes_due(
+        self, start: str = None, end: str = None, columns: list = None
+    ) -> list:
+        """Read the notes due between two dates."""
+
+        def matches(note: dict) -> bool:
+            return bool(
+                note["due_date"]
+                and (start is None or note["due_date"] >= start)
+                and (end is None or note["due_date"] <= end)
+            )
+
+        return self._replay_journals(
+            notes=super().read_notes_due(start=start, end=end),
+            matches=matches,
+        )
+
+    def _pending_revision(self, _id: int, stamp: int) -> dict:
+        """Return the journaled version of a note saved at stamp, if any."""
+        found = None
+        for path in (self.compacting_path, self.journal_path):
+            for record in self._read_journal(path):
+                if record["op"] != "put" or record.get("at") != stamp:
+                    continue
+                if record["note"]["id"] == _id:
+                    found = record["note"]
+        return found
+
+    def _unsnapshotted_changes(self, previous: dict) -> list:
+        """
+        Return timeline records of the journaled changes.
+
+        Records are taken from the journal when each carries the
+        timestamp it was saved at. A journal written before they
+        did is compared with the snapshot instead, and recorded
+        as one change.
+        """
+        records = [
+            record
+            for path in (self.compacting_path, self.journal_path)
+            for record in self._read_journal(path)
+        ]
+        if not all("at" in record for record in records):
+            current = note_digests(self.iter_notes())
+            return changes(self._next_timestamp(), previous=previous, current=current)
+        return [
+            (record["at"], record["note"]["id"], WRITTEN)
+            if record["op"] == "put"
+            else (record["at"], record["id"], DELETED)
+            for record in records
+        ]
+
+    def max_id(self) -> int:
+        """Return the highest id in the snapshot or either journal."""
+        journaled = [
+            record["note"]["id"]
+            for path in (self.compacting_path, self.journal_path)
+            for record in self._read_journal(path)
+            if record["op"] == "put"
+        ]
+        return max([super().max_id(), *journaled])
+
+    def iter_notes(self, columns: list = None) -> Iterator[dict]:
+        """
+        Yield notes from the most recent snapshot and journal.
+
+        The journals are read first, as they are small, and
+        applied to snapshot notes as they stream past. Notes
+        created since the snapshot are yielded last. The
+        journals and snapshot are read when this is called.
+
+        args:
+            columns: (list)
+                The fields the caller needs.
+                Journaled notes are whole, as
+                the journal stores whole notes.
+        """
+        pending = {}
+        for path in (self.compacting_path, self.journal_path):
+            for record in self._read_journal(path):
+                if record["op"] == "put":
+                    pending[record["note"]["id"]] = record["note"]
+                elif record["op"] == "delete":
+                    pending[record["id"]] = None
+
+        return self._iter_replayed(self._iter_stored(columns=columns), pending)
+
+    def _iter_replayed(self, notes, pending: dict) -> Iterator[dict]:
+        """Yield snapshot notes with journaled puts and deletes applied."""
+        for note in notes:
+            if note["id"] not in pending:
+                yield note
+            elif pending[note["id"]] is not None:
+                yield pending.pop(note["id"])
+        yield from (note for note in pending.values() if note is not None)
+
+    def _records(self, changed: list, deleted: set, stamp: int) -> bytes:
+        """Serialise changes as newline delimited journal records."""
+        records = [
+            {"op": "put", "note": note.to_dict(), "at": stamp} for note in changed
+        ]
+        records += [
+            {"op": "delete", "id": _id, "at": stamp} for _id in sorted(deleted)
+        ]
+        return b"".join(dumps(record) + b"\n" for record in records)
+
+    def write_changes(self, data: list, changed: list, deleted: set) -> str:
+        """
+        Append changes to the journal.
+
+        The records are not flushed to disk until sync is called.
+        The changes are added to the timeline a second past the
+        newest snapshot, so the snapshot they are compacted into
+        is the first to hold them. Records carry the same
+        timestamp, so revisions replaced before compaction can
+        still be read from the journal.
+
+        args:
+            data: (list)
+                Every note currently held,
+                used if the journal needs
+                compacting.
+
+            changed: (list)
+                Notes created or updated
+                since the last save.
+
+            deleted: (set)
+                Ids of notes deleted
+                since the last save.
+
+        returns: (str)
+            A message confirming the write
+            location of the notes.
+        """
+        self._set_local_storage()
+        self._recover_compaction()
+        stamp = self._next_timestamp()
+        if self._records_timeline():
+            self.timeline.append(
+                timestamp=stamp,
+                written=[note.id for note in changed],
+                deleted=sorted(deleted),
+            )
+        with self._lock:
+            with open(self.journal_path, mode="ab") as journal:
+                records = self._records(changed=changed, deleted=deleted, stamp=stamp)
+                journal.write(records)
+                journal.flush()
+                size = journal.tell()
+                self._unsynced = (os.fstat(journal.fileno()).st_ino, size)
+
+        if size >= self.compact_bytes:
+            self._compact_in_background(data=data)
+        return f"{len(changed) + len(deleted)} changes written to {self.journal_path}"
+
+    def _read_synced(self) -> tuple:
+        """Return the journal inode and size last flushed to disk."""
+        try:
+            with open(self.synced_path, "r") as synced:
+                inode, size = synced.read().split()
+            return int(inode), int(size)
+        except (FileNotFoundError, ValueError):
+            return None, 0
+
+    def sync(self) -> None:
+        """
+        Flush the records appended by write_changes to disk.
+
+        Writers take turns holding the sync lock. Each flushes
+        every record appended so far and notes how far it got,
+        so a writer whose records were flushed by another while
+        it waited returns without an fsync of its own. Records
+        already folded into a snapshot were flushed with it.
+        """
+        if self._unsynced is None:
+            return
+        inode, size = self._unsynced
+        self._unsynced = None
+        with StoreLock(f"{self.synced_path}.lock"):
+            synced_inode, synced_size = self._read_synced()
+            if synced_inode == inode and synced_size >= size:
+                return
+            for path in (self.journal_path, self.compacting_path):
+                try:
+                    descriptor = os.open(path, os.O_RDONLY)
+                except FileNotFoundError:
+                    continue
+                try:
+                    stat = os.fstat(descriptor)
+                    if stat.st_ino == inode:
+                        os.fsync(descriptor)
+                        with open(self.synced_path, mode="w") as synced:
+                            synced.write(f"{inode} {stat.st_size}")
+                        return
+                finally:
+                    os.close(descriptor)
+
+    def _compacting(self) -> bool:
+        """Return True if this process is compacting the journal."""
+        return self._compaction is not None and self._compaction.is_alive()
+
+    def _recover_compaction(self) -> None:
+        """
+        Fold in a journal left by a compaction that never finished.
+
+        A process that dies while compacting leaves the renamed
+        journal behind. Its records are still replayed by reads,
+        so the notes are read and written to a new snapshot,
+        which removes both journals.
+        """
+        if self._compacting() or not os.path.exists(self.compacting_path):
+            return
+        notes = [NewNote(note=note).dict_to_note() for note in self.iter_notes()]
+        self.write_notes(data=notes)
+
+    def _compact_in_background(self, data: list) -> None:
+        """
+        Fold the journal into a snapshot on a background thread.
+
+        The journal is renamed before the snapshot is written
+        so later saves carry on appending to a fresh journal.
+        A renamed journal left by another process is folded in
+        by the next save instead.
+        The thread is not a daemon, so a CLI process finishes
+        compacting before it exits.
+        """
+        with self._lock:
+            if self._compacting() or os.path.exists(self.compacting_path):
+                return
+            os.replace(self.journal_path, self.compacting_path)
+
+        self._compaction = threading.Thread(
+            target=self._compact,
+            args=(list(data),),
+            name="notes-journal-compaction",
+        )
+        self._compaction.start()
+
+    def _compact(self, data: list) -> None:
+        """
+        Write a snapshot of data and drop the journal it replaces.
+
+        The store lock is taken first. If another process folded
+        in the renamed journal while this thread waited for it,
+        data is out of date and nothing is written.
+        """
+        with StoreLock(self.lock_path):
+            if not os.path.exists(self.compacting_path):
+                return
+            super().write_notes(data=data)
+            os.remove(self.compacting_path)
+
+    def write_notes(self, data: list) -> str:
+        """
+        Write every note to a new snapshot and clear the journal.
+
+        args:
+            data: (list)
+                A list of notes
+                to store locally.
+
+        returns: (str)
+            A message confirming the write
+            location of the notes.
+        """
+        with self._lock:
+            message = super().write_notes(data=data)
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        return message
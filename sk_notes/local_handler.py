@@ -1,22 +1,108 @@
 """Classes to handle interactions with local storage."""
-import json
 import os
 import re
-from dataclasses import asdict
+import shutil
+import tempfile
+from datetime import date, timedelta
+from itertools import chain, islice
 from time import time
+from typing import Iterator
 
-import numpy
+from sk_notes.codec import decode_error, encode_note, loads
+from sk_notes.compression import JSON_EXTENSIONS, open_file, suffix
+from sk_notes.concurrency import StoreLock, atomic_write, fsync_path
+from sk_notes.constants import EXAMPLE_NOTE, ID_COUNTER, STORAGE_DIRECTORY
+from sk_notes.id_allocator import IdAllocator
+from sk_notes.note_handler import NewNote
+from sk_notes.snapshot_index import OffsetTable, SnapshotIndex, has_tags
+from sk_notes.timeline import DELETED, Timeline, changes, note_digests
+from sk_notes.trace import traced
 
-from sk_notes.constants import EXAMPLE_NOTE
+
+def batched(iterable, size: int) -> Iterator[list]:
+    """Yield lists of up to size items from an iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 
 class LocalHandler:
-    """Wrapper around local storage operations."""
+    """
+    Wrapper around local storage operations.
+
+    args:
+        directory: (str)
+            The directory notes
+            are stored in.
+
+        retention: (dict)
+            How many snapshots to keep,
+            as keep_last and keep_daily_days.
+            All snapshots are kept if unset.
+
+        compression: (dict)
+            The codec and level to compress
+            snapshots with. Snapshots are
+            uncompressed if unset, and read
+            whatever they were written with.
+    """
 
-    def __init__(self, directory: str = None) -> None:
+    # Whether one note can be read and rewritten without reading the rest.
+    writes_rows = False
+
+    def __init__(
+        self, directory: str = None, retention: dict = None, compression: dict = None
+    ) -> None:
         """Initialise the class."""
-        self.directory = directory or ".notes_storage"
+        self.directory = directory or STORAGE_DIRECTORY
         self.file_prefix = "local_stored_notes"
+        self.codec = (compression or {}).get("codec")
+        self.level = (compression or {}).get("level")
+        self.extension = f"json{suffix(self.codec)}"
+        self.read_extensions = JSON_EXTENSIONS
+        self.pointer_path = os.path.join(self.directory, "CURRENT")
+        self.lock_path = os.path.join(self.directory, "LOCK")
+        self.timeline = Timeline(os.path.join(self.directory, "TIMELINE"))
+        self.ids = IdAllocator(
+            path=os.path.join(self.directory, ID_COUNTER), floor=self._first_free_id
+        )
+        self.retention = retention or {}
+
+    def lock(self) -> StoreLock:
+        """
+        Return a lock to hold while reading and writing the store.
+
+        Holding it from reading the version to writing changes
+        stops another process saving in between.
+        """
+        return StoreLock(self.lock_path)
+
+    def version(self) -> str:
+        """
+        Return a value that changes whenever the stored notes change.
+
+        returns: (str)
+            The name of the current snapshot,
+            or None if none is stored.
+        """
+        file_path = self._current_snapshot()
+        return file_path and os.path.basename(file_path)
+
+    def is_empty(self) -> bool:
+        """Return True if nothing is stored, so reads return the example note."""
+        return self.version() is None
+
+    def sync(self) -> None:
+        """
+        Make the last write durable, once the store lock is released.
+
+        Snapshots are flushed to disk as they are written,
+        so there is nothing left to do. Handlers that defer
+        flushing override it.
+        """
 
     def _set_local_storage(self) -> str:
         """Create local storage directory if not exists."""
@@ -47,10 +133,65 @@ class LocalHandler:
             raise Exception(err)
 
     def _set_outfile_path(self) -> str:
-        """Return a file path to write notes to."""
+        """
+        Return a file path to write notes to.
+
+        The timestamp is moved past the newest snapshot's, so
+        saves within the same second never share a file. Writers
+        hold the store lock, so neither do concurrent saves.
+        """
         directory = self._set_local_storage()
-        now = int(time())
-        return os.path.join(directory, f"{self.file_prefix}-{now}.json")
+        timestamp = self._next_timestamp()
+        return self._snapshot_path(timestamp=timestamp, directory=directory)
+
+    def _next_timestamp(self) -> int:
+        """
+        Return now, or a second past the newest snapshot if that is later.
+
+        Every write points CURRENT at the snapshot it wrote, so the
+        newest snapshot is read from it rather than by listing storage.
+        """
+        current = self._current_snapshot()
+        newest = self._snapshot_timestamp(current) if current else -1
+        return max(int(time()), newest + 1)
+
+    def _snapshot_timestamp(self, file_path: str) -> int:
+        """Return the timestamp in the name of a snapshot."""
+        return self._clean_note_file_names([os.path.basename(file_path)])[0]
+
+    def _snapshot_path(
+        self, timestamp: int, directory: str = None, extension: str = None
+    ) -> str:
+        """Return the path of the snapshot written at a timestamp."""
+        directory = directory or self.directory
+        extension = extension or self.extension
+        return os.path.join(directory, f"{self.file_prefix}-{timestamp}.{extension}")
+
+    def _stored_snapshot_path(self, timestamp: int) -> str:
+        """
+        Return the path of the stored snapshot written at a timestamp.
+
+        Handlers can read snapshots in more than one format,
+        so each readable extension is tried in turn.
+
+        returns: (str)
+            The path, or None if no readable
+            snapshot has the timestamp.
+        """
+        for extension in self.read_extensions:
+            file_path = self._snapshot_path(timestamp=timestamp, extension=extension)
+            if os.path.isfile(file_path):
+                return file_path
+        return None
+
+    def _snapshot_files(self) -> list:
+        """Return the names of every readable snapshot file in storage."""
+        endings = tuple(f".{extension}" for extension in self.read_extensions)
+        return [
+            file
+            for file in os.listdir(self.directory)
+            if file.startswith(self.file_prefix) and file.endswith(endings)
+        ]
 
     def _clean_note_file_names(self, notes: list) -> list:
         """
@@ -65,7 +206,8 @@ class LocalHandler:
             A list of datetimes
             extracted from file names.
         """
-        rx = ".*([0-9]{10}).json"
+        extensions = "|".join(re.escape(ending) for ending in self.read_extensions)
+        rx = f".*([0-9]{{10}})\\.({extensions})$"
         return [int(re.search(rx, note).group(1)) for note in notes]
 
     def _find_nearest_date(self, dates: list, date: int) -> list:
@@ -83,6 +225,8 @@ class LocalHandler:
                 a reference to find
                 the closest date to.
         """
+        import numpy
+
         dates = numpy.asarray(dates)
         index = (numpy.abs(dates - date)).argmin()
         return dates[index]
@@ -103,10 +247,385 @@ class LocalHandler:
 
         """
         file_path = self._set_outfile_path()
-        with open(file_path, mode="w") as file:
-            json.dump([asdict(row) for row in data], file)
+        self._write_staged(file_path=file_path, data=data)
+        self._set_current_snapshot(file_name=os.path.basename(file_path))
+        self.prune()
         return f"Notes written to {file_path}"
 
+    def _write_staged(self, file_path: str, data: list) -> None:
+        """
+        Write a snapshot and its indexes so they appear whole or not at all.
+
+        The files are written to a staging directory in storage,
+        flushed to disk, and renamed into place with the snapshot
+        last. If writing raises, nothing is left behind.
+        """
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.directory)
+        try:
+            staged_path = os.path.join(staging, os.path.basename(file_path))
+            self._write_snapshot(file_path=staged_path, data=data)
+            for path in self._staged_files(staged_path):
+                if os.path.exists(path):
+                    fsync_path(path)
+                    target = os.path.join(self.directory, os.path.basename(path))
+                    os.replace(path, target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        fsync_path(self.directory)
+
+    def max_id(self) -> int:
+        """
+        Return the highest stored note id.
+
+        The last entry of the current snapshot's offset table
+        is read when it has one. Otherwise only the id of each
+        note is kept as the notes stream past.
+
+        returns: (int)
+            The highest id, or 0 if
+            no notes are stored.
+        """
+        file_path = self._current_snapshot()
+        offsets_path = file_path and self._index_path(file_path, kind="offsets")
+        if offsets_path and os.path.isfile(offsets_path):
+            return OffsetTable(offsets_path).last_id() or 0
+        return max((note["id"] for note in self.iter_notes(columns=["id"])), default=0)
+
+    def _first_free_id(self) -> int:
+        """
+        Return the id to start the id counter at.
+
+        It is beyond every stored id and every id in the
+        timeline, so the ids of notes deleted before the
+        counter was started are not handed out again.
+        """
+        recorded = self.timeline.max_id() if self.timeline.exists() else 0
+        return max(self.max_id(), recorded) + 1
+
+    def append_notes(self, notes) -> str:
+        """
+        Write a new snapshot of the stored notes followed by more notes.
+
+        Stored notes are streamed from the current snapshot
+        into the new one, so neither they nor the appended notes
+        are all held in memory. If notes raises part way
+        through, nothing is written.
+
+        args:
+            notes: (iterable)
+                Notes with ids above
+                every stored id.
+
+        returns: (str)
+            A message confirming the write
+            location of the notes.
+        """
+        recorded = self._records_timeline()
+        appended = []
+
+        def tracked(notes):
+            for note in notes:
+                appended.append(note.id)
+                yield note
+
+        stored = (NewNote(note=note).dict_to_note() for note in self.iter_notes())
+        message = self.write_notes(data=chain(stored, tracked(notes)))
+        if recorded:
+            timestamp = self._snapshot_timestamp(self._current_snapshot())
+            self.timeline.append(timestamp=timestamp, written=appended, deleted=())
+        return message
+
+    def _set_current_snapshot(self, file_name: str) -> None:
+        """
+        Point CURRENT at the most recently written snapshot.
+
+        The pointer is written to a temporary file and renamed
+        over CURRENT, so readers see either the old or the new
+        snapshot name and never a partial one.
+        """
+        with atomic_write(self.pointer_path) as pointer:
+            pointer.write(file_name)
+
+    @traced("storage.locate")
+    def _current_snapshot(self) -> str:
+        """
+        Return the path of the most recent snapshot.
+
+        CURRENT is read when it exists. Storage written before
+        CURRENT was introduced falls back to scanning the
+        directory for the latest timestamp.
+
+        returns: (str)
+            The snapshot path, or None if
+            no snapshot has been written.
+        """
+        try:
+            with open(self.pointer_path, "r") as pointer:
+                file_path = os.path.join(self.directory, pointer.read().strip())
+            if os.path.isfile(file_path):
+                return file_path
+        except FileNotFoundError:
+            pass
+
+        file_time = self._find_most_recent_file_timestamp()
+        if file_time:
+            return self._stored_snapshot_path(timestamp=file_time)
+        return None
+
+    def snapshot_timestamps(self) -> list:
+        """Return the timestamps of every stored snapshot, newest first."""
+        try:
+            snapshots = self._snapshot_files()
+        except FileNotFoundError:
+            return []
+        return sorted(set(self._clean_note_file_names(snapshots)), reverse=True)
+
+    def _retained(self, timestamps: list) -> set:
+        """
+        Return the snapshot timestamps kept by the retention policy.
+
+        The newest keep_last snapshots are kept, along with the
+        newest snapshot of each day for the last keep_daily_days.
+
+        args:
+            timestamps: (list)
+                Snapshot timestamps,
+                newest first.
+        """
+        keep = set(timestamps[: self.retention.get("keep_last") or 1])
+        keep_daily_days = self.retention.get("keep_daily_days") or 0
+        oldest_day = date.today() - timedelta(days=keep_daily_days)
+        days = set()
+        for timestamp in timestamps:
+            day = date.fromtimestamp(timestamp)
+            if day > oldest_day and day not in days:
+                days.add(day)
+                keep.add(timestamp)
+        return keep
+
+    def prune(self) -> list:
+        """
+        Delete snapshots that fall outside the retention policy.
+
+        returns: (list)
+            The paths of deleted snapshots.
+        """
+        if not self.retention:
+            return []
+
+        timestamps = self.snapshot_timestamps()
+        keep = self._retained(timestamps=timestamps)
+        current = self._current_snapshot()
+        deleted = []
+        for timestamp in timestamps:
+            if timestamp in keep:
+                continue
+            file_path = self._stored_snapshot_path(timestamp=timestamp)
+            if file_path != current:
+                os.remove(file_path)
+                for index_path in self._index_paths(file_path):
+                    if os.path.exists(index_path):
+                        os.remove(index_path)
+                deleted.append(file_path)
+        return deleted
+
+    def write_changes(self, data: list, changed: list, deleted: set) -> str:
+        """
+        Persist the changes made to notes since they were read.
+
+        Snapshot storage has no cheaper way to record a change
+        than writing every note, so this writes all of data.
+        Handlers that can store changes on their own override it.
+        The changed notes are added to the timeline under the
+        new snapshot's timestamp.
+
+        args:
+            data: (list)
+                Every note currently held.
+
+            changed: (list)
+                Notes created or updated
+                since the last save.
+
+            deleted: (set)
+                Ids of notes deleted
+                since the last save.
+
+        returns: (str)
+            A message confirming the write
+            location of the notes.
+        """
+        recorded = self._records_timeline()
+        message = self.write_notes(data=data)
+        if recorded:
+            self.timeline.append(
+                timestamp=self._snapshot_timestamp(self._current_snapshot()),
+                written=[note.id for note in changed],
+                deleted=sorted(deleted),
+            )
+        return message
+
+    def _records_timeline(self) -> bool:
+        """
+        Return True if the next save should be added to the timeline.
+
+        A store saved before the timeline existed has a history
+        the timeline does not cover yet, so nothing is added to
+        it until it has been rebuilt from the snapshots.
+        """
+        return self.timeline.exists() or self.is_empty()
+
+    def history(self) -> Timeline:
+        """
+        Return the timeline, building it from the snapshots if needed.
+
+        raises: (ValueError)
+            If the store keeps
+            no snapshots.
+        """
+        if not self.timeline.exists():
+            with self.lock():
+                if not self.timeline.exists():
+                    self._rebuild_timeline()
+        return self.timeline
+
+    def _rebuild_timeline(self) -> None:
+        """
+        Write the timeline of a store saved before it existed.
+
+        Every snapshot is read once, oldest first, and each note
+        that differs from the snapshot before is recorded under
+        the snapshot's timestamp.
+        """
+        records, previous = [], {}
+        for timestamp in sorted(self.snapshot_timestamps()):
+            file_path = self._stored_snapshot_path(timestamp=timestamp)
+            current = note_digests(self._iter_snapshot(file_path=file_path))
+            records += changes(timestamp=timestamp, previous=previous, current=current)
+            previous = current
+        records += self._unsnapshotted_changes(previous=previous)
+        self.timeline.write(records)
+
+    def _unsnapshotted_changes(self, previous: dict) -> list:
+        """
+        Return timeline records of saves not yet written to a snapshot.
+
+        Every save writes a snapshot, so there are none. Handlers
+        that hold changes outside snapshots override it.
+
+        args:
+            previous: (dict)
+                Digests of the notes in the
+                newest snapshot, keyed by id.
+        """
+        return []
+
+    def read_revision(self, _id: int, revision: int) -> dict:
+        """
+        Read a note as it was at one of its revisions.
+
+        A revision is read from a snapshot written between it
+        and the next revision of the note, found from their
+        timestamps, so only that note of that snapshot is read.
+        The latest revision is the stored note.
+
+        args:
+            _id: (int)
+                The id of the note.
+
+            revision: (int)
+                The revision to read,
+                counting from 1.
+
+        returns: (dict)
+            The dict formatted note.
+
+        raises: (ValueError)
+            If the note has no such revision,
+            it deleted the note, or no snapshot
+            holding it has been retained.
+        """
+        revisions = self.history().revisions(_id)
+        if not 1 <= revision <= len(revisions):
+            raise ValueError(f"Note {_id} has no revision {revision}")
+        stamp, kind = revisions[revision - 1]
+        if kind == DELETED:
+            raise ValueError(f"Revision {revision} of note {_id} deleted it")
+        if revision == len(revisions):
+            return self.read_note(_id=_id)[0]
+        until = revisions[revision][0]
+        found = self._pending_revision(_id=_id, stamp=stamp)
+        file_path = not found and self._revision_snapshot(stamp=stamp, until=until)
+        if file_path:
+            found = next(iter(self._read_indexed(file_path=file_path, ids={_id})), None)
+        if not found:
+            raise ValueError(f"Revision {revision} of note {_id} is no longer retained")
+        return found
+
+    def _revision_snapshot(
+        self, stamp: int, until: int = None, timestamps: list = None
+    ) -> str:
+        """
+        Return the first snapshot written from stamp up to, but not at, until.
+
+        args:
+            timestamps: (list)
+                The stored snapshot timestamps,
+                newest first, as snapshot_timestamps
+                returns. Listed if not given.
+        """
+        if timestamps is None:
+            timestamps = self.snapshot_timestamps()
+        for timestamp in reversed(timestamps):
+            if stamp <= timestamp and (until is None or timestamp < until):
+                return self._stored_snapshot_path(timestamp=timestamp)
+        return None
+
+    def _pending_revision(self, _id: int, stamp: int) -> dict:
+        """
+        Return a revision saved but not yet written to a snapshot.
+
+        Every save writes a snapshot, so there are none. Handlers
+        that hold changes outside snapshots override it.
+        """
+        return None
+
+    def retained(
+        self, _id: int, stamp: int, until: int = None, timestamps: list = None
+    ) -> bool:
+        """
+        Return True if the revision of a note saved at stamp can be read.
+
+        args:
+            timestamps: (list)
+                The stored snapshot timestamps,
+                so callers checking many revisions
+                list storage once. Listed if not given.
+        """
+        return bool(
+            self._revision_snapshot(stamp=stamp, until=until, timestamps=timestamps)
+            or self._pending_revision(_id=_id, stamp=stamp)
+        )
+
+    def snapshot_at(self, timestamp: int) -> int:
+        """
+        Return the timestamp of the newest snapshot written by a time.
+
+        raises: (ValueError)
+            If every snapshot
+            is newer.
+        """
+        for stamp in self.snapshot_timestamps():
+            if stamp <= timestamp:
+                return stamp
+        raise ValueError("No snapshot that old has been retained")
+
+    def read_snapshot_notes(self, timestamp: int, ids: set) -> list:
+        """Read the notes with specified ids from the snapshot at a timestamp."""
+        file_path = self._stored_snapshot_path(timestamp=timestamp)
+        return self._read_indexed(file_path=file_path, ids=set(ids))
+
+    @traced("storage.scan")
     def _find_most_recent_file_timestamp(self) -> int:
         """
         Get the most recent timestamp from a list of file names.
@@ -115,7 +634,7 @@ class LocalHandler:
             The most recent timestamp.
         """
         try:
-            stored_notes = os.listdir(self.directory)
+            stored_notes = self._snapshot_files()
             dates = self._clean_note_file_names(stored_notes)
             return self._find_nearest_date(dates=dates, date=int(time()))
         except FileNotFoundError:
@@ -125,20 +644,269 @@ class LocalHandler:
         except Exception as err:
             raise Exception(err)
 
-    def read_notes(self) -> list:
+    def _index_path(self, file_path: str, kind: str) -> str:
+        """Return the path of an index stored next to a snapshot."""
+        directory, file_name = os.path.split(file_path)
+        return os.path.join(directory, f"{file_name.split('.', 1)[0]}.{kind}")
+
+    def _index_paths(self, file_path: str) -> list:
+        """Return the paths of every index stored next to a snapshot."""
+        return [self._index_path(file_path, kind=kind) for kind in ("index", "offsets")]
+
+    def _staged_files(self, file_path: str) -> list:
+        """Return the files written with a snapshot, in the order they are placed."""
+        return [*self._index_paths(file_path), file_path]
+
+    def _write_snapshot(self, file_path: str, data: list) -> None:
+        """
+        Serialise notes into a JSON snapshot and index it.
+
+        Each note is written on its own line of the JSON array,
+        and its byte range recorded in an offset table, so that
+        notes found in the tag and category indexes can be read
+        without parsing the rest of the snapshot. A compressed
+        snapshot cannot be read from an offset, so it has none.
+        """
+        index = SnapshotIndex()
+        offsets = []
+        compressed = bool(suffix(self.codec))
+        with open_file(file_path, "wb", codec=self.codec, level=self.level) as file:
+            file.write(b"[")
+            separator = b"\n"
+            for row in data:
+                file.write(separator)
+                record = encode_note(row)
+                offsets.append((row.id, file.tell(), len(record)))
+                file.write(record)
+                index.add(row)
+                separator = b",\n"
+            file.write(b"\n]\n")
+
+        if not compressed:
+            OffsetTable(self._index_path(file_path, kind="offsets")).write(offsets)
+        index.write(self._index_path(file_path, kind="index"))
+
+    def _read_indexed(self, file_path: str, ids: set) -> list:
+        """
+        Read only the notes with the given ids from a snapshot.
+
+        A snapshot without an offset table, as compressed
+        snapshots are written, is read through to find them.
+
+        args:
+            file_path: (str)
+                The snapshot to read.
+
+            ids: (set)
+                The ids of notes to read.
+        """
+        offsets_path = self._index_path(file_path, kind="offsets")
+        if not os.path.isfile(offsets_path):
+            notes = self._iter_snapshot(file_path=file_path)
+            return [note for note in notes if note["id"] in ids]
+        ranges = OffsetTable(offsets_path).lookup(ids)
+        notes = []
+        with open(file_path, "rb") as file:
+            for offset, length in ranges:
+                file.seek(offset)
+                notes.append(self._decode(file.read(length), source=file_path))
+        return notes
+
+    def _snapshot_index(self, file_path: str) -> SnapshotIndex:
+        """
+        Return the tag and category indexes of a snapshot.
+
+        returns: (SnapshotIndex)
+            The indexes, or None for a
+            snapshot written without them.
+        """
+        index_path = self._index_path(file_path, kind="index")
+        if not os.path.isfile(index_path):
+            return None
+        return SnapshotIndex().read(index_path)
+
+    def _decode(self, data: bytes, source: str, line: int = None):
+        """
+        Parse JSON read from a snapshot.
+
+        raises: (CorruptNoteError)
+            If it is not valid JSON,
+            naming the file and line.
+        """
+        try:
+            return loads(data)
+        except ValueError as err:
+            raise decode_error(source, line=line, err=err) from None
+
+    def _iter_snapshot(self, file_path: str, columns: list = None) -> Iterator[dict]:
+        """
+        Yield the notes in a JSON snapshot one at a time.
+
+        Snapshots hold one note per line, so only the note
+        being parsed is in memory, and fields outside columns
+        are dropped as each note is read. Snapshots written
+        as a single line are parsed whole, and compressed
+        snapshots are decompressed with the codec detected.
+        Lines are parsed as UTF-8 bytes, with orjson when it
+        is installed.
+        """
+        with open_file(file_path, "rb") as notes_file:
+            if notes_file.readline().strip() != b"[":
+                notes_file.seek(0)
+                notes = self._decode(notes_file.read(), source=file_path)
+            else:
+                notes = (
+                    self._decode(line.rstrip().rstrip(b","), file_path, line=number)
+                    for number, line in enumerate(notes_file, start=2)
+                    if line.strip() not in (b"", b"]")
+                )
+            for note in notes:
+                if columns:
+                    note = {key: note[key] for key in columns if key in note}
+                yield note
+
+    def _read_snapshot(self, file_path: str, columns: list = None) -> list:
+        """Deserialise the notes in a JSON snapshot."""
+        return list(self._iter_snapshot(file_path=file_path, columns=columns))
+
+    def _iter_stored(self, columns: list = None) -> Iterator[dict]:
+        """
+        Iterate over the notes in the most recent snapshot, or the example note.
+
+        The snapshot is chosen when this is called rather than when
+        iteration starts, so a snapshot written while the notes are
+        being read is never mistaken for the one being read.
+        """
+        file = self._current_snapshot()
+        if file:
+            return self._iter_snapshot(file_path=file, columns=columns)
+        return iter(EXAMPLE_NOTE)
+
+    def iter_notes(self, columns: list = None) -> Iterator[dict]:
+        """
+        Yield notes from the most recent local file one at a time.
+
+        Callers that stop early, or keep only some of the notes,
+        never hold the whole store in memory.
+
+        args:
+            columns: (list)
+                The fields the caller needs.
+                Handlers may return more.
+        """
+        return self._iter_stored(columns=columns)
+
+    def read_notes(self, columns: list = None) -> list:
         """
         Read notes from most recent local file.
 
+        args:
+            columns: (list)
+                The fields the caller needs.
+                Handlers may return more.
+
         returns: (list)
             A list of dictionaries containing
             notes if historical notes are found,
             or the example note.
         """
-        file_time = self._find_most_recent_file_timestamp()
-        if file_time:
-            file = f"{self.directory}/{self.file_prefix}-{file_time}.json"
-            with open(file, "r") as notes_file:
-                notes = json.load(notes_file)
-            return notes
-        else:
-            return EXAMPLE_NOTE
+        return list(self.iter_notes(columns=columns))
+
+    def read_note(self, _id: int) -> list:
+        """
+        Read the note with a specified id.
+
+        The snapshot's offset table is used when it has one,
+        so only that note is parsed.
+
+        returns: (list)
+            A list holding the matching
+            dict formatted note, if any.
+        """
+        file_path = self._current_snapshot()
+        if file_path:
+            return self._read_indexed(file_path, ids={_id})
+        return [note for note in self._iter_stored() if note["id"] == _id]
+
+    def read_notes_by_ids(self, ids: set) -> list:
+        """
+        Read the notes with specified ids.
+
+        Only the snapshot's offset table is consulted, not its
+        tag and category indexes, so a lookup never parses more
+        than the notes asked for.
+        """
+        file_path = self._current_snapshot()
+        if file_path:
+            return self._read_indexed(file_path, ids=set(ids))
+        return [note for note in self._iter_stored() if note["id"] in ids]
+
+    def read_notes_by_category(self, category: str, columns: list = None) -> list:
+        """
+        Read the notes in a specified category.
+
+        The snapshot's category index is used when it has one,
+        so notes in other categories are never parsed.
+        """
+        file_path = self._current_snapshot()
+        index = file_path and self._snapshot_index(file_path)
+        if index:
+            return self._read_indexed(file_path, ids=index.ids_for_category(category))
+        return [note for note in self._iter_stored() if note["category"] == category]
+
+    def read_notes_by_tags(
+        self, tags: list, match: str = "all", columns: list = None
+    ) -> list:
+        """
+        Read the notes with specified tags.
+
+        The snapshot's tag index is used when it has one, so
+        matching is a set intersection or union of note ids
+        and notes without the tags are never parsed.
+
+        args:
+            tags: (list)
+                The tags to look for.
+
+            match: (str)
+                "all" for notes with every
+                tag, or "any" for notes with
+                at least one.
+
+            columns: (list)
+                The fields the caller needs.
+                Handlers may return more.
+        """
+        file_path = self._current_snapshot()
+        index = file_path and self._snapshot_index(file_path)
+        if index:
+            ids = index.ids_for_tags(tags, match=match)
+            return self._read_indexed(file_path, ids=ids)
+        return [note for note in self._iter_stored() if has_tags(note, tags, match)]
+
+    def read_notes_due(
+        self, start: str = None, end: str = None, columns: list = None
+    ) -> list:
+        """
+        Read the notes due between two dates.
+
+        args:
+            start: (str)
+                The earliest due date
+                to include, yyyy-mm-dd.
+
+            end: (str)
+                The latest due date
+                to include, yyyy-mm-dd.
+
+            columns: (list)
+                The fields the caller needs.
+                Handlers may return more.
+        """
+        return [
+            note
+            for note in self._iter_stored()
+            if note["due_date"]
+            and (start is None or note["due_date"] >= start)
+            and (end is None or note["due_date"] <= end)
+        ]
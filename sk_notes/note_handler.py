@@ -1,27 +1,161 @@
 """Classes to handle note creation, deletion, and restoration."""
 import re
-from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
+from functools import total_ordering
+from itertools import islice
+from sys import intern
 from time import time
+from typing import Iterator
 
 from colorama import Fore
 
-from editor import edit
+from sk_notes import trace
+from sk_notes.codec import corrupt_note
+from sk_notes.due_index import due_ordinal, due_string
+from sk_notes.output import write_chunks
 
-import inquirer
+# How many note summaries are rendered into each write.
+CHUNK_NOTES = 500
 
+# Types a stored field may have, checked as notes are loaded.
+INTEGER = (int, type(None))
+TEXT = (str, type(None))
+LIST = (list, type(None))
 
-@dataclass(order=True)
+
+@total_ordering
 class Note:
-    """Class defining a note."""
+    """
+    Class defining a note.
+
+    Notes are slotted, so they carry no per-instance dict.
+    Categories and tags are interned and tags held as a tuple,
+    so notes share their strings, and due dates are held as
+    date ordinals. The attributes read and set as before.
+    """
 
-    id: int
-    created_at: int
-    category: str
-    title: str
-    body: str
-    tags: list
-    due_date: str
+    __slots__ = ("id", "created_at", "_category", "title", "body", "_tags", "due")
+    fields = ("id", "created_at", "category", "title", "body", "tags", "due_date")
+
+    def __init__(
+        self,
+        id: int,
+        created_at: int,
+        category: str,
+        title: str,
+        body: str,
+        tags: tuple,
+        due_date: str,
+    ) -> None:
+        """Initialise the class."""
+        self.id = id
+        self.created_at = created_at
+        self.category = category
+        self.title = title
+        self.body = body
+        self.tags = tags
+        self.due_date = due_date
+
+    @property
+    def category(self) -> str:
+        """Return the category of the note."""
+        return self._category
+
+    @category.setter
+    def category(self, category: str) -> None:
+        self._category = intern(category) if category else category
+
+    @property
+    def tags(self) -> tuple:
+        """Return the tags of the note."""
+        return self._tags
+
+    @tags.setter
+    def tags(self, tags: list) -> None:
+        self._tags = tuple(map(intern, tags)) if tags else ()
+
+    @property
+    def due_date(self) -> str:
+        """Return the due date of the note, yyyy-mm-dd."""
+        return due_string(self.due)
+
+    @due_date.setter
+    def due_date(self, due_date: str) -> None:
+        self.due = due_ordinal(due_date)
+
+    @classmethod
+    def from_record(cls, record: dict) -> "Note":
+        """
+        Return a Note from a dict formatted note, checking its schema.
+
+        Notes read with only some columns, such as the
+        id, title and due date needed to list them,
+        have their other fields left empty.
+
+        raises: (CorruptNoteError)
+            If the note does not
+            fit the schema.
+        """
+        try:
+            get = record.get
+            if (
+                type(record["id"]) is int
+                and type(get("created_at")) in INTEGER
+                and type(get("category")) in TEXT
+                and type(get("title")) in TEXT
+                and type(get("body")) in TEXT
+                and type(get("tags")) in LIST
+            ):
+                # Slots are set directly rather than through __init__.
+                # Tags that are not strings, and dates that are not
+                # yyyy-mm-dd, raise as they are interned and parsed.
+                note = cls.__new__(cls)
+                note.id = record["id"]
+                note.created_at = get("created_at")
+                category = get("category")
+                note._category = intern(category) if category else category
+                note.title = get("title")
+                note.body = get("body")
+                tags = get("tags")
+                note._tags = tuple(map(intern, tags)) if tags else ()
+                note.due = due_ordinal(get("due_date"))
+                return note
+        except (AttributeError, KeyError, TypeError, ValueError):
+            pass
+        raise corrupt_note(record)
+
+    def astuple(self) -> tuple:
+        """Return the fields of the note in order."""
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def to_dict(self) -> dict:
+        """Return the note as a dict, with tags as a list."""
+        return {
+            "id": self.id,
+            "created_at": self.created_at,
+            "category": self._category,
+            "title": self.title,
+            "body": self.body,
+            "tags": list(self._tags),
+            "due_date": due_string(self.due),
+        }
+
+    def __eq__(self, other) -> bool:
+        """Return True if every field matches."""
+        if not isinstance(other, Note):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __lt__(self, other) -> bool:
+        """Order notes by their fields, id first."""
+        if not isinstance(other, Note):
+            return NotImplemented
+        return self.astuple() < other.astuple()
+
+    def __repr__(self) -> str:
+        """Return the fields of the note."""
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.fields)
+        return f"Note({fields})"
 
 
 class NewNote:
@@ -43,22 +177,22 @@ class NewNote:
         self.note = note
 
     def dict_to_note(self) -> Note:
-        """Convert a note from a dict into a Note object."""
-        return Note(
-            id=self.note["id"],
-            created_at=self.note["created_at"],
-            category=self.note["category"],
-            title=self.note["title"],
-            body=self.note["body"],
-            tags=self.note["tags"],
-            due_date=self.note["due_date"],
-        )
+        """
+        Convert a note from a dict into a Note object.
+
+        raises: (CorruptNoteError)
+            If the note does not
+            fit the schema.
+        """
+        return Note.from_record(self.note)
 
 
 class CreateNote:
     """Wrapper around note creation."""
 
-    def __init__(self, categories: list = None, data: list = None) -> None:
+    def __init__(
+        self, categories: list = None, data: dict = None, ids=None
+    ) -> None:
         """
         Initialise the class.
 
@@ -66,27 +200,47 @@ class CreateNote:
             The options for aggregating
             your notes by.
 
-        data: (list)
-            A list of dicts storing
-            your notes.
+        data: (dict)
+            Your notes, keyed
+            by their id.
+
+        ids: (IdAllocator)
+            The store's id counter, or
+            None to count up from the
+            highest id in data.
         """
         self.categories = categories or ["Personal", "Work"]
         self.data = data
+        self.ids = ids
+        self.max_id = None
 
     def _find_max_id(self):
-        """Return the highest id in list of notes."""
-        ids = [note.id for note in self.data]
-        return max(ids) if ids else 0
+        """Return the highest id in the notes."""
+        return max(self.data, default=0)
 
     def _set_id(self):
         """
-        Read list of notes and create an ID of max ID + 1.
+        Create an ID for a new note.
+
+        The id comes from the store's id counter, so it is
+        never one a deleted note had or one another process
+        is creating. Without a counter, the highest id is
+        found once and then counted up from for each note.
 
         returns: (int)
             A suitable ID to
             use with a new note.
         """
-        return self._find_max_id() + 1
+        if self.ids is not None:
+            _id = self.ids.next_id()
+            # Skip ids stored by a process that did not use the counter.
+            while self.data and _id in self.data:
+                _id = self.ids.next_id()
+            return _id
+        if self.max_id is None:
+            self.max_id = self._find_max_id()
+        self.max_id += 1
+        return self.max_id
 
     def _set_title(self):
         """Set the title for a note based on user input."""
@@ -102,6 +256,8 @@ class CreateNote:
 
     def _set_category(self):
         """Set the category of a note from user selection."""
+        import inquirer
+
         categories = [
             inquirer.List(
                 "category",
@@ -114,6 +270,8 @@ class CreateNote:
 
     def _set_body(self):
         """Set the body of a note based on user input."""
+        from editor import edit
+
         while True:
             body = (
                 edit(contents="# Lines starting with a '#' will be ignored. ")
@@ -172,24 +330,19 @@ class UpdateNote:
     Wrapper around locating and updating notes.
 
     args:
-        data: (list)
-            A list of dicts storing
-            your notes.
+        data: (dict)
+            Your notes, keyed
+            by their id.
     """
 
-    def __init__(self, categories: list = None, data: list = None) -> None:
+    def __init__(self, categories: list = None, data: dict = None) -> None:
         """Initialise the class."""
         self.data = data
         self.create_note = CreateNote(categories=categories, data=self.data)
 
-    def find_index(self, _id: int) -> int:
+    def _find_note(self, _id: int) -> Note:
         """Return a note by a specified ID."""
-        index = [self.data.index(row) for row in self.data if row.id == _id]
-        return index[0] if isinstance(index, list) else index
-
-    def _find_note(self, _id: int) -> dict:
-        index = self.find_index(_id=_id)
-        return self.data[index]
+        return self.data[_id]
 
     def _update_field(self, _id: int, field: str) -> str:
         """
@@ -207,6 +360,8 @@ class UpdateNote:
             The string updated by the
             user for the specified field.
         """
+        from editor import edit
+
         note = self._find_note(_id=_id)
         content = getattr(note, field)
         updated_content = edit(contents=content).decode("utf-8")
@@ -222,6 +377,8 @@ class UpdateNote:
 
     def _update_tags(self, _id) -> list:
         """Update tags for a note."""
+        from editor import edit
+
         tag_string = ""
         tags = self._find_note(_id=_id).tags
         for tag in tags:
@@ -260,7 +417,7 @@ class UpdateNote:
     def update_tags(self, _id) -> dict:
         """Update the tags for a note."""
         note = self._find_note(_id=_id)
-        note.tags = (self._update_tags(_id=_id),)
+        note.tags = self._update_tags(_id=_id)
         return note
 
     def update_date(self, _id) -> dict:
@@ -275,26 +432,31 @@ class DeleteNote:
     Wrapper around locating and deleting notes.
 
     args:
-        data: (list)
-            A list of dicts storing
-            your notes.
+        data: (dict)
+            Your notes, keyed
+            by their id.
     """
 
-    def __init__(self, data: list = None) -> None:
+    def __init__(self, data: dict = None) -> None:
         """Initialise the class."""
         self.data = data
 
-    def _find_note(self, _id: int) -> dict:
+    def _find_note(self, _id: int) -> Note:
         """Return a note by a specified ID."""
-        return [self.data.index(row) for row in self.data if row.id == _id]
+        return self.data.get(_id)
 
-    def find_index(self, _id) -> int:
-        """Return the index of a row to delete."""
+    def confirm(self, _id) -> bool:
+        """
+        Ask the user to confirm deleting a note.
+
+        returns:
+            True if the deletion is confirmed,
+            or a message if it is cancelled.
+        """
         while True:
             usr_input = input(f"Are you sure you want to delete note? {_id} y/n: ")
             if usr_input == "y":
-                index = self._find_note(_id=_id)
-                return index[0] if isinstance(index, list) else index
+                return True
             elif usr_input == "n":
                 return "Cancelling..."
 
@@ -302,23 +464,40 @@ class DeleteNote:
 class DisplayNote:
     """Wrapper around displaying notes to the end user."""
 
-    def __init__(self, data: list = None) -> None:
+    def __init__(self, data: list = None, index: dict = None) -> None:
         """
         Initialise the class.
 
         args:
             data: (list)
-                A list of dicts storing
-                your notes.
+                The notes to display.
+
+            index: (dict)
+                The same notes keyed by
+                id, used to find a note
+                without scanning data.
         """
         self.data = data
+        self.index = index
+        self.today = date.today().toordinal()
+
+    def _test_due_date(self, due: int) -> Fore:
+        """
+        Return a colour based on how close a due date is.
 
-    def _test_due_date(self, due_date: str) -> Fore:
-        """Return a colour based on how close a due date is."""
-        if due_date:
-            now = datetime.now()
-            set_date = datetime.strptime(due_date, "%Y-%m-%d")
-            time_diff = (set_date - now).days
+        Dates are compared to the day the DisplayNote was created,
+        so every note is coloured against the same "now". A note
+        due today counts as one day past, as the due date is
+        taken to be midnight at its start.
+
+        args:
+            due: (int)
+                The note's due date as a
+                proleptic Gregorian ordinal,
+                as Note holds it, or None.
+        """
+        if due is not None:
+            time_diff = due - self.today - 1
             if time_diff >= 10:
                 return Fore.CYAN
             elif time_diff < 10 and time_diff >= 5:
@@ -330,26 +509,63 @@ class DisplayNote:
         else:
             return Fore.CYAN
 
-    def list_all(self) -> None:
+    def _summary(self, note: Note) -> str:
+        """Render the id, title and due date of a note."""
+        colour = self._test_due_date(due=note.due)
+        due_date = note.due_date or "Not Set"
+        return (
+            f"\nId: {note.id}\n"
+            f"Title: {note.title}\n"
+            f"Due Date: {colour}{due_date}{Fore.RESET}\n"
+        )
+
+    def _render(self, notes) -> str:
+        """Yield note summaries joined into chunks of CHUNK_NOTES."""
+        chunk = []
+        for note in notes:
+            chunk.append(self._summary(note))
+            if len(chunk) == CHUNK_NOTES:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+    def _list(self, notes, limit: int = None, offset: int = 0) -> None:
+        """
+        Write summaries of one page of notes.
+
+        args:
+            notes: (iterable)
+                The notes to list.
+
+            limit: (int)
+                The most notes to list,
+                or None for all of them.
+
+            offset: (int)
+                How many notes to skip
+                before listing.
+        """
+        stop = None if limit is None else offset + limit
+        with trace.phase("output"):
+            chunks = self._render(islice(notes, offset, stop))
+            write_chunks(trace.iterate("render", chunks))
+
+    def list_all(self, limit: int = None, offset: int = 0) -> None:
         """Display a summary of all notes."""
         try:
-            for note in self.data:
-                _id = note.id
-                title = note.title
-                _due_date = note.due_date
-                colour = self._test_due_date(due_date=_due_date)
-                due_date = _due_date or "Not Set"
-                print(
-                    f"\nId: {_id}\n"
-                    f"Title: {title}\n"
-                    f"Due Date: {colour}{due_date}{Fore.RESET}"
-                )
+            self._list(self.data, limit=limit, offset=offset)
         except TypeError:
             return "No notes found"
 
-    def _find_note(self, _id: int) -> dict:
+    def _find_note(self, _id: int) -> Note:
         """Return a note by a specified ID."""
-        return [row for row in self.data if row.id == _id][0]
+        if self.index is not None:
+            return self.index[_id]
+        for row in self.data:
+            if row.id == _id:
+                return row
+        raise IndexError(_id)
 
     def show_note(self, _id: int) -> None:
         """Display the full content of a specified note."""
@@ -358,8 +574,8 @@ class DisplayNote:
             title = note.title
             body = note.body
             _due_date = note.due_date
-            tags = note.tags
-            colour = self._test_due_date(due_date=_due_date)
+            tags = list(note.tags)
+            colour = self._test_due_date(due=note.due)
             due_date = _due_date or "Not Set"
             print(
                 f"\nId: {_id}\n"
@@ -368,13 +584,15 @@ class DisplayNote:
                 f"Due Date: {colour}{due_date}{Fore.RESET}\n"
                 f"Tags: {tags}"
             )
-        except TypeError:
+        except (IndexError, KeyError, TypeError):
             return "Note not found"
 
-    def _aggregate(self, aggregation: str) -> list:
-        return [note for note in self.data if note.category == aggregation]
+    def _aggregate(self, aggregation: str) -> Iterator[Note]:
+        return (note for note in self.data if note.category == aggregation)
 
-    def list_aggregation(self, aggregation: str) -> None:
+    def list_aggregation(
+        self, aggregation: str, limit: int = None, offset: int = 0
+    ) -> None:
         """
         Display notes grouped by a specified category.
 
@@ -383,36 +601,29 @@ class DisplayNote:
                 The category of note
                 to display.
         """
-        for note in self._aggregate(aggregation=aggregation):
-            _id = note.id
-            title = note.title
-            _due_date = note.due_date
-            colour = self._test_due_date(due_date=_due_date)
-            if _due_date:
-                due_date = _due_date
-            else:
-                due_date = "Not Set"
-            print(
-                f"\nId: {_id}\n"
-                f"Title: {title}\n"
-                f"Due Date: {colour}{due_date}{Fore.RESET}"
-            )
+        notes = self._aggregate(aggregation=aggregation)
+        self._list(notes, limit=limit, offset=offset)
+
+    def _find_tags(self, tags: list, match: str = "all") -> Iterator[Note]:
+        tags = set(tags)
+        if match == "all":
+            return (row for row in self.data if tags.issubset(row.tags))
+        return (row for row in self.data if not tags.isdisjoint(row.tags))
+
+    def list_by_tags(
+        self, tags: list, match: str = "all", limit: int = None, offset: int = 0
+    ) -> None:
+        """
+        List notes that have specified tags.
 
-    def _find_tag(self, tag: str) -> list:
-        return [row for row in self.data if tag in row.tags]
-
-    def list_by_tag(self, tag: str) -> None:
-        """List notes grouped by a tag."""
-        notes = self._find_tag(tag=tag)
-        if notes:
-            for note in notes:
-                _id = note.id
-                title = note.title
-                _due_date = note.due_date
-                colour = self._test_due_date(due_date=_due_date)
-                due_date = _due_date or "Not Set"
-                print(
-                    f"\nId: {_id}\n"
-                    f"Title: {title}\n"
-                    f"Due Date: {colour}{due_date}{Fore.RESET}"
-                )
+        args:
+            tags: (list)
+                The tags to search for.
+
+            match: (str)
+                "all" for notes with every
+                tag, or "any" for notes with
+                at least one.
+        """
+        notes = self._find_tags(tags=tags, match=match)
+        self._list(notes, limit=limit, offset=offset)
@@ -1,13 +1,26 @@
 """Wrapper around all top-level functions for notes handling."""
-from sk_notes.local_handler import LocalHandler
+import os
+from datetime import date, datetime, timedelta
+from functools import cached_property, partial
+from time import time
+
+from sk_notes import trace
+from sk_notes.concurrency import ConflictError
+from sk_notes.constants import SUMMARY_COLUMNS
+from sk_notes.due_index import DueIndex
 from sk_notes.note_handler import (
     CreateNote,
     DeleteNote,
     DisplayNote,
     NewNote,
+    Note,
     UpdateNote,
 )
+from sk_notes.search_index import SearchIndex
 from sk_notes.settings import SetUp
+from sk_notes.storage import storage_handler
+from sk_notes.timeline import DELETED
+from sk_notes.transfer import EDITABLE_FIELDS, FORMATS, detect_format, validate
 
 
 class Notes:
@@ -15,40 +28,289 @@ class Notes:
 
     def __init__(self) -> None:
         """Initialise the class."""
-        self.categories = SetUp().aggregations()
-        self.local = LocalHandler()
-        self.data = [
-            NewNote(note=note).dict_to_note() for note in self.local.read_notes()
-        ]
-        self.create_note = CreateNote(categories=self.categories, data=self.data)
-        self.delete_note = DeleteNote(data=self.data)
-        self.display_note = DisplayNote(data=self.data)
-        self.update_note = UpdateNote(categories=self.categories, data=self.data)
-
-    def notes(self) -> str:
-        """Display all notes."""
-        return self.display_note.list_all()
-
-    def aggregate(self, aggregation: str):
-        """Display a summary of notes grouped by a specified aggregation."""
-        return self.display_note.list_aggregation(
-            aggregation=aggregation.strip(),
+        setup = SetUp()
+        self.setup = setup
+        self.categories = setup.aggregations()
+        self.local = storage_handler(setup=setup)
+        self.changed = {}
+        self.deleted = set()
+        self.read_as = {}
+        self.version = None
+
+    @cached_property
+    def index(self) -> dict:
+        """
+        Read every note from storage the first time it is needed.
+
+        Notes are keyed by id, in the order they were stored, so
+        finding, replacing and deleting a note by id is O(1).
+        The store's version is taken first, so a save by another
+        process while they are read is always noticed by save.
+        """
+        self.version = self.local.version()
+        stored = trace.iterate("storage.read", self.local.iter_notes())
+        notes = map(Note.from_record, stored)
+        return {note.id: note for note in trace.iterate("notes.load", notes)}
+
+    def load(self) -> None:
+        """Read every note and build the indexes queries are answered from."""
+        self.display_note
+        self.due_index
+
+    @property
+    def data(self) -> list:
+        """Return every note as a list."""
+        return list(self.index.values())
+
+    @cached_property
+    def edited(self) -> dict:
+        """
+        Return the notes edits are made to, keyed by id.
+
+        These are every note, unless the storage handler writes
+        single notes, as SQLite does, and they have not been read.
+        Then notes are read one at a time by _held as they are
+        edited, so changing a note never reads the rest.
+        """
+        if "index" in self.__dict__ or not self.local.writes_rows:
+            return self.index
+        self.version = self.local.version()
+        return {}
+
+    def _held(self, _id: int) -> Note:
+        """
+        Return a note to edit, reading it from storage if needed.
+
+        returns: (Note)
+            The note, or None if it does
+            not exist or has been deleted.
+        """
+        notes = self.edited
+        partial = notes is not self.__dict__.get("index")
+        if partial and _id not in notes and _id not in self.deleted:
+            found = self.local.read_note(_id=_id)
+            if found:
+                notes[_id] = Note.from_record(found[0])
+        return notes.get(_id)
+
+    @cached_property
+    def create_note(self) -> CreateNote:
+        """Return a CreateNote bound to the notes being edited."""
+        return CreateNote(
+            categories=self.categories, data=self.edited, ids=self.local.ids
+        )
+
+    @cached_property
+    def delete_note(self) -> DeleteNote:
+        """Return a DeleteNote bound to the notes being edited."""
+        return DeleteNote(data=self.edited)
+
+    @cached_property
+    def display_note(self) -> DisplayNote:
+        """Return a DisplayNote bound to every note."""
+        return DisplayNote(data=self.index.values(), index=self.index)
+
+    @cached_property
+    def due_index(self) -> DueIndex:
+        """Return every note's id sorted by due date."""
+        return DueIndex(notes=self.index.values())
+
+    @cached_property
+    def search_index(self) -> SearchIndex:
+        """Return the full text index stored beside the notes."""
+        return SearchIndex(directory=os.path.join(self.local.directory, "search"))
+
+    @cached_property
+    def update_note(self) -> UpdateNote:
+        """Return an UpdateNote bound to the notes being edited."""
+        return UpdateNote(categories=self.categories, data=self.edited)
+
+    def _display(self, read, **kwargs) -> DisplayNote:
+        """
+        Return a DisplayNote over the notes a query needs.
+
+        Once every note has been read the query is answered
+        from memory. Until then it is passed to the storage
+        handler, which may answer it without reading every note,
+        and its notes are converted lazily as they are displayed.
+
+        args:
+            read: (callable)
+                The storage handler method
+                answering the query.
+
+            kwargs:
+                Arguments for read.
+        """
+        if "index" in self.__dict__:
+            return self.display_note
+        stored = trace.iterate("storage.read", read(**kwargs))
+        notes = map(Note.from_record, stored)
+        return DisplayNote(data=trace.iterate("notes.load", notes))
+
+    def _remember(self, _id: int) -> None:
+        """Keep a stored note as it was read, before it is first changed."""
+        if _id not in self.read_as:
+            self.read_as[_id] = self.edited[_id].to_dict()
+
+    def _mark_changed(self, note) -> None:
+        """Record that a note was created or updated since the last save."""
+        self.changed[note.id] = note
+        self.deleted.discard(note.id)
+        if "due_index" in self.__dict__:
+            self.due_index.add(note)
+
+    def _mark_deleted(self, _id: int) -> None:
+        """Record that a note was deleted since the last save."""
+        self.changed.pop(_id, None)
+        self.deleted.add(_id)
+        if "due_index" in self.__dict__:
+            self.due_index.remove(_id)
+
+    def notes(self, limit: int = None, offset: int = 0) -> str:
+        """
+        Display all notes.
+
+        args:
+            limit: (int)
+                The most notes to display,
+                or None for all of them.
+
+            offset: (int)
+                How many notes to skip
+                before displaying.
+        """
+        return self._display(self.local.iter_notes, columns=SUMMARY_COLUMNS).list_all(
+            limit=limit, offset=offset
         )
 
-    def group(self, aggregation: str) -> str:
+    def aggregate(self, aggregation: str, limit: int = None, offset: int = 0):
+        """Display a summary of notes grouped by a specified aggregation."""
+        aggregation = aggregation.strip()
+        return self._display(
+            self.local.read_notes_by_category,
+            category=aggregation,
+            columns=SUMMARY_COLUMNS + ["category"],
+        ).list_aggregation(aggregation=aggregation, limit=limit, offset=offset)
+
+    def group(self, aggregation: str, limit: int = None, offset: int = 0) -> str:
         """Display a summary of notes by a specified aggregation."""
-        return self.display_note.list_aggregation(aggregation=aggregation)
+        return self._display(
+            self.local.read_notes_by_category,
+            category=aggregation,
+            columns=SUMMARY_COLUMNS + ["category"],
+        ).list_aggregation(aggregation=aggregation, limit=limit, offset=offset)
 
-    def tag(self, tag: str) -> str:
+    def tag(
+        self, tags: list, match: str = "all", limit: int = None, offset: int = 0
+    ) -> str:
         """
-        Display a summary of notes aggregated by a tag.
+        Display a summary of notes aggregated by tags.
 
         args:
-            tag: (str)
-                The tag to search
+            tags: (list)
+                The tags to search
                 notes for.
+
+            match: (str)
+                "all" for notes with every
+                tag, or "any" for notes with
+                at least one.
+
+            limit: (int)
+                The most notes to display,
+                or None for all of them.
+
+            offset: (int)
+                How many notes to skip
+                before displaying.
+        """
+        tags = [tag.lower().strip() for tag in tags]
+        return self._display(
+            self.local.read_notes_by_tags,
+            tags=tags,
+            match=match,
+            columns=SUMMARY_COLUMNS + ["tags"],
+        ).list_by_tags(tags=tags, match=match, limit=limit, offset=offset)
+
+    def search(self, query: str, limit: int = 10) -> str:
         """
-        return self.display_note.list_by_tag(tag=tag.lower().strip())
+        Display the notes best matching a full text query.
+
+        The index is built from every note the first
+        time it is searched, streaming them from storage
+        unless they are already read, and kept up to date
+        by save. It is built under the store's lock, so no
+        save lands between reading the notes and writing it.
+
+        args:
+            query: (str)
+                The words to search
+                titles and bodies for.
+
+            limit: (int)
+                The most notes to display.
+        """
+        if not self.search_index.exists():
+            with self.local.lock():
+                self._build_search_index()
+        ids = [_id for _id, _ in self.search_index.search(query=query, limit=limit)]
+        if "index" in self.__dict__:
+            notes = {_id: self.index[_id] for _id in ids if _id in self.index}
+        else:
+            found = self.local.read_notes_by_ids(ids=set(ids))
+            notes = {note["id"]: NewNote(note=note).dict_to_note() for note in found}
+        return DisplayNote(data=[notes[_id] for _id in ids if _id in notes]).list_all()
+
+    def _build_search_index(self) -> None:
+        """Build the full text index, unless another process just has."""
+        if self.search_index.exists():
+            return
+        if "index" in self.__dict__:
+            notes = self.index.values()
+        else:
+            notes = (
+                NewNote(note=note).dict_to_note() for note in self.local.iter_notes()
+            )
+        self.search_index.build(notes=notes)
+
+    def due(self, within: int = None, overdue: bool = False) -> str:
+        """
+        Display notes by due date, soonest first.
+
+        Until every note has been read, only the notes due
+        in the window are asked for from the storage handler.
+
+        args:
+            within: (int)
+                Show notes due in the next
+                number of days, from today.
+
+            overdue: (bool)
+                Show notes due before today.
+        """
+        today = date.today()
+        if overdue:
+            start, end = None, today - timedelta(days=1)
+        else:
+            start = today
+            end = None if within is None else today + timedelta(days=within)
+
+        if "index" in self.__dict__:
+            due_index, notes = self.due_index, self.index
+        else:
+            found = self.local.read_notes_due(
+                start=start and start.isoformat(),
+                end=end and end.isoformat(),
+                columns=SUMMARY_COLUMNS,
+            )
+            notes = {note["id"]: NewNote(note=note).dict_to_note() for note in found}
+            due_index = DueIndex(notes=notes.values())
+
+        ids = due_index.window(
+            start=start and start.toordinal(), end=end and end.toordinal()
+        )
+        return DisplayNote(data=[notes[_id] for _id in ids]).list_all()
 
     def note(self, _id: int) -> str:
         """
@@ -61,97 +323,424 @@ class Notes:
                 of. This can be obtained by
                 running notes.show_all().
         """
-        return self.display_note.show_note(_id=_id)
+        return self._display(self.local.read_note, _id=_id).show_note(_id=_id)
+
+    def _validated(self, records, source: str):
+        """Yield records as validated notes, with ids from the id counter."""
+        created_at = int(time())
+        number = 1
+        try:
+            for record in records:
+                _id = self.local.ids.next_id()
+                yield validate(record, _id=_id, created_at=created_at)
+                number += 1
+        except ValueError as err:
+            raise ValueError(f"note {number} of {source}: {err}")
+
+    def _forget(self) -> None:
+        """Drop every note read into memory, so they are read again when needed."""
+        cached = ("index", "edited", "create_note", "delete_note", "display_note")
+        for name in (*cached, "due_index", "update_note"):
+            self.__dict__.pop(name, None)
+
+    def import_notes(self, path: str, _format: str = None) -> str:
+        """
+        Add every note in a file or directory and save them once.
+
+        Notes are validated as they are read, given ids
+        reserved from the id counter in growing blocks, and
+        streamed into storage in batches, so neither the store
+        nor the import is held in memory. Nothing is saved if
+        any note is invalid.
+
+        args:
+            path: (str)
+                The file, or directory of
+                Markdown files, to import.
+
+            _format: (str)
+                jsonl, csv or markdown.
+                Detected from path if unset.
+
+        raises: (ValueError)
+            If a note cannot be read
+            or is invalid.
+        """
+        if self.changed or self.deleted:
+            self.save()
+        read, _ = FORMATS[_format or detect_format(path)]
+        imported = 0
+
+        def counted(notes):
+            nonlocal imported
+            for note in notes:
+                imported += 1
+                yield note
+
+        with self.local.lock():
+            notes = self._validated(read(path), source=path)
+            try:
+                self.local.append_notes(notes=counted(notes))
+            finally:
+                self.local.ids.release()
+            self.search_index.invalidate()
+        self._forget()
+        return f"{imported} notes imported from {path}"
+
+    def export_notes(self, path: str, _format: str = None) -> str:
+        """
+        Write every note to a file or directory.
 
-    def new(self) -> None:
-        """Write a new note."""
-        note = self.create_note.create_note()
-        self.data.append(note)
+        Notes are streamed from storage unless
+        they have already been read.
 
+        args:
+            path: (str)
+                The file, or directory of
+                Markdown files, to write.
+
+            _format: (str)
+                jsonl, csv or markdown.
+                Detected from path if unset.
+        """
+        _, write = FORMATS[_format or detect_format(path)]
+        if "index" in self.__dict__:
+            notes = (note.to_dict() for note in self.index.values())
+        else:
+            notes = self.local.iter_notes()
+        return f"{write(notes, path)} notes exported to {path}"
+
+    def new(self, fields: dict = None) -> None:
+        """
+        Write a new note.
+
+        args:
+            fields: (dict)
+                The fields of the note, which
+                must include a title. The note
+                is prompted for if unset.
+
+        raises: (ValueError)
+            If a field is invalid.
+        """
+        if fields:
+            note = validate(fields, _id=self.create_note._set_id())
+        else:
+            note = self.create_note.create_note()
+        self.edited[note.id] = note
+        self._mark_changed(note)
+
+    def _set_fields(self, _id: int, fields: dict) -> Note:
+        """Validate fields and set them on a stored note."""
+        unknown = set(fields) - set(EDITABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"cannot set {', '.join(sorted(unknown))}")
+        note = self._held(_id)
+        updated = validate({**note.to_dict(), **fields}, _id=_id)
+        for field in EDITABLE_FIELDS:
+            setattr(note, field, getattr(updated, field))
+        return note
+
+    def update_fields(self, _id: int, fields: dict) -> str:
+        """
+        Set fields of a note specified by Id without prompting.
+
+        args:
+            _id: (int)
+                The Id of the note
+                to update.
+
+            fields: (dict)
+                New values keyed by field,
+                from category, title, body,
+                tags and due_date.
+
+        raises: (ValueError)
+            If a field is unknown
+            or invalid.
+        """
+        return self._update(_id=_id, update=partial(self._set_fields, fields=fields))
+
+    def apply(self, records) -> str:
+        """
+        Create and update many notes in one pass.
+
+        Records with an id update that note, and others
+        create a new note. Nothing is kept if any record
+        is invalid, as the changes are only held until save.
+
+        args:
+            records: (iterable)
+                Dict formatted notes.
+
+        raises: (ValueError)
+            If a record is invalid or
+            updates a missing note.
+        """
+        created = updated = 0
+        try:
+            for record in records:
+                if "id" in record:
+                    if self._held(record["id"]) is None:
+                        raise ValueError(f"note {record['id']} not found")
+                    fields = {k: v for k, v in record.items() if k != "id"}
+                    self.update_fields(_id=record["id"], fields=fields)
+                    updated += 1
+                else:
+                    self.new(fields=record)
+                    created += 1
+        except ValueError as err:
+            raise ValueError(f"record {created + updated + 1}: {err}")
+        return f"{created} notes created and {updated} notes updated"
+
+    def _rebase(self) -> None:
+        """
+        Check unsaved changes against notes saved by another process.
+
+        Changes to notes nobody else has touched, or changed
+        in the same way, carry over. New notes whose ids were
+        taken by a process that does not use the id counter
+        are given new ids from it.
+
+        raises: (ConflictError)
+            If another process changed or deleted
+            a note that has been changed here.
+        """
+        touched = set(self.changed) | self.deleted
+        stored = {
+            note["id"]: NewNote(note=note).dict_to_note().to_dict()
+            for note in self.local.read_notes_by_ids(ids=touched)
+        }
+        for _id, read_as in self.read_as.items():
+            now = stored.get(_id)
+            if now == read_as or (now is None and _id in self.deleted):
+                continue
+            if _id in self.changed and now == self.changed[_id].to_dict():
+                continue
+            raise ConflictError(
+                f"Note {_id} was changed by another process, nothing was saved"
+            )
+
+        for _id in [_id for _id in self.changed if _id not in self.read_as]:
+            if _id in stored:
+                note = self.changed.pop(_id)
+                note.id = self.local.ids.next_id()
+                self.changed[note.id] = note
+
+    def _merged(self):
+        """Yield the stored notes with the unsaved changes applied."""
+        pending = dict(self.changed)
+        for note in self.local.iter_notes():
+            if note["id"] in self.deleted:
+                continue
+            elif note["id"] in pending:
+                yield pending.pop(note["id"])
+            else:
+                yield NewNote(note=note).dict_to_note()
+        yield from pending.values()
+
+    @trace.traced("save")
     def save(self) -> str:
-        """Store notes locally and optionally in Cloud Storage."""
-        return self.local.write_notes(data=self.data)
+        """
+        Store notes locally, merging in saves made by other processes.
+
+        The store is locked from checking its version to writing,
+        and flushed to disk after the lock is released, so
+        concurrent saves can share a flush. If another process has
+        saved since the notes were read, the changes are rebased
+        onto what it stored and the notes are read again when
+        next needed.
+
+        raises: (ConflictError)
+            If another process changed a note
+            that has been changed here.
+        """
+        with self.local.lock():
+            read = "index" in self.__dict__ or "edited" in self.__dict__
+            stale = read and self.local.version() != self.version
+            if stale:
+                self._rebase()
+            changed = list(self.changed.values())
+            held = not stale and self.edited is self.__dict__.get("index")
+            with trace.phase("storage.write"):
+                message = self.local.write_changes(
+                    data=self.data if held else self._merged(),
+                    changed=changed,
+                    deleted=self.deleted,
+                )
+            if self.search_index.exists():
+                self.search_index.update(changed=changed, deleted=self.deleted)
+            self.version = self.local.version()
+        self.local.ids.release()
+        self.local.sync()
+        if stale:
+            self._forget()
+        self.changed = {}
+        self.deleted = set()
+        self.read_as = {}
+        return message
+
+    def sync(self) -> str:
+        """
+        Sync stored notes with the bucket named by gcs_bucket.
+
+        Unsaved changes are saved first. Only segments of notes
+        that changed since the last sync are transferred, and
+        the notes are read again when next needed.
+
+        raises: (ValueError)
+            If no bucket is set.
+        """
+        from sk_notes.buckets import open_bucket
+        from sk_notes.sync import SyncEngine
+
+        bucket = self.setup.bucket()
+        if not bucket:
+            raise ValueError("Set gcs_bucket in settings.yml to sync notes")
+        if self.changed or self.deleted:
+            self.save()
+        self.setup.gcp_credentials()
+        engine = SyncEngine(
+            local=self.local,
+            bucket=open_bucket(bucket, project=self.setup.gcp_project_id()),
+        )
+        message = engine.sync()
+        self._forget()
+        self.search_index.invalidate()
+        return message
+
+    def history(self, _id: int) -> str:
+        """
+        List the revisions of a note, oldest first.
+
+        Revisions are found in the timeline, so no snapshot
+        is read. Each is marked with whether a snapshot
+        holding it is still retained to restore it from.
+
+        raises: (ValueError)
+            If the storage keeps no history.
+        """
+        revisions = self.local.history().revisions(_id)
+        if not revisions:
+            return f"Note {_id} has no recorded history"
+        timestamps = self.local.snapshot_timestamps()
+        lines, alive = [], False
+        for number, (stamp, kind) in enumerate(revisions, start=1):
+            change = "deleted" if kind == DELETED else "updated" if alive else "created"
+            alive = kind != DELETED
+            until = revisions[number][0] if number < len(revisions) else None
+            kept = number == len(revisions) or self.local.retained(
+                _id, stamp, until, timestamps=timestamps
+            )
+            when = datetime.fromtimestamp(stamp).strftime("%Y-%m-%d %H:%M:%S")
+            state = "" if kept or not alive else "  (no longer retained)"
+            lines.append(f"{number:>4}  {when}  {stamp}  {change}{state}")
+        return "\n".join(lines)
+
+    def restore(self, at: int) -> str:
+        """
+        Return every note to how it was at a point in time.
+
+        The newest snapshot written by then is restored. Only
+        notes the timeline shows changing since that snapshot
+        are read from it and changed back, and the restore is
+        saved as a new revision, so it can be undone.
+
+        args:
+            at: (int)
+                The point in time,
+                as a timestamp.
+
+        raises: (ValueError)
+            If the storage keeps no history,
+            or no snapshot that old is retained.
+        """
+        timeline = self.local.history()
+        snapshot = self.local.snapshot_at(at)
+        changed = timeline.changed_after(snapshot)
+        old = {
+            note["id"]: NewNote(note=note).dict_to_note()
+            for note in self.local.read_snapshot_notes(snapshot, ids=changed)
+        }
+        for _id in sorted(changed):
+            if _id in old:
+                self._put(old[_id])
+            elif self._held(_id) is not None:
+                self._remember(_id)
+                del self.edited[_id]
+                self._mark_deleted(_id)
+        when = datetime.fromtimestamp(snapshot).strftime("%Y-%m-%d %H:%M:%S")
+        return f"{len(changed)} notes restored to the snapshot of {when}"
+
+    def restore_revision(self, _id: int, revision: int) -> str:
+        """
+        Return a note to one of its revisions, listed by history.
+
+        raises: (ValueError)
+            If the revision cannot be read.
+        """
+        self._put(NewNote(note=self.local.read_revision(_id, revision)).dict_to_note())
+        return f"Note {_id} restored to revision {revision}"
+
+    def _put(self, note: Note) -> None:
+        """Replace or recreate a note with an old version of it."""
+        if self._held(note.id) is not None:
+            self._remember(note.id)
+        self.edited[note.id] = note
+        self._mark_changed(note)
 
     def delete(self, _id: int) -> str:
         """Delete a note by specified Id."""
-        index = self.delete_note.find_index(_id=_id)
-        if isinstance(index, int):
-            self.data.pop(index)
-            return f"Note {_id} has been deleted"
-        elif not index:
+        if self._held(_id) is None:
             return "Note not found"
+        confirmed = self.delete_note.confirm(_id=_id)
+        if confirmed is True:
+            self._remember(_id)
+            del self.edited[_id]
+            self._mark_deleted(_id)
+            return f"Note {_id} has been deleted"
         else:
-            print(index)
+            print(confirmed)
+
+    def _update(self, _id: int, update) -> str:
+        """
+        Update a note in place and record the change.
+
+        args:
+            _id: (int)
+                The Id of the note
+                to update.
+
+            update: (callable)
+                The UpdateNote method
+                used to edit the note.
+        """
+        if self._held(_id) is None:
+            return "Note not found"
+        self._remember(_id)
+        self._mark_changed(update(_id=_id))
+        return f"Note {_id} has been updated"
 
     def update(self, _id: int) -> str:
         """Update a note specified by Id."""
-        print(_id)
-        index = self.update_note.find_index(_id=_id)
-        if isinstance(index, int):
-            self.data.append(self.update_note.update_all(_id=_id))
-            self.data.pop(index)
-            return f"Note {_id} has been updated"
-        elif not index:
-            return "Note not found"
-        else:
-            print(index)
+        return self._update(_id=_id, update=self.update_note.update_all)
 
     def update_category(self, _id: int) -> str:
         """Update a note specified by Id."""
-        index = self.update_note.find_index(_id=_id)
-        if isinstance(index, int):
-            self.data.append(self.update_note.update_category(_id=_id))
-            self.data.pop(index)
-            return f"Note {_id} has been updated"
-        elif not index:
-            return "Note not found"
-        else:
-            print(index)
+        return self._update(_id=_id, update=self.update_note.update_category)
 
     def update_title(self, _id: int) -> str:
         """Update a note specified by Id."""
-        index = self.update_note.find_index(_id=_id)
-        if isinstance(index, int):
-            self.data.append(self.update_note.update_title(_id=_id))
-            self.data.pop(index)
-            return f"Note {_id} has been updated"
-        elif not index:
-            return "Note not found"
-        else:
-            print(index)
+        return self._update(_id=_id, update=self.update_note.update_title)
 
     def update_body(self, _id: int) -> str:
         """Update a note specified by Id."""
-        index = self.update_note.find_index(_id=_id)
-        if isinstance(index, int):
-            self.data.append(self.update_note.update_body(_id=_id))
-            self.data.pop(index)
-            return f"Note {_id} has been updated"
-        elif not index:
-            return "Note not found"
-        else:
-            print(index)
+        return self._update(_id=_id, update=self.update_note.update_body)
 
     def update_tags(self, _id: int) -> str:
         """Update a note specified by Id."""
-        index = self.update_note.find_index(_id=_id)
-        if isinstance(index, int):
-            self.data.append(self.update_note.update_tags(_id=_id))
-            self.data.pop(index)
-            return f"Note {_id} has been updated"
-        elif not index:
-            return "Note not found"
-        else:
-            print(index)
+        return self._update(_id=_id, update=self.update_note.update_tags)
 
     def update_date(self, _id: int) -> str:
         """Update a note specified by Id."""
-        index = self.update_note.find_index(_id=_id)
-        if isinstance(index, int):
-            self.data.append(self.update_note.update_date(_id=_id))
-            self.data.pop(index)
-            return f"Note {_id} has been updated"
-        elif not index:
-            return "Note not found"
-        else:
-            print(index)
+        return self._update(_id=_id, update=self.update_note.update_date)
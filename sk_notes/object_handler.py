@@ -0,0 +1,277 @@
+"""Classes to handle content-addressed local storage."""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Iterator
+
+from sk_notes.codec import encode_note
+from sk_notes.local_handler import LocalHandler
+from sk_notes.note_handler import NewNote
+from sk_notes.snapshot_index import SnapshotIndex, _Records
+
+# id, blob hash, pack timestamp, offset and length of each note.
+MANIFEST_RECORD = struct.Struct("<q16sqqq")
+
+
+def blob_hash(record: bytes) -> bytes:
+    """Return the key of a serialised note in the object store."""
+    return hashlib.sha256(record).digest()[:16]
+
+
+class _Manifest(_Records):
+    """
+    Entries of a manifest, looked up mostly in id order.
+
+    Notes are saved in about the order they were read, so
+    the entry after the last one found is tried before
+    falling back to a binary search.
+    """
+
+    def __init__(self, table: mmap.mmap) -> None:
+        """Initialise the class."""
+        super().__init__(table=table, record=MANIFEST_RECORD)
+        self.cursor = 0
+
+    def find(self, _id: int) -> tuple:
+        """Return the hash, pack, offset and length of a note, or None."""
+        if self.cursor < len(self) and self[self.cursor][0] == _id:
+            position = self.cursor
+        else:
+            position = self.position(_id)
+            if position >= len(self) or self[position][0] != _id:
+                return None
+        self.cursor = position + 1
+        return self[position][1:]
+
+
+class ObjectHandler(LocalHandler):
+    """
+    Local storage that keeps each version of a note once.
+
+    Notes are stored as blobs keyed by the hash of their
+    contents, appended to a pack file written by each save.
+    A snapshot is a manifest of fixed width entries, sorted
+    by id, giving the blob holding each note. A save only
+    adds the blobs of notes that changed, so keeping history
+    costs space in proportion to what changed rather than to
+    the size of the store. JSON snapshots written before are
+    still read, and can be converted by migrate.
+
+    args:
+        directory: (str)
+            The directory notes
+            are stored in.
+
+        retention: (dict)
+            How many snapshots to keep,
+            as keep_last and keep_daily_days.
+    """
+
+    def __init__(self, directory: str = None, retention: dict = None) -> None:
+        """Initialise the class."""
+        super().__init__(directory=directory, retention=retention)
+        self.extension = "manifest"
+        self.read_extensions = ("manifest", "json")
+
+    def _index_paths(self, file_path: str) -> list:
+        """Return the paths of the indexes and pack list stored with a snapshot."""
+        return [*super()._index_paths(file_path), self._index_path(file_path, "packs")]
+
+    def _staged_files(self, file_path: str) -> list:
+        """Place a snapshot's pack before anything that refers to it."""
+        return [self._index_path(file_path, "pack"), *super()._staged_files(file_path)]
+
+    def _timestamp(self, file_path: str) -> int:
+        """Return the timestamp in the name of a snapshot or pack."""
+        return int(os.path.basename(file_path).rsplit("-", 1)[-1].split(".", 1)[0])
+
+    def _pack_path(self, timestamp: int) -> str:
+        """Return the path of the pack written at a timestamp."""
+        return self._snapshot_path(timestamp=timestamp, extension="pack")
+
+    def _base_manifest(self, file_path: str) -> str:
+        """Return the newest manifest older than a snapshot, or None."""
+        timestamp = self._timestamp(file_path)
+        for older in self.snapshot_timestamps():
+            path = self._snapshot_path(timestamp=older)
+            if older < timestamp and os.path.isfile(path):
+                return path
+        return None
+
+    def _open_manifest(self, file_path: str) -> _Manifest:
+        """Map a manifest into memory, or return None if it is missing or empty."""
+        if not file_path or not os.path.getsize(file_path):
+            return None
+        with open(file_path, "rb") as manifest:
+            return _Manifest(mmap.mmap(manifest.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _write_snapshot(self, file_path: str, data: list) -> None:
+        """
+        Write the blobs of changed notes to a pack and a manifest of every note.
+
+        A note whose blob is unchanged since the manifest before
+        this one keeps pointing at the pack it is already in.
+        """
+        timestamp = self._timestamp(file_path)
+        base = self._open_manifest(self._base_manifest(file_path))
+        index = SnapshotIndex()
+        entries, packs = [], set()
+        with open(self._index_path(file_path, "pack"), mode="wb") as pack:
+            for note in data:
+                record = encode_note(note)
+                digest = blob_hash(record)
+                found = base and base.find(note.id)
+                if not found or found[0] != digest:
+                    found = (digest, timestamp, pack.tell(), len(record))
+                    pack.write(record + b"\n")
+                entries.append((note.id, *found))
+                packs.add(found[1])
+                index.add(note)
+            written = pack.tell()
+        if base:
+            base.table.close()
+        if not written:
+            os.remove(self._index_path(file_path, "pack"))
+
+        with open(file_path, mode="wb") as manifest:
+            for entry in sorted(entries):
+                manifest.write(MANIFEST_RECORD.pack(*entry))
+        with open(self._index_path(file_path, "packs"), mode="w") as pack_list:
+            json.dump(sorted(packs), pack_list)
+        index.write(self._index_path(file_path, kind="index"))
+
+    def _read_blobs(self, entries) -> Iterator[dict]:
+        """Yield the notes held by manifest entries, keeping packs open."""
+        packs = {}
+        try:
+            for _, _, timestamp, offset, length in entries:
+                if timestamp not in packs:
+                    packs[timestamp] = open(self._pack_path(timestamp), "rb")
+                packs[timestamp].seek(offset)
+                record = packs[timestamp].read(length)
+                yield self._decode(record, source=self._pack_path(timestamp))
+        finally:
+            for pack in packs.values():
+                pack.close()
+
+    def _iter_snapshot(self, file_path: str, columns: list = None) -> Iterator[dict]:
+        """Yield the notes in a manifest, or a JSON snapshot, one at a time."""
+        if not file_path.endswith(".manifest"):
+            yield from super()._iter_snapshot(file_path=file_path, columns=columns)
+            return
+
+        def entries():
+            with open(file_path, "rb") as manifest:
+                chunks = iter(lambda: manifest.read(MANIFEST_RECORD.size * 4096), b"")
+                for chunk in chunks:
+                    yield from MANIFEST_RECORD.iter_unpack(chunk)
+
+        for note in self._read_blobs(entries()):
+            if columns:
+                note = {key: note[key] for key in columns if key in note}
+            yield note
+
+    def _snapshot_index(self, file_path: str) -> SnapshotIndex:
+        """Return the tag and category indexes of a snapshot, or None."""
+        if not file_path.endswith(".manifest"):
+            return super()._snapshot_index(file_path=file_path)
+        index_path = self._index_path(file_path, kind="index")
+        if not os.path.isfile(index_path):
+            return None
+        return SnapshotIndex().read(index_path)
+
+    def _read_indexed(self, file_path: str, ids: set) -> list:
+        """Read only the notes with the given ids from a snapshot."""
+        if not file_path.endswith(".manifest"):
+            return super()._read_indexed(file_path=file_path, ids=ids)
+        manifest = self._open_manifest(file_path)
+        if not manifest:
+            return []
+        try:
+            found = [(_id, manifest.find(_id)) for _id in sorted(ids)]
+        finally:
+            manifest.table.close()
+        return list(self._read_blobs((_id, *entry) for _id, entry in found if entry))
+
+    def max_id(self) -> int:
+        """Return the id of the last entry in the current manifest."""
+        file_path = self._current_snapshot()
+        if not file_path or not file_path.endswith(".manifest"):
+            return super().max_id()
+        manifest = self._open_manifest(file_path)
+        if not manifest:
+            return 0
+        try:
+            return manifest[len(manifest) - 1][0]
+        finally:
+            manifest.table.close()
+
+    def prune(self) -> list:
+        """Delete snapshots outside the retention policy, and packs none refer to."""
+        deleted = super().prune()
+        if deleted:
+            self._collect_packs()
+        return deleted
+
+    def _collect_packs(self) -> None:
+        """Delete every pack not listed by a remaining manifest."""
+        referenced = set()
+        for timestamp in self.snapshot_timestamps():
+            pack_list = self._index_path(self._snapshot_path(timestamp), "packs")
+            if os.path.isfile(pack_list):
+                with open(pack_list, "r") as packs:
+                    referenced.update(json.load(packs))
+        for file in os.listdir(self.directory):
+            if file.startswith(self.file_prefix) and file.endswith(".pack"):
+                if self._timestamp(file) not in referenced:
+                    os.remove(os.path.join(self.directory, file))
+
+    def _stored_bytes(self) -> int:
+        """Return the size of every snapshot and pack file in storage."""
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self.directory)
+            if entry.name.startswith(self.file_prefix)
+        )
+
+    def migrate(self) -> str:
+        """
+        Convert JSON snapshots into manifests, oldest first.
+
+        Each snapshot keeps its timestamp, and only the notes
+        that changed since the one before it are added to the
+        object store. CURRENT is pointed at the converted
+        current snapshot.
+
+        returns: (str)
+            How many snapshots were converted
+            and how much space was reclaimed.
+        """
+        with self.lock():
+            before = self._stored_bytes()
+            current = self._current_snapshot()
+            migrated = 0
+            for timestamp in sorted(self.snapshot_timestamps()):
+                json_path = self._snapshot_path(timestamp=timestamp, extension="json")
+                if not os.path.isfile(json_path):
+                    continue
+                notes = (
+                    NewNote(note=note).dict_to_note()
+                    for note in super()._iter_snapshot(file_path=json_path)
+                )
+                manifest_path = self._snapshot_path(timestamp=timestamp)
+                self._write_staged(file_path=manifest_path, data=notes)
+                for path in (json_path, self._index_path(json_path, "offsets")):
+                    if os.path.exists(path):
+                        os.remove(path)
+                if json_path == current:
+                    self._set_current_snapshot(os.path.basename(manifest_path))
+                migrated += 1
+            after = self._stored_bytes()
+        reclaimed = (before - after) / 1024 / 1024
+        return (
+            f"{migrated} snapshots migrated, {reclaimed:.1f} MB reclaimed "
+            f"({before / 1024 / 1024:.1f} MB to {after / 1024 / 1024:.1f} MB)"
+        )
@@ -0,0 +1,44 @@
+"""Functions to write rendered notes to the terminal."""
+import shutil
+import sys
+from itertools import chain
+
+
+def write_chunks(chunks, pager: bool = None) -> None:
+    """
+    Write rendered output in a few large writes.
+
+    When stdout is a terminal and the output is taller than it,
+    the output is streamed through a pager instead, so the first
+    page shows as soon as it is rendered.
+
+    args:
+        chunks: (iterable)
+            Strings of rendered output.
+
+        pager: (bool)
+            Whether to page the output.
+            Defaults to paging when stdout
+            is a terminal.
+    """
+    chunks = iter(chunks)
+    if pager is None:
+        pager = sys.stdout.isatty()
+    if not pager:
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+        sys.stdout.flush()
+        return
+
+    rows = shutil.get_terminal_size().lines
+    buffered, lines = [], 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        lines += chunk.count("\n")
+        if lines >= rows:
+            import click
+
+            click.echo_via_pager(chain(buffered, chunks), color=True)
+            return
+    sys.stdout.write("".join(buffered))
+    sys.stdout.flush()
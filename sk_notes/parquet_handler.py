@@ -0,0 +1,202 @@
+"""Classes to handle interactions with Parquet snapshots."""
+
+from typing import Iterator
+
+from sk_notes.compression import JSON_EXTENSIONS
+from sk_notes.local_handler import LocalHandler, batched
+
+# How many notes are written to each row group.
+ROW_GROUP_SIZE = 20000
+
+
+def _schema():
+    """Return the Arrow schema of a note snapshot."""
+    import pyarrow
+
+    return pyarrow.schema(
+        [
+            ("id", pyarrow.int64()),
+            ("created_at", pyarrow.int64()),
+            ("category", pyarrow.string()),
+            ("title", pyarrow.string()),
+            ("body", pyarrow.string()),
+            ("tags", pyarrow.list_(pyarrow.string())),
+            ("due_date", pyarrow.string()),
+        ]
+    )
+
+
+def _rows(table) -> list:
+    """Convert an Arrow table or record batch into dict formatted notes."""
+    columns = table.to_pydict()
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+class ParquetHandler(LocalHandler):
+    """
+    Local storage that writes snapshots as Parquet files.
+
+    Snapshots are columnar, so listing notes reads only the
+    columns it displays rather than every body, and category
+    and due date filters are applied while the file is read.
+    Snapshots written as JSON are still read, so a store can
+    switch to Parquet without migrating first.
+
+    args:
+        directory: (str)
+            The directory notes
+            are stored in.
+
+        retention: (dict)
+            How many snapshots to keep,
+            as keep_last and keep_daily_days.
+
+        compression: (dict)
+            The codec and level Parquet
+            compresses columns with.
+            Snappy is used if unset.
+    """
+
+    def __init__(
+        self, directory: str = None, retention: dict = None, compression: dict = None
+    ) -> None:
+        """Initialise the class."""
+        super().__init__(directory=directory, retention=retention)
+        self.codec = (compression or {}).get("codec") or "snappy"
+        self.level = (compression or {}).get("level")
+        self.extension = "parquet"
+        self.read_extensions = ("parquet", *JSON_EXTENSIONS)
+
+    def _write_snapshot(self, file_path: str, data: list) -> None:
+        """Serialise notes into a Parquet snapshot, one row group per batch."""
+        import pyarrow
+        import pyarrow.parquet
+
+        schema = _schema()
+        writer = pyarrow.parquet.ParquetWriter(
+            file_path, schema, compression=self.codec, compression_level=self.level
+        )
+        try:
+            for batch in batched(data, size=ROW_GROUP_SIZE):
+                rows = [row.to_dict() for row in batch]
+                writer.write_table(
+                    pyarrow.Table.from_pydict(
+                        {name: [row[name] for row in rows] for name in schema.names},
+                        schema=schema,
+                    )
+                )
+        finally:
+            writer.close()
+
+    def _read_table(self, file_path: str, columns: list = None, filters: list = None):
+        """
+        Read notes from a Parquet snapshot.
+
+        args:
+            file_path: (str)
+                The snapshot to read.
+
+            columns: (list)
+                The columns to read,
+                or None for every column.
+
+            filters: (list)
+                Predicates on columns, as
+                (column, operator, value)
+                tuples, applied while reading.
+
+        returns: (pyarrow.Table)
+            The matching rows.
+        """
+        import pyarrow.parquet
+
+        if columns and filters:
+            columns = list(dict.fromkeys(columns + [f[0] for f in filters]))
+        return pyarrow.parquet.read_table(
+            file_path, columns=columns, filters=filters or None
+        )
+
+    def _iter_snapshot(self, file_path: str, columns: list = None) -> Iterator[dict]:
+        """Yield the notes in a snapshot, one row group batch at a time."""
+        if not file_path.endswith(".parquet"):
+            yield from super()._iter_snapshot(file_path=file_path, columns=columns)
+            return
+
+        import pyarrow.parquet
+
+        snapshot = pyarrow.parquet.ParquetFile(file_path)
+        batches = snapshot.iter_batches(batch_size=ROW_GROUP_SIZE, columns=columns)
+        for batch in batches:
+            yield from _rows(batch)
+
+    def _read_snapshot(self, file_path: str, columns: list = None) -> list:
+        """Deserialise the notes in a snapshot, reading only some columns."""
+        if not file_path.endswith(".parquet"):
+            return super()._read_snapshot(file_path=file_path)
+        return _rows(self._read_table(file_path=file_path, columns=columns))
+
+    def _read_filtered(self, columns: list, filters: list) -> list:
+        """Read the notes in the current snapshot matching filters."""
+        file_path = self._current_snapshot()
+        if not file_path or not file_path.endswith(".parquet"):
+            return None
+        return _rows(
+            self._read_table(file_path=file_path, columns=columns, filters=filters)
+        )
+
+    def read_notes_by_category(self, category: str, columns: list = None) -> list:
+        """Read the notes in a specified category."""
+        notes = self._read_filtered(
+            columns=columns, filters=[("category", "=", category)]
+        )
+        if notes is None:
+            return super().read_notes_by_category(category=category)
+        return notes
+
+    def read_notes_by_tags(
+        self, tags: list, match: str = "all", columns: list = None
+    ) -> list:
+        """
+        Read the notes with specified tags.
+
+        Parquet cannot filter on list members while reading,
+        so the tags column is read to find the matching rows
+        before the requested columns are taken.
+        """
+        import pyarrow.compute
+
+        file_path = self._current_snapshot()
+        if not file_path or not file_path.endswith(".parquet"):
+            return super().read_notes_by_tags(tags=tags, match=match)
+
+        if columns:
+            columns = list(dict.fromkeys(columns + ["tags"]))
+        table = self._read_table(file_path=file_path, columns=columns)
+        tag_lists = table.column("tags")
+        flat_tags = pyarrow.compute.list_flatten(tag_lists)
+        parents = pyarrow.compute.list_parent_indices(tag_lists)
+        row_sets = [
+            set(
+                pyarrow.compute.filter(
+                    parents, pyarrow.compute.equal(flat_tags, tag)
+                ).to_pylist()
+            )
+            for tag in tags
+        ]
+        if not row_sets:
+            return []
+        rows = set.intersection(*row_sets) if match == "all" else set.union(*row_sets)
+        return _rows(table.take(sorted(rows)))
+
+    def read_notes_due(
+        self, start: str = None, end: str = None, columns: list = None
+    ) -> list:
+        """Read the notes due between two dates."""
+        filters = [
+            ("due_date", ">=", start or "0000-00-00"),
+            ("due_date", "<=", end or "9999-99-99"),
+        ]
+        notes = self._read_filtered(columns=columns, filters=filters)
+        if notes is None:
+            return super().read_notes_due(start=start, end=end, columns=columns)
+        return notes
@@ -0,0 +1,411 @@
+"""Classes to handle full text search over notes."""
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import Counter
+
+from sk_notes.codec import dumps, loads
+from sk_notes.concurrency import atomic_write, fsync_path
+from sk_notes.snapshot_index import _Records
+
+TOKEN = re.compile(r"\w+")
+
+# A lexicon entry: a term's hash, and the position and number of its
+# postings. Entries are sorted by hash, so a term is found by bisection.
+TERM_RECORD = struct.Struct("<QQQ")
+TERM_TYPE = [("key", "<u8"), ("offset", "<u8"), ("count", "<u8")]
+
+# A posting: the id of a note holding a term, how often the term occurs
+# in it and the note's length, so scoring needs nothing else.
+POSTING_TYPE = [("id", "<u4"), ("frequency", "<u4"), ("length", "<u4")]
+POSTING_SIZE = 12
+
+# A note's length, in a table sorted by id.
+LENGTH_RECORD = struct.Struct("<qq")
+LENGTH_TYPE = [("id", "<i8"), ("length", "<i8")]
+
+# How many bytes of changes are logged before they are folded into a new segment.
+CHANGES_LIMIT = 1 << 20
+
+
+def tokenize(text: str) -> list:
+    """Split text into lower case word tokens."""
+    return TOKEN.findall((text or "").lower())
+
+
+def term_key(term: str) -> int:
+    """Return the 64 bit hash a term is stored under."""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _generation(name: str) -> int:
+    """
+    Return the generation of a file in the index directory.
+
+    index.json counts as newest and any other file as oldest,
+    so stale files are removed with old segments.
+    """
+    if name == "index.json":
+        return sys.maxsize
+    prefix = name.split(".")[0]
+    return int(prefix) if prefix.isdigit() else -1
+
+
+def _packed(postings: array) -> bytes:
+    """Return an array of unsigned ints as little endian bytes."""
+    if sys.byteorder == "big":
+        postings.byteswap()
+    return postings.tobytes()
+
+
+class SearchIndex:
+    """
+    An on-disk inverted index over note titles and bodies.
+
+    The index is a segment of fixed width binary files, named
+    by its generation: a lexicon sorted by term hash, the
+    postings of each term in turn, and every note's length.
+    Saves append changed notes to a log beside the segment, so
+    a save only writes the notes it changed, and once the log
+    outgrows CHANGES_LIMIT it is folded into a new segment.
+
+    index.json names the segment and how much of the log is
+    committed, and is replaced atomically, so searches read a
+    consistent index without locking. Building and updating
+    must be done under the store's lock. Results are ranked
+    with BM25.
+
+    args:
+        directory: (str)
+            The directory the index
+            is stored in.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, directory: str) -> None:
+        """Initialise the class."""
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "index.json")
+
+    def exists(self) -> bool:
+        """Return True if the index has been built."""
+        return os.path.isfile(self.meta_path)
+
+    def invalidate(self) -> None:
+        """Mark the index as stale, so it is rebuilt before the next search."""
+        if self.exists():
+            os.remove(self.meta_path)
+
+    def _path(self, generation: int, kind: str) -> str:
+        """Return the path of one of a generation's files."""
+        return os.path.join(self.directory, f"{generation}.{kind}")
+
+    def _meta(self) -> dict:
+        """Read index.json, or return None if the index is not built."""
+        try:
+            with open(self.meta_path, "rb") as file:
+                return loads(file.read())
+        except FileNotFoundError:
+            return None
+
+    def _terms(self, note) -> dict:
+        """Return term frequencies for a note's title and body."""
+        return Counter(tokenize(note.title) + tokenize(note.body))
+
+    def build(self, notes) -> None:
+        """
+        Index every note from scratch, in a new segment.
+
+        args:
+            notes: (iterable)
+                Every note in the store.
+        """
+        import numpy
+
+        os.makedirs(self.directory, exist_ok=True)
+        postings = {}
+        lengths = []
+        for note in notes:
+            terms = self._terms(note)
+            length = sum(terms.values())
+            lengths.append((note.id, length))
+            for term, frequency in terms.items():
+                postings.setdefault(term, array("I")).extend(
+                    (note.id, frequency, length)
+                )
+
+        generations = [
+            _generation(name)
+            for name in os.listdir(self.directory)
+            if name != "index.json"
+        ]
+        self._commit(
+            generation=max(generations, default=0) + 1,
+            postings=sorted(
+                (term_key(term), _packed(values)) for term, values in postings.items()
+            ),
+            lengths=numpy.array(sorted(lengths), dtype=LENGTH_TYPE),
+        )
+
+    def _commit(self, generation: int, postings, lengths) -> None:
+        """
+        Write a segment, point index.json at it and remove older ones.
+
+        The segment before it is kept for searches that read
+        index.json before it was replaced.
+
+        args:
+            generation: (int)
+                The number of the segment.
+
+            postings: (iterable)
+                (key, postings) tuples sorted by
+                key, with postings packed as bytes.
+
+            lengths: (numpy.ndarray)
+                Every note's length, sorted by id.
+        """
+        offset = 0
+        with open(self._path(generation, "postings"), "wb") as postings_file:
+            with open(self._path(generation, "terms"), "wb") as terms_file:
+                for key, values in postings:
+                    count = len(values) // POSTING_SIZE
+                    postings_file.write(values)
+                    terms_file.write(TERM_RECORD.pack(key, offset, count))
+                    offset += count
+        with open(self._path(generation, "lengths"), "wb") as file:
+            file.write(lengths.tobytes())
+        for kind in ("postings", "terms", "lengths"):
+            fsync_path(self._path(generation, kind))
+
+        meta = {
+            "generation": generation,
+            "documents": len(lengths),
+            "total_length": int(lengths["length"].sum()),
+            "changes": 0,
+        }
+        with atomic_write(self.meta_path, mode="wb") as file:
+            file.write(dumps(meta))
+        for name in os.listdir(self.directory):
+            if _generation(name) < generation - 1:
+                os.remove(os.path.join(self.directory, name))
+
+    def _changes(self, meta: dict) -> dict:
+        """
+        Read the committed log of changes since the segment was written.
+
+        returns: (dict)
+            The latest change to each note keyed by id, with
+            "length" and "terms" unless the note was deleted.
+        """
+        if not meta["changes"]:
+            return {}
+        with open(self._path(meta["generation"], "changes"), "rb") as file:
+            log = file.read(meta["changes"])
+        changes = {}
+        for line in log.splitlines():
+            change = loads(line)
+            changes[change["id"]] = change
+        return changes
+
+    def _stored_lengths(self, generation: int, ids: list) -> dict:
+        """Return the lengths of those notes that are in a segment, keyed by id."""
+        path = self._path(generation, "lengths")
+        if not ids or not os.path.getsize(path):
+            return {}
+        with open(path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as table:
+                records = _Records(table, record=LENGTH_RECORD)
+                found = {_id: records.find(_id) for _id in ids}
+        return {_id: entry[0] for _id, entry in found.items() if entry}
+
+    def update(self, changed, deleted: set) -> None:
+        """
+        Log created, updated and deleted notes.
+
+        Only the changed notes are written. Changes are appended
+        after the committed end of the log, dropping anything a
+        failed update left past it, and committed by replacing
+        index.json.
+
+        args:
+            changed: (iterable)
+                Notes created or updated.
+
+            deleted: (set)
+                Ids of notes deleted.
+        """
+        meta = self._meta()
+        if meta is None:
+            return
+        changes = self._changes(meta)
+        log = []
+        for _id in deleted:
+            log.append({"id": _id})
+        for note in changed:
+            terms = self._terms(note)
+            log.append({"id": note.id, "length": sum(terms.values()), "terms": terms})
+
+        stored = self._stored_lengths(
+            meta["generation"],
+            [change["id"] for change in log if change["id"] not in changes],
+        )
+        for change in log:
+            previous = changes.get(change["id"], {"length": stored.get(change["id"])})
+            if previous.get("length") is not None:
+                meta["documents"] -= 1
+                meta["total_length"] -= previous["length"]
+            if "length" in change:
+                meta["documents"] += 1
+                meta["total_length"] += change["length"]
+            changes[change["id"]] = change
+
+        with open(self._path(meta["generation"], "changes"), "ab") as file:
+            file.truncate(meta["changes"])
+            file.write(b"".join(dumps(change) + b"\n" for change in log))
+            file.flush()
+            os.fsync(file.fileno())
+            meta["changes"] = file.tell()
+
+        if meta["changes"] > CHANGES_LIMIT:
+            self._compact(meta=meta, changes=changes)
+        else:
+            with atomic_write(self.meta_path, mode="wb") as file:
+                file.write(dumps(meta))
+
+    def _compact(self, meta: dict, changes: dict) -> None:
+        """Fold the log of changes into a new segment."""
+        import numpy
+
+        generation = meta["generation"]
+        lexicon = numpy.fromfile(self._path(generation, "terms"), dtype=TERM_TYPE)
+        postings = numpy.fromfile(
+            self._path(generation, "postings"), dtype=POSTING_TYPE
+        )
+        lengths = numpy.fromfile(self._path(generation, "lengths"), dtype=LENGTH_TYPE)
+        superseded = numpy.fromiter(changes, dtype="i8", count=len(changes))
+        kept = ~numpy.isin(postings["id"], superseded)
+
+        added = {}
+        added_lengths = []
+        for _id, change in changes.items():
+            if "terms" not in change:
+                continue
+            added_lengths.append((_id, change["length"]))
+            for term, frequency in change["terms"].items():
+                added.setdefault(term_key(term), array("I")).extend(
+                    (_id, frequency, change["length"])
+                )
+
+        ranges = {
+            key: (offset, offset + count) for key, offset, count in lexicon.tolist()
+        }
+
+        def merged():
+            for key in sorted(ranges.keys() | added.keys()):
+                start, end = ranges.get(key, (0, 0))
+                values = postings[start:end][kept[start:end]].tobytes()
+                values += _packed(added.get(key, array("I")))
+                if values:
+                    yield key, values
+
+        lengths = numpy.concatenate(
+            [
+                lengths[~numpy.isin(lengths["id"], superseded)],
+                numpy.array(added_lengths, dtype=LENGTH_TYPE),
+            ]
+        )
+        lengths.sort(order="id")
+        self._commit(generation=generation + 1, postings=merged(), lengths=lengths)
+
+    def _postings(self, generation: int, term: str, changes: dict):
+        """
+        Return a term's postings, with the log of changes applied.
+
+        returns: (numpy.ndarray)
+            The postings of notes holding the term.
+        """
+        import numpy
+
+        postings = numpy.empty(0, dtype=POSTING_TYPE)
+        path = self._path(generation, "terms")
+        if os.path.getsize(path):
+            with open(path, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as table:
+                    found = _Records(table, record=TERM_RECORD).find(term_key(term))
+            if found:
+                offset, count = found
+                with open(self._path(generation, "postings"), "rb") as file:
+                    file.seek(offset * POSTING_SIZE)
+                    postings = numpy.fromfile(file, dtype=POSTING_TYPE, count=count)
+        if not changes:
+            return postings
+
+        superseded = numpy.fromiter(changes, dtype="i8", count=len(changes))
+        added = [
+            (_id, change["terms"][term], change["length"])
+            for _id, change in changes.items()
+            if term in change.get("terms", ())
+        ]
+        return numpy.concatenate(
+            [
+                postings[~numpy.isin(postings["id"], superseded)],
+                numpy.array(added, dtype=POSTING_TYPE),
+            ]
+        )
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """
+        Return the notes best matching a query.
+
+        args:
+            query: (str)
+                The words to search for.
+
+            limit: (int)
+                The most results to return.
+
+        returns: (list)
+            (id, score) tuples,
+            best match first.
+        """
+        import numpy
+
+        meta = self._meta()
+        if not meta or not meta["documents"] or limit <= 0:
+            return []
+        average_length = meta["total_length"] / meta["documents"]
+        changes = self._changes(meta)
+
+        matches = []
+        for term in set(tokenize(query)):
+            postings = self._postings(meta["generation"], term, changes)
+            idf = math.log(
+                1 + (meta["documents"] - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            frequency = postings["frequency"].astype(float)
+            norm = self.k1 * (1 - self.b + self.b * postings["length"] / average_length)
+            matches.append(
+                (postings["id"], idf * frequency * (self.k1 + 1) / (frequency + norm))
+            )
+        if not any(len(ids) for ids, _ in matches):
+            return []
+
+        totals = numpy.zeros(max(int(ids.max()) for ids, _ in matches if len(ids)) + 1)
+        for ids, scores in matches:
+            totals[ids] += scores
+        found = numpy.flatnonzero(totals)
+        if len(found) > limit:
+            # Notes tied with the last place are kept, so ties go to the lowest id.
+            cutoff = numpy.partition(totals[found], len(found) - limit)
+            found = found[totals[found] >= cutoff[len(found) - limit]]
+        found = found[numpy.lexsort((found, -totals[found]))][:limit]
+        return [(int(_id), float(totals[_id])) for _id in found]
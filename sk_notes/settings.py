@@ -1,6 +1,59 @@
 """Classes to house project wide generic operations."""
+import json
 import os
-import yaml
+import zlib
+
+from sk_notes.constants import STORAGE_DIRECTORY
+from sk_notes.trace import traced
+
+# Set to a settings file to use it wherever notes is run from.
+SETTINGS_VARIABLE = "NOTES_SETTINGS"
+SETTINGS_FILE = "settings.yml"
+
+# Settings used for anything the settings file leaves out, or if there is none.
+DEFAULT_SETTINGS = {
+    "aggregations": ["Personal", "Work"],
+    "storage": "local",
+    "storage_directory": STORAGE_DIRECTORY,
+}
+
+
+class SettingsError(ValueError):
+    """Raised when a settings file cannot be found or read."""
+
+
+def _home_directory(variable: str, fallback: str) -> str:
+    """Return an XDG base directory, or its default under the home directory."""
+    return os.environ.get(variable) or os.path.join(os.path.expanduser("~"), fallback)
+
+
+def find_settings_file() -> str:
+    """
+    Return the settings file to use.
+
+    The file NOTES_SETTINGS names is used if it is set.
+    Otherwise settings.yml in the current directory is
+    used, then notes/settings.yml in the XDG config
+    directory, ~/.config unless XDG_CONFIG_HOME is set.
+
+    returns: (str)
+        The path of the settings
+        file, or None if there is none.
+
+    raises: (SettingsError)
+        If NOTES_SETTINGS names
+        a file that does not exist.
+    """
+    named = os.environ.get(SETTINGS_VARIABLE)
+    if named:
+        if not os.path.isfile(named):
+            raise SettingsError(f"{SETTINGS_VARIABLE} names {named}, which is missing")
+        return named
+    if os.path.isfile(SETTINGS_FILE):
+        return SETTINGS_FILE
+    config = _home_directory("XDG_CONFIG_HOME", ".config")
+    path = os.path.join(config, "notes", SETTINGS_FILE)
+    return path if os.path.isfile(path) else None
 
 
 class Config:
@@ -14,27 +67,107 @@ class Config:
                 The path to the yaml
                 settings file used to
         """
-        self.settings_file = settings_file or "settings.yml"
+        self.settings_file = settings_file or SETTINGS_FILE
+        key = zlib.crc32(os.path.abspath(self.settings_file).encode("utf-8"))
+        cache = _home_directory("XDG_CACHE_HOME", ".cache")
+        self.cache_file = os.path.join(cache, "notes", f"settings-{key:08x}.json")
+
+    @traced("settings")
+    def settings(self) -> dict:
+        """
+        Load settings.yml into memory.
+
+        Parsed settings are cached as JSON in the XDG cache
+        directory, stamped with the settings file's path,
+        modification time and size, so YAML is only imported
+        and parsed again after the file changes.
+
+        returns: (dict)
+            The settings, or None if
+            the file does not exist.
+        """
+        try:
+            stat = os.stat(self.settings_file)
+        except FileNotFoundError:
+            return None
+        stamp = [os.path.abspath(self.settings_file), stat.st_mtime_ns, stat.st_size]
+        settings = self._read_cache(stamp=stamp)
+        if settings is None:
+            settings = self._parse()
+            self._write_cache(stamp=stamp, settings=settings)
+        return settings
 
-    def settings(self) -> None:
-        """Load settings.yml into memory."""
-        with open(self.settings_file, "r") as file:
-            try:
+    def _parse(self) -> dict:
+        """
+        Parse the settings file with PyYAML.
+
+        raises: (SettingsError)
+            If the file is not YAML, or
+            does not hold a mapping.
+        """
+        import yaml
 
-                return yaml.safe_load(file)
-            except yaml.YAMLError as err:
-                raise yaml.YAMLError(err)
-            except FileNotFoundError:
-                return None
+        try:
+            with open(self.settings_file, "r") as file:
+                settings = yaml.safe_load(file)
+        except FileNotFoundError:
+            return None
+        except yaml.YAMLError as err:
+            raise SettingsError(f"{self.settings_file} is not valid YAML: {err}")
+        if settings is None:
+            return {}
+        if not isinstance(settings, dict):
+            raise SettingsError(f"{self.settings_file} should hold a mapping")
+        return settings
+
+    def _read_cache(self, stamp: list) -> dict:
+        """Return cached settings if they were parsed from this stamp, or None."""
+        try:
+            with open(self.cache_file, "r") as cache:
+                cached = json.load(cache)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cached, dict) or cached.get("stamp") != stamp:
+            return None
+        return cached.get("settings")
+
+    def _write_cache(self, stamp: list, settings: dict) -> None:
+        """
+        Cache parsed settings, if they can be.
+
+        Settings holding values JSON has no type for, such
+        as unquoted dates, and caches that cannot be written,
+        are left uncached and parsed each time instead.
+        """
+        if settings is None:
+            return
+        try:
+            content = json.dumps({"stamp": stamp, "settings": settings})
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(temp_path, mode="w") as cache:
+                cache.write(content)
+            os.replace(temp_path, self.cache_file)
+        except (OSError, TypeError, ValueError):
+            pass
 
 
 class SetUp:
-    """Class used to extract user defined settings."""
+    """
+    Class used to extract user defined settings.
+
+    args:
+        settings_file: (str)
+            The settings file to read,
+            or None to find one with
+            find_settings_file.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, settings_file: str = None) -> None:
         """Initialise the class."""
-        self.config = Config(settings_file="settings.yml")
-        self.settings = self.config.settings()
+        self.settings_file = settings_file or find_settings_file()
+        self.config = Config(settings_file=self.settings_file)
+        self.settings = {**DEFAULT_SETTINGS, **(self.config.settings() or {})}
 
     def aggregations(self) -> list:
         """Return user defined aggregations."""
@@ -57,3 +190,32 @@ class SetUp:
     def bucket(self) -> str:
         """Get GCP bucket from settings."""
         return self.settings.get("gcs_bucket", None)
+
+    def storage(self) -> str:
+        """Return the storage handler to keep notes in."""
+        return self.settings.get("storage", None) or "local"
+
+    def storage_directory(self) -> str:
+        """
+        Return the directory notes are stored in.
+
+        A relative storage_directory is taken from the directory
+        of the settings file, so the same notes are used wherever
+        notes is run from. Without a settings file it is taken
+        from the current directory.
+        """
+        directory = self.settings.get("storage_directory") or STORAGE_DIRECTORY
+        base = os.path.dirname(self.settings_file or "")
+        return os.path.join(base, os.path.expanduser(directory))
+
+    def journal_compact_bytes(self) -> int:
+        """Return the journal size that triggers compaction."""
+        return self.settings.get("journal_compact_bytes", None)
+
+    def compression(self) -> dict:
+        """Return the codec and level to compress snapshots with."""
+        return self.settings.get("compression", None)
+
+    def retention(self) -> dict:
+        """Return how many old snapshots to keep."""
+        return self.settings.get("retention", None)
@@ -0,0 +1,199 @@
+"""Classes to handle the indexes stored next to each snapshot."""
+import json
+import mmap
+import os
+import struct
+
+OFFSET_RECORD = struct.Struct("<qqq")
+
+
+def has_tags(note: dict, tags: list, match: str = "all") -> bool:
+    """
+    Return True if a dict formatted note has the tags.
+
+    args:
+        note: (dict)
+            The note to test.
+
+        tags: (list)
+            The tags to look for.
+
+        match: (str)
+            "all" to require every tag,
+            or "any" to require one.
+    """
+    found = set(tags).intersection(note.get("tags") or [])
+    return len(found) == len(set(tags)) if match == "all" else bool(found)
+
+
+class SnapshotIndex:
+    """
+    Inverted tag and category indexes for one snapshot.
+
+    args:
+        tags: (dict)
+            Lists of note ids
+            keyed by tag.
+
+        categories: (dict)
+            Lists of note ids
+            keyed by category.
+    """
+
+    def __init__(self, tags: dict = None, categories: dict = None) -> None:
+        """Initialise the class."""
+        self.tags = tags or {}
+        self.categories = categories or {}
+
+    def add(self, note) -> None:
+        """Add a note to the indexes."""
+        for tag in note.tags:
+            self.tags.setdefault(tag, []).append(note.id)
+        self.categories.setdefault(note.category, []).append(note.id)
+
+    def ids_for_tags(self, tags: list, match: str = "all") -> set:
+        """
+        Return the ids of notes with the tags.
+
+        args:
+            tags: (list)
+                The tags to look for.
+
+            match: (str)
+                "all" to intersect the notes
+                of each tag, or "any" to
+                take their union.
+        """
+        id_sets = [set(self.tags.get(tag, [])) for tag in tags]
+        if not id_sets:
+            return set()
+        if match == "all":
+            return set.intersection(*id_sets)
+        return set.union(*id_sets)
+
+    def ids_for_category(self, category: str) -> set:
+        """Return the ids of notes in a category."""
+        return set(self.categories.get(category, []))
+
+    def write(self, path: str) -> None:
+        """Write the indexes to a JSON file."""
+        with open(path, mode="w") as file:
+            file.write(json.dumps({"tags": self.tags, "categories": self.categories}))
+
+    def read(self, path: str) -> "SnapshotIndex":
+        """Replace the indexes with those in a JSON file."""
+        with open(path, "r") as file:
+            indexes = json.load(file)
+        self.tags = indexes["tags"]
+        self.categories = indexes["categories"]
+        return self
+
+
+class OffsetTable:
+    """
+    Byte ranges of each note in a snapshot, sorted by id.
+
+    Entries are fixed width, so a note's range is found with
+    a binary search over the memory mapped file rather than by
+    reading the whole table.
+
+    args:
+        path: (str)
+            The offset table file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialise the class."""
+        self.path = path
+
+    def write(self, entries: list) -> None:
+        """
+        Write offsets to the table.
+
+        args:
+            entries: (list)
+                (id, offset, length) tuples.
+        """
+        with open(self.path, mode="wb") as file:
+            for entry in sorted(entries):
+                file.write(OFFSET_RECORD.pack(*entry))
+
+    def last_id(self) -> int:
+        """Return the highest id in the table, or None if it is empty."""
+        with open(self.path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            if not file.tell():
+                return None
+            file.seek(-OFFSET_RECORD.size, os.SEEK_END)
+            return OFFSET_RECORD.unpack(file.read(OFFSET_RECORD.size))[0]
+
+    def lookup(self, ids: set) -> list:
+        """
+        Return the byte ranges of notes, in snapshot order.
+
+        args:
+            ids: (set)
+                The ids of notes to find.
+
+        returns: (list)
+            (offset, length) tuples for
+            the ids found in the table.
+        """
+        if not ids or not os.path.getsize(self.path):
+            return []
+        with open(self.path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as table:
+                records = _Records(table)
+                ranges = [records.find(_id) for _id in ids]
+        return sorted(entry for entry in ranges if entry is not None)
+
+
+class _Records:
+    """
+    Sequence view of the entries in a memory mapped table sorted by id.
+
+    args:
+        table: (mmap.mmap)
+            The mapped table.
+
+        record: (struct.Struct)
+            The layout of each entry,
+            starting with the id.
+    """
+
+    def __init__(self, table: mmap.mmap, record: struct.Struct = OFFSET_RECORD) -> None:
+        """Initialise the class."""
+        self.table = table
+        self.record = record
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self.table) // self.record.size
+
+    def __getitem__(self, position: int) -> tuple:
+        """Return the entry at a position."""
+        return self.record.unpack_from(self.table, position * self.record.size)
+
+    def position(self, _id: int) -> int:
+        """Return the position of an id, or where it would be inserted."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle][0] < _id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, _id: int) -> tuple:
+        """
+        Return an entry's fields after the id by binary search.
+
+        returns: (tuple)
+            For an offset table (offset, length),
+            or None if the id is not in the table.
+        """
+        low = self.position(_id)
+        if low < len(self) and self[low][0] == _id:
+            return self[low][1:]
+        return None
@@ -0,0 +1,324 @@
+"""Classes to handle interactions with SQLite storage."""
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from itertools import chain
+from typing import Iterator
+
+from sk_notes.local_handler import LocalHandler, batched
+from sk_notes.note_handler import NewNote
+
+# How many notes are inserted by each statement when appending.
+INSERT_BATCH_SIZE = 10000
+# The most ids bound into one query, under every SQLITE_MAX_VARIABLE_NUMBER.
+ID_BATCH_SIZE = 900
+
+SCHEMA = """
+create table if not exists notes (
+    id integer primary key,
+    created_at integer not null,
+    category text,
+    title text not null,
+    body text,
+    due_date text
+);
+
+create table if not exists note_tags (
+    note_id integer not null references notes (id) on delete cascade,
+    tag text not null,
+    primary key (tag, note_id)
+);
+
+create index if not exists notes_category on notes (category);
+create index if not exists notes_due_date on notes (due_date);
+create index if not exists note_tags_note_id on note_tags (note_id);
+"""
+
+SELECT_NOTES = """
+select
+    notes.id,
+    notes.created_at,
+    notes.category,
+    notes.title,
+    notes.body,
+    notes.due_date,
+    (
+        select json_group_array(note_tags.tag)
+        from note_tags
+        where note_tags.note_id = notes.id
+    ) as tags
+from notes
+"""
+
+
+class SQLiteHandler(LocalHandler):
+    """
+    Wrapper around SQLite storage operations.
+
+    Notes are stored one per row, with tags in a join table.
+    Saving only touches the rows that changed, and tag,
+    category and id lookups are answered by indexed queries
+    instead of reading every note.
+
+    args:
+        directory: (str)
+            The directory the
+            database is stored in.
+
+        retention: (dict)
+            Unused, accepted so the
+            handlers share a signature.
+    """
+
+    writes_rows = True
+
+    def __init__(self, directory: str = None, retention: dict = None) -> None:
+        """Initialise the class."""
+        super().__init__(directory=directory, retention=retention)
+        self.database = os.path.join(self.directory, "notes.db")
+
+    @contextmanager
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open the database in a transaction, creating its tables if needed.
+
+        Every write counts itself in user_version, so the tables
+        are only created while it is 0, before the first write,
+        rather than checked on every connection.
+
+        The transaction is committed when the block exits cleanly,
+        rolled back if it raises, and the connection closed either way.
+        """
+        self._set_local_storage()
+        connection = sqlite3.connect(self.database)
+        try:
+            connection.execute("pragma foreign_keys = on")
+            if not connection.execute("pragma user_version").fetchone()[0]:
+                connection.execute("pragma journal_mode = wal")
+                connection.executescript(SCHEMA)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _bump_version(self, connection: sqlite3.Connection) -> None:
+        """Count a write in the database's user_version, read by version."""
+        version = connection.execute("pragma user_version").fetchone()[0]
+        connection.execute(f"pragma user_version = {version + 1}")
+
+    def version(self) -> int:
+        """Return the number of writes made to the database."""
+        if not os.path.isfile(self.database):
+            return super().version()
+        with self._connect() as connection:
+            return connection.execute("pragma user_version").fetchone()[0]
+
+    def _row_to_dict(self, row: tuple) -> dict:
+        """Convert a row selected by SELECT_NOTES into a dict."""
+        _id, created_at, category, title, body, due_date, tags = row
+        return {
+            "id": _id,
+            "created_at": created_at,
+            "category": category,
+            "title": title,
+            "body": body,
+            "tags": json.loads(tags),
+            "due_date": due_date,
+        }
+
+    def _iter_select(self, where: str = "", parameters: tuple = ()) -> Iterator[dict]:
+        """Yield dict formatted notes matching a where clause, row by row."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"{SELECT_NOTES} {where} order by notes.id", parameters
+            )
+            for row in rows:
+                yield self._row_to_dict(row)
+
+    def _select(self, where: str = "", parameters: tuple = ()) -> list:
+        """Return dict formatted notes matching a where clause."""
+        return list(self._iter_select(where=where, parameters=parameters))
+
+    def iter_notes(self, columns: list = None) -> Iterator[dict]:
+        """
+        Yield every note from the database one at a time.
+
+        Before the database is first written, notes are read
+        from the most recent JSON snapshot so existing notes
+        carry over.
+        """
+        if not os.path.isfile(self.database):
+            return super().iter_notes(columns=columns)
+        return self._iter_select()
+
+    def read_note(self, _id: int) -> list:
+        """Read the note with a specified id."""
+        if not os.path.isfile(self.database):
+            return super().read_note(_id=_id)
+        return self._select("where notes.id = ?", (_id,))
+
+    def read_notes_by_ids(self, ids: set) -> list:
+        """
+        Read the notes with specified ids.
+
+        Ids are looked up ID_BATCH_SIZE at a time, in order,
+        so no query binds more variables than SQLite allows.
+        """
+        if not os.path.isfile(self.database):
+            return super().read_notes_by_ids(ids=ids)
+        notes = []
+        for batch in batched(sorted(ids), size=ID_BATCH_SIZE):
+            placeholders = ", ".join("?" for _ in batch)
+            notes += self._select(f"where notes.id in ({placeholders})", tuple(batch))
+        return notes
+
+    def read_notes_by_category(self, category: str, columns: list = None) -> list:
+        """Read the notes in a specified category."""
+        if not os.path.isfile(self.database):
+            return super().read_notes_by_category(category=category)
+        return self._select("where notes.category = ?", (category,))
+
+    def read_notes_by_tags(
+        self, tags: list, match: str = "all", columns: list = None
+    ) -> list:
+        """Read the notes with specified tags."""
+        if not os.path.isfile(self.database):
+            return super().read_notes_by_tags(tags=tags, match=match)
+
+        tags = list(dict.fromkeys(tags))
+        placeholders = ", ".join("?" for _ in tags)
+        having = f"having count(*) = {len(tags)}" if match == "all" else ""
+        return self._select(
+            f"""
+            where notes.id in (
+                select note_id from note_tags
+                where tag in ({placeholders})
+                group by note_id {having}
+            )
+            """,
+            tuple(tags),
+        )
+
+    def read_notes_due(
+        self, start: str = None, end: str = None, columns: list = None
+    ) -> list:
+        """Read the notes due between two dates."""
+        if not os.path.isfile(self.database):
+            return super().read_notes_due(start=start, end=end, columns=columns)
+        return self._select(
+            "where notes.due_date between ? and ?",
+            (start or "0000-00-00", end or "9999-99-99"),
+        )
+
+    def _upsert(self, connection: sqlite3.Connection, notes: list) -> None:
+        """Insert or update notes and replace their tags."""
+        rows = [note.to_dict() for note in notes]
+        connection.executemany(
+            """
+            insert into notes (id, created_at, category, title, body, due_date)
+            values (:id, :created_at, :category, :title, :body, :due_date)
+            on conflict (id) do update set
+                category = excluded.category,
+                title = excluded.title,
+                body = excluded.body,
+                due_date = excluded.due_date
+            """,
+            rows,
+        )
+        connection.executemany(
+            "delete from note_tags where note_id = ?",
+            [(row["id"],) for row in rows],
+        )
+        connection.executemany(
+            "insert or ignore into note_tags (note_id, tag) values (?, ?)",
+            [(row["id"], tag) for row in rows for tag in row["tags"]],
+        )
+
+    def write_notes(self, data: list) -> str:
+        """
+        Replace every note in the database.
+
+        args:
+            data: (list)
+                A list of notes
+                to store.
+
+        returns: (str)
+            A message confirming the write
+            location of the notes.
+        """
+        with self._connect() as connection:
+            connection.execute("delete from notes")
+            self._upsert(connection=connection, notes=data)
+            self._bump_version(connection=connection)
+        return f"Notes written to {self.database}"
+
+    def history(self):
+        """Raise, as the database keeps no snapshots to read old revisions from."""
+        raise ValueError("History needs snapshot storage, not sqlite")
+
+    def max_id(self) -> int:
+        """Return the highest stored note id."""
+        if not os.path.isfile(self.database):
+            return super().max_id()
+        with self._connect() as connection:
+            return connection.execute("select max(id) from notes").fetchone()[0] or 0
+
+    def append_notes(self, notes) -> str:
+        """
+        Insert notes in batches, in one transaction.
+
+        The first write carries over notes read from
+        a JSON snapshot, as write_changes does.
+
+        args:
+            notes: (iterable)
+                Notes with ids above
+                every stored id.
+        """
+        if not os.path.isfile(self.database):
+            stored = (NewNote(note=note).dict_to_note() for note in self.iter_notes())
+            notes = chain(stored, notes)
+        with self._connect() as connection:
+            for batch in batched(notes, size=INSERT_BATCH_SIZE):
+                self._upsert(connection=connection, notes=batch)
+            self._bump_version(connection=connection)
+        return f"Notes written to {self.database}"
+
+    def write_changes(self, data: list, changed: list, deleted: set) -> str:
+        """
+        Update and delete only the rows that changed, in one transaction.
+
+        The first save writes every note, carrying over
+        notes read from a JSON snapshot.
+
+        args:
+            data: (iterable)
+                Every note, only read
+                by the first save.
+
+            changed: (list)
+                Notes created or updated
+                since the last save.
+
+            deleted: (set)
+                Ids of notes deleted
+                since the last save.
+
+        returns: (str)
+            A message confirming the write
+            location of the notes.
+        """
+        if not os.path.isfile(self.database):
+            # Notes may be streamed from the snapshot the database
+            # replaces, so they are read before it is created.
+            return self.write_notes(data=list(data))
+
+        with self._connect() as connection:
+            self._upsert(connection=connection, notes=changed)
+            connection.executemany(
+                "delete from notes where id = ?", [(_id,) for _id in deleted]
+            )
+            self._bump_version(connection=connection)
+        return f"{len(changed) + len(deleted)} changes written to {self.database}"
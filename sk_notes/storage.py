@@ -0,0 +1,54 @@
+"""Select the storage handler configured in settings.yml."""
+from sk_notes.settings import SetUp
+
+
+def storage_handler(setup: SetUp) -> "LocalHandler":  # noqa: F821
+    """
+    Return the storage handler named by the storage setting.
+
+    Only the chosen handler's module is imported, so a store
+    never pays to load the others or the libraries they need.
+
+    args:
+        setup: (SetUp)
+            The loaded user settings.
+
+    returns: (LocalHandler)
+        A handler exposing read_notes,
+        write_notes and write_changes.
+    """
+    storage = setup.storage()
+    directory = setup.storage_directory()
+    retention = setup.retention()
+    compression = setup.compression()
+    if storage == "local":
+        from sk_notes.local_handler import LocalHandler
+
+        return LocalHandler(
+            directory=directory, retention=retention, compression=compression
+        )
+    elif storage == "journal":
+        from sk_notes.journal_handler import JournalHandler
+
+        return JournalHandler(
+            directory=directory,
+            retention=retention,
+            compact_bytes=setup.journal_compact_bytes(),
+            compression=compression,
+        )
+    elif storage == "objects":
+        from sk_notes.object_handler import ObjectHandler
+
+        return ObjectHandler(directory=directory, retention=retention)
+    elif storage == "parquet":
+        from sk_notes.parquet_handler import ParquetHandler
+
+        return ParquetHandler(
+            directory=directory, retention=retention, compression=compression
+        )
+    elif storage == "sqlite":
+        from sk_notes.sqlite_handler import SQLiteHandler
+
+        return SQLiteHandler(directory=directory, retention=retention)
+    else:
+        raise ValueError(f"Unknown storage '{storage}' in settings.yml")
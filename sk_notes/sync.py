@@ -0,0 +1,356 @@
+"""Classes to sync stored notes with a bucket, transferring only what changed."""
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sk_notes.buckets import PreconditionFailed
+from sk_notes.concurrency import atomic_write
+from sk_notes.note_handler import NewNote
+
+# How many consecutive ids share a segment, the unit transferred.
+SEGMENT_NOTES = 1000
+TRANSFER_THREADS = 8
+RETRY_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.5
+# How many times a sync starts over when another client pushes first.
+SYNC_ROUNDS = 5
+MANIFEST = "manifest.json"
+
+
+def note_line(note: dict) -> bytes:
+    """Serialise a dict formatted note identically on every client."""
+    note = NewNote(note=note).dict_to_note().to_dict()
+    return json.dumps(note, sort_keys=True).encode("utf-8")
+
+
+def note_hash(line: bytes) -> str:
+    """Return the hash identifying a serialised note's contents."""
+    return hashlib.sha256(line).hexdigest()[:16]
+
+
+def segment_of(_id: int) -> str:
+    """Return the name of the segment holding an id."""
+    return str(_id // SEGMENT_NOTES)
+
+
+def segments(hashes: dict) -> dict:
+    """Group note hashes, keyed by id, into segments."""
+    grouped = {}
+    for _id, hashed in hashes.items():
+        grouped.setdefault(segment_of(_id), {})[_id] = hashed
+    return grouped
+
+
+def segment_digest(hashes: dict) -> str:
+    """Return a digest of a segment from its notes' ids and hashes."""
+    digest = hashlib.sha256()
+    for _id in sorted(hashes):
+        digest.update(f"{_id}:{hashes[_id]}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class SyncEngine:
+    """
+    Sync a storage handler's notes with a bucket.
+
+    Notes are grouped into segments of SEGMENT_NOTES consecutive
+    ids. The bucket holds a manifest naming the object holding
+    each segment, and storage keeps the hash of every note as
+    last synced. Comparing the local notes, the last sync and the
+    manifest, a sync downloads only segments changed remotely,
+    uploads only segments changed locally, and merges segments
+    changed on both sides note by note. Transfers run on a thread
+    pool, retrying transient errors with exponential backoff.
+
+    args:
+        local: (LocalHandler)
+            The storage handler
+            holding the notes.
+
+        bucket: (LocalBucket)
+            The bucket to sync with,
+            a LocalBucket or GCSBucket.
+
+        threads: (int)
+            How many transfers
+            run at once.
+    """
+
+    def __init__(self, local, bucket, threads: int = None) -> None:
+        """Initialise the class."""
+        self.local = local
+        self.bucket = bucket
+        self.threads = threads or TRANSFER_THREADS
+        self.state_path = os.path.join(local.directory, "sync.json")
+
+    def _retry(self, call, *args, **kwargs):
+        """Call a bucket method, retrying transient errors with backoff."""
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return call(*args, **kwargs)
+            except self.bucket.transient_errors:
+                if attempt == RETRY_ATTEMPTS - 1:
+                    raise
+                time.sleep(BACKOFF_SECONDS * 2**attempt)
+
+    def _transfer(self, call, items: list) -> list:
+        """Run call on every item on the thread pool, returning the results."""
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            return list(pool.map(lambda item: self._retry(call, *item), items))
+
+    def _read_state(self) -> dict:
+        """Return the note hashes as they were at the last sync."""
+        try:
+            with open(self.state_path, "r") as state:
+                hashes = json.load(state)["notes"]
+        except FileNotFoundError:
+            return {}
+        return {int(_id): hashed for _id, hashed in hashes.items()}
+
+    def _write_state(self, hashes: dict) -> None:
+        """Record the note hashes that are now in sync."""
+        with atomic_write(self.state_path) as state:
+            json.dump({"notes": hashes}, state)
+
+    def _read_manifest(self) -> tuple:
+        """Return the bucket's manifest and its generation."""
+        data, generation = self._retry(self.bucket.get, MANIFEST)
+        if data is None:
+            return {"segments": {}, "max_id": 0}, 0
+        return json.loads(data), generation
+
+    def _local_hashes(self) -> dict:
+        """Return the hash of every stored note, keyed by id."""
+        if self.local.is_empty():
+            return {}
+        return {
+            note["id"]: note_hash(note_line(note)) for note in self.local.iter_notes()
+        }
+
+    def _download(self, name: str) -> dict:
+        """Download a segment, returning its serialised notes keyed by id."""
+        data, _ = self.bucket.get(name)
+        if data is None:
+            raise FileNotFoundError(f"Segment {name} is missing from the bucket")
+        lines = gzip.decompress(data).splitlines()
+        return {json.loads(line)["id"]: line for line in lines}
+
+    def _upload(self, name: str, lines: list) -> None:
+        """Upload a segment, unless an identical one is already stored."""
+        try:
+            self.bucket.put(name, gzip.compress(b"\n".join(lines)), if_generation=0)
+        except PreconditionFailed:
+            pass
+
+    def _merge(self, local: dict, base: dict, remote: dict, next_id: int) -> tuple:
+        """
+        Merge a segment changed remotely into the local notes.
+
+        args:
+            local: (dict)
+                The segment's local note
+                hashes, keyed by id.
+
+            base: (dict)
+                The note hashes
+                at the last sync.
+
+            remote: (dict)
+                The segment's serialised
+                remote notes, keyed by id.
+
+            next_id: (int)
+                The first id free on
+                both sides.
+
+        returns: (tuple)
+            The remote notes to take, the ids
+            to delete, local notes to give new
+            ids as {old: new}, and how many
+            conflicting notes kept their
+            local changes.
+        """
+        take, drop, renumber, conflicts = {}, set(), {}, 0
+        for _id in set(local) | set(remote) | set(base):
+            remote_hash = remote.get(_id) and note_hash(remote[_id])
+            if local.get(_id) == remote_hash or remote_hash == base.get(_id):
+                continue
+            if local.get(_id) == base.get(_id):
+                if remote_hash is None:
+                    drop.add(_id)
+                else:
+                    take[_id] = remote[_id]
+            elif base.get(_id) is None and local.get(_id) and remote_hash:
+                renumber[_id] = next_id + len(renumber)
+                take[_id] = remote[_id]
+            else:
+                conflicts += 1
+        return take, drop, renumber, conflicts
+
+    def _apply(self, take: dict, drop: set, renumber: dict) -> None:
+        """Write the notes taken from the bucket to local storage."""
+        moved = renumber and self.local.read_notes_by_ids(set(renumber))
+        moved = {note["id"]: note for note in moved or []}
+        changed = [
+            NewNote(note=json.loads(line)).dict_to_note() for line in take.values()
+        ]
+        for old_id, new_id in renumber.items():
+            note = NewNote(note=moved[old_id]).dict_to_note()
+            note.id = new_id
+            changed.append(note)
+        if not changed and not drop:
+            return
+        updates = {note.id: note for note in changed}
+        if updates:
+            self.local.ids.advance(past=max(updates))
+
+        def merged():
+            for note in self.local.iter_notes():
+                if note["id"] in updates:
+                    yield updates.pop(note["id"])
+                elif note["id"] not in drop:
+                    yield NewNote(note=note).dict_to_note()
+            yield from updates.values()
+
+        self.local.write_changes(data=merged(), changed=changed, deleted=drop)
+
+    def _pull(self, manifest: dict, base: dict, local: dict) -> tuple:
+        """
+        Download and merge every segment changed remotely.
+
+        The pulled segments become the base of the next merge,
+        so a sync that starts over does not mistake them for
+        local changes.
+
+        returns: (tuple)
+            How many segments were pulled,
+            how many notes conflicted, and
+            the note hashes as now synced.
+        """
+        remote = manifest["segments"]
+        local_segments, base_segments = segments(local), segments(base)
+        changed = [
+            name
+            for name, entry in remote.items()
+            if entry["digest"] != segment_digest(base_segments.get(name, {}))
+            and entry["digest"] != segment_digest(local_segments.get(name, {}))
+        ]
+        removed = [
+            name
+            for name in base_segments
+            if name not in remote and name in local_segments
+        ]
+        downloaded = self._transfer(
+            self._download, [(remote[name]["object"],) for name in changed]
+        )
+        next_id = max([manifest.get("max_id", 0), *local, 0]) + 1
+        take, drop, renumber, conflicts = {}, set(), {}, 0
+        base = dict(base)
+        for name, notes in zip(changed + removed, downloaded + [{}] * len(removed)):
+            for _id in base_segments.get(name, {}):
+                del base[_id]
+            base.update((_id, note_hash(line)) for _id, line in notes.items())
+            merged = self._merge(
+                local=local_segments.get(name, {}),
+                base=base_segments.get(name, {}),
+                remote=notes,
+                next_id=next_id + len(renumber),
+            )
+            take.update(merged[0])
+            drop.update(merged[1])
+            renumber.update(merged[2])
+            conflicts += merged[3]
+        if renumber:
+            # Local notes move to ids reserved beyond every id on both sides.
+            self.local.ids.advance(past=next_id - 1)
+            renumber = dict(zip(renumber, self.local.ids.reserve(len(renumber))))
+        self._apply(take=take, drop=drop, renumber=renumber)
+        return len(changed) + len(removed), conflicts, base
+
+    def _push(self, manifest: dict, local: dict) -> int:
+        """
+        Upload every segment that differs from the manifest's.
+
+        returns: (int)
+            How many segments were uploaded
+            or removed from the manifest.
+        """
+        remote = manifest["segments"]
+        local_segments = segments(local)
+        pushed = {
+            name: segment_digest(hashes)
+            for name, hashes in local_segments.items()
+            if segment_digest(hashes) != remote.get(name, {}).get("digest")
+        }
+        removed = [name for name in remote if name not in local_segments]
+        ids = {_id for name in pushed for _id in local_segments[name]}
+        lines = {}
+        for note in self.local.read_notes_by_ids(ids) if ids else []:
+            lines.setdefault(segment_of(note["id"]), []).append(note_line(note))
+        uploads = [
+            (f"segments/{name}/{digest}.jsonl.gz", sorted(lines[name]))
+            for name, digest in pushed.items()
+        ]
+        self._transfer(self._upload, uploads)
+        for (object_name, _), (name, digest) in zip(uploads, pushed.items()):
+            remote[name] = {"digest": digest, "object": object_name}
+        for name in removed:
+            del remote[name]
+        manifest["max_id"] = max([manifest.get("max_id", 0), *local, 0])
+        return len(pushed) + len(removed)
+
+    def _round(self) -> str:
+        """Pull, then push, against the manifest as it is now."""
+        manifest, generation = self._read_manifest()
+        superseded = {entry["object"] for entry in manifest["segments"].values()}
+        local = self._local_hashes()
+        pulled, conflicts, base = self._pull(
+            manifest=manifest, base=self._read_state(), local=local
+        )
+        if pulled:
+            self._write_state(hashes=base)
+            local = self._local_hashes()
+        pushed = self._push(manifest=manifest, local=local)
+        if pushed:
+            self._retry(
+                self.bucket.put,
+                MANIFEST,
+                json.dumps(manifest).encode("utf-8"),
+                if_generation=generation,
+            )
+            superseded -= {entry["object"] for entry in manifest["segments"].values()}
+            self._transfer(self.bucket.delete, [(name,) for name in superseded])
+        self._write_state(hashes=local)
+        message = f"{pulled} segments pulled and {pushed} pushed"
+        if conflicts:
+            message += f", keeping local changes to {conflicts} conflicting notes"
+        return message
+
+    def sync(self) -> str:
+        """
+        Bring local storage and the bucket into step.
+
+        The store is locked for the whole sync. If another client
+        pushes between reading the manifest and writing it, the
+        sync starts over, pulling what that client pushed.
+
+        returns: (str)
+            A message summarising
+            the transfers.
+
+        raises: (PreconditionFailed)
+            If other clients keep pushing
+            for SYNC_ROUNDS attempts.
+        """
+        for attempt in range(SYNC_ROUNDS):
+            try:
+                with self.local.lock():
+                    return self._round()
+            except PreconditionFailed:
+                if attempt == SYNC_ROUNDS - 1:
+                    raise
+            finally:
+                self.local.sync()
@@ -0,0 +1,140 @@
+"""Classes to handle the index of when each note changed."""
+import json
+import os
+import struct
+
+from sk_notes.concurrency import atomic_write
+
+# Timestamp, id and kind of each change to a note.
+TIMELINE_RECORD = struct.Struct("<qqB")
+DELETED = 0
+WRITTEN = 1
+
+
+def note_digests(notes) -> dict:
+    """Return a digest of each dict formatted note's contents, keyed by id."""
+    return {note["id"]: hash(json.dumps(note, sort_keys=True)) for note in notes}
+
+
+def changes(timestamp: int, previous: dict, current: dict) -> list:
+    """
+    Return timeline records of the differences between two versions of a store.
+
+    args:
+        timestamp: (int)
+            The timestamp to record
+            the changes under.
+
+        previous: (dict)
+            Note digests before,
+            keyed by id.
+
+        current: (dict)
+            Note digests after,
+            keyed by id.
+    """
+    records = [
+        (timestamp, _id, WRITTEN)
+        for _id, digest in current.items()
+        if previous.get(_id) != digest
+    ]
+    deleted = sorted(set(previous) - set(current))
+    return records + [(timestamp, _id, DELETED) for _id in deleted]
+
+
+class Timeline:
+    """
+    An append-only log of the revisions of every note.
+
+    Each save appends one fixed width record per note it
+    created, updated or deleted, stamped with the timestamp
+    of the snapshot holding the change. Finding a note's
+    revisions, or what changed after a point in time, reads
+    this file rather than every snapshot. The file is only
+    written while the store lock is held, and appends are not
+    flushed to disk by themselves, so a crash loses at most
+    the history of the last save.
+
+    args:
+        path: (str)
+            The timeline file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialise the class."""
+        self.path = path
+
+    def exists(self) -> bool:
+        """Return True if the timeline has been started."""
+        return os.path.isfile(self.path)
+
+    def append(self, timestamp: int, written, deleted) -> None:
+        """
+        Record the notes changed by a save.
+
+        args:
+            timestamp: (int)
+                The timestamp of the snapshot
+                the changes are stored in.
+
+            written: (iterable)
+                Ids of notes created
+                or updated.
+
+            deleted: (iterable)
+                Ids of notes deleted.
+        """
+        records = [TIMELINE_RECORD.pack(timestamp, _id, WRITTEN) for _id in written]
+        records += [TIMELINE_RECORD.pack(timestamp, _id, DELETED) for _id in deleted]
+        with open(self.path, mode="ab") as timeline:
+            # Drop a record cut short by a crash, so later ones stay aligned.
+            size = timeline.seek(0, os.SEEK_END)
+            timeline.truncate(size - size % TIMELINE_RECORD.size)
+            timeline.write(b"".join(records))
+
+    def write(self, records: list) -> None:
+        """Replace the timeline with (timestamp, id, kind) records."""
+        with atomic_write(self.path, mode="wb") as timeline:
+            for record in records:
+                timeline.write(TIMELINE_RECORD.pack(*record))
+
+    def _table(self):
+        """
+        Read every record into a numpy structured array.
+
+        The records are compared column by column, so looking
+        through millions of changes stays quick. A record cut
+        short by a crash mid-append is left out.
+        """
+        import numpy
+
+        dtype = numpy.dtype([("timestamp", "<i8"), ("id", "<i8"), ("kind", "u1")])
+        try:
+            count = os.path.getsize(self.path) // TIMELINE_RECORD.size
+        except FileNotFoundError:
+            count = 0
+        if not count:
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.fromfile(self.path, dtype=dtype, count=count)
+
+    def revisions(self, _id: int) -> list:
+        """
+        Return the changes made to a note, oldest first.
+
+        returns: (list)
+            (timestamp, kind) tuples, kind
+            being WRITTEN or DELETED.
+        """
+        table = self._table()
+        found = table[table["id"] == _id]
+        return list(zip(found["timestamp"].tolist(), found["kind"].tolist()))
+
+    def max_id(self) -> int:
+        """Return the highest id of any note ever recorded, or 0."""
+        ids = self._table()["id"]
+        return int(ids.max()) if len(ids) else 0
+
+    def changed_after(self, timestamp: int) -> set:
+        """Return the ids of notes changed after a timestamp."""
+        table = self._table()
+        return set(table["id"][table["timestamp"] > timestamp].tolist())
@@ -0,0 +1,218 @@
+"""Functions to time the phases of a command, when asked to."""
+import json
+import os
+import sys
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from time import perf_counter, time
+
+# Set to 1 or stderr to print phase timings, or to a file to append them as JSON.
+TRACE_VARIABLE = "NOTES_TRACE"
+# Set to a file to dump a cProfile of the command to, as pstats reads.
+CPROFILE_VARIABLE = "NOTES_CPROFILE"
+
+_NULL = nullcontext()
+_tracer = None
+
+
+class Tracer:
+    """
+    Totals of the time and allocations spent in each phase of a command.
+
+    Phases nest, so time in an inner phase also counts towards
+    the phase around it. Allocations are the net number of
+    memory blocks a phase left allocated, from
+    sys.getallocatedblocks, which costs almost nothing to read.
+
+    args:
+        target: (str)
+            stderr to print a table, or a file
+            to append a JSON object per command.
+
+        cprofile: (str)
+            A file to dump a cProfile to,
+            or None to not profile.
+    """
+
+    def __init__(self, target: str = "stderr", cprofile: str = None) -> None:
+        """Initialise the class."""
+        self.target = target
+        self.cprofile = cprofile
+        self.phases = {}
+        self.started_at = time()
+        self.start = perf_counter()
+        self.profiler = None
+        if cprofile:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def add(self, name: str, seconds: float, blocks: int, calls: int = 1) -> None:
+        """Add time and allocations to a phase's totals."""
+        phase = self.phases.setdefault(name, [0, 0.0, 0])
+        phase[0] += calls
+        phase[1] += seconds
+        phase[2] += blocks
+
+    @contextmanager
+    def phase(self, name: str):
+        """Count the time and allocations of a block towards a phase."""
+        blocks = sys.getallocatedblocks()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(
+                name,
+                seconds=perf_counter() - start,
+                blocks=sys.getallocatedblocks() - blocks,
+            )
+
+    def iterate(self, name: str, iterable):
+        """Yield from iterable, counting the time spent producing items."""
+        iterator = iter(iterable)
+        seconds, blocks, calls = 0.0, 0, 0
+        try:
+            while True:
+                before = sys.getallocatedblocks()
+                start = perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += perf_counter() - start
+                    blocks += sys.getallocatedblocks() - before
+                calls += 1
+                yield item
+        finally:
+            self.add(name, seconds=seconds, blocks=blocks, calls=calls)
+
+    def report(self, command: list) -> dict:
+        """
+        Return the totals of every phase and of the whole command.
+
+        args:
+            command: (list)
+                The command line arguments,
+                without the program name.
+        """
+        try:
+            import resource
+
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            peak_kb = None
+        return {
+            "command": command,
+            "started_at": round(self.started_at, 3),
+            "wall_ms": round((perf_counter() - self.start) * 1000, 3),
+            "peak_rss_kb": peak_kb,
+            "phases": {
+                name: {
+                    "calls": calls,
+                    "ms": round(seconds * 1000, 3),
+                    "allocated_blocks": blocks,
+                }
+                for name, (calls, seconds, blocks) in self.phases.items()
+            },
+        }
+
+    def write(self, command: list) -> None:
+        """Write the report to stderr or the target file, and dump the profile."""
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.cprofile)
+        report = self.report(command=command)
+        if self.target not in ("1", "stderr"):
+            with open(self.target, mode="a") as target:
+                target.write(f"{json.dumps(report)}\n")
+            return
+        lines = [f"{'phase':<24} {'calls':>8} {'ms':>10} {'blocks':>10}"]
+        phases = sorted(report["phases"].items(), key=lambda item: -item[1]["ms"])
+        for name, phase in phases:
+            lines.append(
+                f"{name:<24} {phase['calls']:>8} {phase['ms']:>10.1f} "
+                f"{phase['allocated_blocks']:>10}"
+            )
+        lines.append(f"{'total':<24} {'':>8} {report['wall_ms']:>10.1f}")
+        sys.stderr.write("\n".join(lines) + "\n")
+
+
+def requested() -> bool:
+    """Return True if tracing was asked for in the environment."""
+    return bool(os.environ.get(TRACE_VARIABLE) or os.environ.get(CPROFILE_VARIABLE))
+
+
+def start(target: str = None, cprofile: str = None) -> Tracer:
+    """
+    Start tracing, unless it has already started.
+
+    args:
+        target: (str)
+            Where to write the report,
+            NOTES_TRACE or stderr if unset.
+
+        cprofile: (str)
+            Where to dump a cProfile,
+            NOTES_CPROFILE if unset.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(
+            target=target or os.environ.get(TRACE_VARIABLE) or "stderr",
+            cprofile=cprofile or os.environ.get(CPROFILE_VARIABLE),
+        )
+    return _tracer
+
+
+def stop(command: list) -> None:
+    """Stop tracing and write its report, if tracing."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.write(command=command)
+
+
+def cancel() -> None:
+    """Stop tracing without writing a report."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None and tracer.profiler:
+        tracer.profiler.disable()
+
+
+def phase(name: str):
+    """
+    Return a context manager timing a phase.
+
+    When not tracing it is a shared nullcontext,
+    so instrumented code does no extra work.
+    """
+    if _tracer is None:
+        return _NULL
+    return _tracer.phase(name)
+
+
+def iterate(name: str, iterable):
+    """Return iterable, timing the production of its items when tracing."""
+    if _tracer is None:
+        return iterable
+    return _tracer.iterate(name, iterable)
+
+
+def traced(name: str):
+    """Decorate a function so each call is timed as a phase when tracing."""
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with _tracer.phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
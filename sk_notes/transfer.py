@@ -0,0 +1,193 @@
+"""Functions to import and export notes in bulk."""
+import csv
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+from time import time
+from typing import Iterator
+
+from sk_notes.codec import dumps, loads
+from sk_notes.note_handler import Note
+
+CSV_COLUMNS = ["id", "created_at", "category", "title", "body", "tags", "due_date"]
+
+# Fields that can be set on an existing note.
+EDITABLE_FIELDS = ["category", "title", "body", "tags", "due_date"]
+
+
+def _tags(tags) -> list:
+    """Return tags given as a list or a comma separated string."""
+    if isinstance(tags, str):
+        tags = tags.strip("[]").split(",")
+    return [str(tag).strip().lower() for tag in tags or [] if str(tag).strip()]
+
+
+@lru_cache(maxsize=4096)
+def _due_date(due_date) -> str:
+    """
+    Return a due date as yyyy-mm-dd, or None if it is unset.
+
+    Imported notes share few distinct due dates,
+    so checked dates are cached.
+    """
+    if not due_date:
+        return None
+    try:
+        return datetime.strptime(str(due_date), "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"due_date {due_date!r} is not yyyy-mm-dd")
+
+
+def validate(record: dict, _id: int, created_at: int = None) -> Note:
+    """
+    Check an imported record and convert it into a Note.
+
+    Imported notes are given a new id, so they never
+    collide with the notes already stored.
+
+    args:
+        record: (dict)
+            The imported note.
+
+        _id: (int)
+            The id to give the note.
+
+        created_at: (int)
+            The creation time to use
+            if the record has none.
+
+    returns: (Note)
+        The validated note.
+
+    raises: (ValueError)
+        If a field is missing
+        or malformed.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("a note must be an object")
+    title = record.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("title is required")
+    try:
+        created_at = int(record.get("created_at") or created_at or time())
+    except (TypeError, ValueError):
+        raise ValueError(f"created_at {record.get('created_at')!r} is not a timestamp")
+    tags = record.get("tags")
+    if tags is not None and not isinstance(tags, (str, list)):
+        raise ValueError("tags must be a list or a comma separated string")
+    return Note(
+        id=_id,
+        created_at=created_at,
+        category=str(record.get("category") or "").strip() or None,
+        title=title.strip(),
+        body=str(record.get("body") or ""),
+        tags=_tags(tags),
+        due_date=_due_date(record.get("due_date")),
+    )
+
+
+def parse_jsonl(lines) -> Iterator[dict]:
+    """Yield the JSON object on each non-blank line."""
+    for line in lines:
+        if line.strip():
+            yield loads(line)
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    """Yield notes from a file holding one JSON object per line."""
+    with open(path, "rb") as file:
+        yield from parse_jsonl(file)
+
+
+def write_jsonl(notes, path: str) -> int:
+    """Write notes to a file as one JSON object per line."""
+    count = 0
+    with open(path, mode="wb") as file:
+        for note in notes:
+            file.write(dumps(note) + b"\n")
+            count += 1
+    return count
+
+
+def read_csv(path: str) -> Iterator[dict]:
+    """Yield notes from a CSV file with a header row."""
+    with open(path, "r", newline="") as file:
+        yield from csv.DictReader(file)
+
+
+def write_csv(notes, path: str) -> int:
+    """Write notes to a CSV file, joining tags with commas."""
+    count = 0
+    with open(path, mode="w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for note in notes:
+            writer.writerow({**note, "tags": ",".join(note.get("tags") or [])})
+            count += 1
+    return count
+
+
+def _front_matter_value(value: str):
+    """Parse a front matter value written as JSON, or keep it as text."""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value.strip().strip("'\"")
+
+
+def read_markdown(directory: str) -> Iterator[dict]:
+    """
+    Yield notes from a directory of Markdown files.
+
+    Each file starts with front matter between --- lines,
+    holding one "field: value" pair per line, and the rest
+    of the file is the body.
+    """
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".md"):
+            continue
+        with open(os.path.join(directory, file_name), "r") as file:
+            lines = file.read().split("\n")
+        note = {}
+        if lines and lines[0].strip() == "---":
+            end = lines.index("---", 1)
+            for line in lines[1:end]:
+                field, _, value = line.partition(":")
+                note[field.strip()] = _front_matter_value(value)
+            body_start = end + 1
+            lines = lines[body_start:]
+        note["body"] = "\n".join(lines).strip("\n")
+        yield note
+
+
+def write_markdown(notes, directory: str) -> int:
+    """Write each note to a Markdown file named by its id."""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for note in notes:
+        front_matter = "".join(
+            f"{field}: {json.dumps(note.get(field))}\n"
+            for field in CSV_COLUMNS
+            if field != "body"
+        )
+        with open(os.path.join(directory, f"{note['id']}.md"), mode="w") as file:
+            file.write(f"---\n{front_matter}---\n{note.get('body') or ''}\n")
+        count += 1
+    return count
+
+
+FORMATS = {
+    "jsonl": (read_jsonl, write_jsonl),
+    "csv": (read_csv, write_csv),
+    "markdown": (read_markdown, write_markdown),
+}
+
+
+def detect_format(path: str) -> str:
+    """Return the format of a path from its extension, or markdown for directories."""
+    if os.path.isdir(path) or not os.path.splitext(path)[1]:
+        return "markdown"
+    if path.endswith(".csv"):
+        return "csv"
+    return "jsonl"